@@ -1,6 +1,6 @@
 import tkinter as tk
 from tkinter import ttk, simpledialog, messagebox, filedialog
-from math import sqrt, ceil
+from math import sqrt, ceil, floor
 import json
 import sys
 
@@ -9,6 +9,17 @@ from shapely.geometry import Polygon, LineString, Point
 from shapely.ops import unary_union, polygonize
 import re
 import os
+import threading
+import queue
+import time
+import bisect
+import zlib
+from collections import deque
+
+# 덕트 사이징 공통 계산 (duct calc.py 와 공유)
+from duct_sizing import calc_circular_diameter, size_rect_stepped, size_ducts_batch
+from instrumentation import PERF
+from edit_journal import EditJournal
 
 # HVAC type names
 HVAC_NAMES = {
@@ -19,10 +30,14 @@ HVAC_NAMES = {
 
 
 class RectShape:
-    """하나의 직사각형 도형 + 치수 정보를 관리하는 클래스"""
+    """하나의 직사각형 도형 + 치수 정보를 관리하는 클래스
+
+    view(ViewTransform)를 주면 좌표를 저장한 뒤의 줌/팬을 좌표를 읽을 때 반영한다.
+    """
     def __init__(self, shape_id, coords, rect_id, side_ids, dim_items,
-                 editable=True, color="black"):
+                 editable=True, color="black", view=None):
         self.shape_id = shape_id
+        self._view = view
         self.coords = coords          # (x1, y1, x2, y2)
         self.rect_id = rect_id        # canvas rectangle id
         self.side_ids = side_ids      # {"top": line_id, ...}
@@ -31,6 +46,669 @@ class RectShape:
         self.color = color
         self.snap_highlight_sides = set()  # 스냅으로 강조된 변 이름들
 
+    @property
+    def coords(self):
+        view = self._view
+        if view is not None and self._affine != view.affine:
+            self._coords = view.remap(self._coords, self._affine)
+            self._affine = view.affine
+        return self._coords
+
+    @coords.setter
+    def coords(self, value):
+        self._coords = value
+        self._affine = self._view.affine if self._view is not None else None
+
+
+class ViewTransform:
+    """팔레트 누적 줌/팬 변환: 화면 좌표 = 기준 좌표 * s + (tx, ty)
+
+    줌/팬은 affine만 바꾼다. 도형 모델 좌표, 색인, 컬링으로 숨긴 캔버스 아이템처럼
+    줌/팬 때 바로 옮기지 않는 좌표는 마지막으로 맞춘 affine과 함께 두고 remap 으로 옮긴다.
+    """
+
+    def __init__(self):
+        self.affine = (1.0, 0.0, 0.0)
+
+    def zoom(self, cx, cy, factor):
+        s, tx, ty = self.affine
+        self.affine = (s * factor, cx + (tx - cx) * factor, cy + (ty - cy) * factor)
+
+    def move(self, dx, dy):
+        s, tx, ty = self.affine
+        self.affine = (s, tx + dx, ty + dy)
+
+    def ix(self, x):
+        """화면 x -> 기준 x"""
+        s, tx, _ty = self.affine
+        return (x - tx) / s
+
+    def iy(self, y):
+        s, _tx, ty = self.affine
+        return (y - ty) / s
+
+    def step(self, affine):
+        """affine 시점 좌표를 현재 좌표로 옮기는 (배율 k, dx, dy): v' = v * k + d"""
+        s0, tx0, ty0 = affine
+        s, tx, ty = self.affine
+        k = s / s0
+        return k, tx - tx0 * k, ty - ty0 * k
+
+    def remap(self, coords, affine):
+        """affine 시점의 화면 좌표 (x, y, x, y, ...) 를 현재 화면 좌표로"""
+        if affine is None or tuple(affine) == self.affine:
+            return tuple(coords)
+        k, dx, dy = self.step(affine)
+        return tuple((v * k + dx) if i % 2 == 0 else (v * k + dy)
+                     for i, v in enumerate(coords))
+
+
+class ShapeIndex:
+    """도형의 변/모서리 좌표 색인 (hit-test, 스냅, 공유 변 판정용)
+
+    - 세로 변(left/right)은 x, 가로 변(top/bottom)은 y 기준 정렬 리스트 → bisect 범위 검색
+    - 모서리는 균일 격자 spatial hash (cell 크기는 허용오차 이상)
+    - 좌표는 view(ViewTransform) 기준 좌표로 저장하므로 전체 팬/줌 뒤에도 다시 만들 필요가 없다
+    동일 거리일 때의 우선순위를 위해 도형마다 추가 순서(seq)를 기록한다.
+    """
+
+    def __init__(self, cell=32.0, view=None):
+        self.view = view if view is not None else ViewTransform()
+        self.cell = float(cell)
+        self._next_seq = 0
+        self._seq_of = {}      # id(shape) -> seq
+        self._by_seq = {}      # seq -> shape
+        self._entries = {}     # seq -> (v entries, h entries, corner cells) 제거용
+        self.v_edges = []      # sorted (x, seq, side)
+        self.h_edges = []      # sorted (y, seq, side)
+        self.corners = {}      # (i, j) -> {(seq, idx), ...}
+
+    def clear(self):
+        self._next_seq = 0
+        self._seq_of.clear()
+        self._by_seq.clear()
+        self._entries.clear()
+        self.v_edges = []
+        self.h_edges = []
+        self.corners = {}
+
+    def rebuild(self, shapes):
+        self.clear()
+        for shape in shapes:
+            self.add(shape)
+
+    def _cell_of(self, x, y):
+        return (int(floor(self.view.ix(x) / self.cell)), int(floor(self.view.iy(y) / self.cell)))
+
+    def add(self, shape, seq=None):
+        if id(shape) in self._seq_of:
+            self.remove(shape)
+        if seq is None:
+            seq = self._next_seq
+            self._next_seq += 1
+        x1, y1, x2, y2 = shape.coords
+        view = self.view
+        v = [(view.ix(x1), seq, "left"), (view.ix(x2), seq, "right")]
+        h = [(view.iy(y1), seq, "top"), (view.iy(y2), seq, "bottom")]
+        for e in v:
+            bisect.insort(self.v_edges, e)
+        for e in h:
+            bisect.insort(self.h_edges, e)
+        cells = []
+        for idx, (cx, cy) in enumerate(((x1, y1), (x2, y1), (x1, y2), (x2, y2))):
+            c = self._cell_of(cx, cy)
+            self.corners.setdefault(c, set()).add((seq, idx))
+            cells.append((c, (seq, idx)))
+        self._seq_of[id(shape)] = seq
+        self._by_seq[seq] = shape
+        self._entries[seq] = (v, h, cells)
+        return seq
+
+    def remove(self, shape):
+        seq = self._seq_of.pop(id(shape), None)
+        if seq is None:
+            return None
+        self._by_seq.pop(seq, None)
+        v, h, cells = self._entries.pop(seq)
+        for lst, entries in ((self.v_edges, v), (self.h_edges, h)):
+            for e in entries:
+                i = bisect.bisect_left(lst, e)
+                if i < len(lst) and lst[i] == e:
+                    del lst[i]
+        for c, key in cells:
+            bucket = self.corners.get(c)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self.corners[c]
+        return seq
+
+    def update(self, shape):
+        """도형 좌표가 바뀐 뒤 호출 (추가 순서 유지)"""
+        seq = self.remove(shape)
+        self.add(shape, seq)
+
+    def order(self, shape):
+        return self._seq_of.get(id(shape), -1)
+
+    def _range(self, lst, lo, hi):
+        i = bisect.bisect_left(lst, (lo,))
+        j = bisect.bisect_right(lst, (hi, float("inf")))
+        return lst[i:j]
+
+    def vertical_edges(self, x_lo, x_hi):
+        """x 가 [x_lo, x_hi] 인 세로 변들: [(shape, side), ...]"""
+        return [(self._by_seq[seq], side)
+                for _x, seq, side in self._range(self.v_edges, self.view.ix(x_lo), self.view.ix(x_hi))]
+
+    def horizontal_edges(self, y_lo, y_hi):
+        """y 가 [y_lo, y_hi] 인 가로 변들: [(shape, side), ...]"""
+        return [(self._by_seq[seq], side)
+                for _y, seq, side in self._range(self.h_edges, self.view.iy(y_lo), self.view.iy(y_hi))]
+
+    def corners_near(self, x, y, tol):
+        """(x, y) 주변 tol 이내 셀의 모서리 후보: [(shape, idx), ...]"""
+        i0, j0 = self._cell_of(x - tol, y - tol)
+        i1, j1 = self._cell_of(x + tol, y + tol)
+        out = []
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                for seq, idx in self.corners.get((i, j), ()):
+                    out.append((self._by_seq[seq], idx))
+        return out
+
+
+class ViewportIndex:
+    """뷰포트 컬링용 아이템 묶음 색인 (균일 격자 spatial hash)
+
+    묶음 = (bbox, 여유 px, 항상 보이는 ids, LOD ids, LOD 종류 'dim'|'text'). key는 추가 순서.
+    bbox는 view(ViewTransform) 기준 좌표로 저장하므로 줌/팬 뒤에도 다시 만들 필요가 없다.
+    여유는 줌과 무관한 화면 px 이므로 검사할 때 더한다. 격자 칸을 너무 많이 덮는 큰 묶음은
+    따로 두고 매번 검사한다.
+    """
+    MAX_CELLS = 256
+
+    def __init__(self, cell=256.0, view=None):
+        self.view = view if view is not None else ViewTransform()
+        self.cell = float(cell)
+        self._groups = []
+        self._cells = {}       # (i, j) -> [key, ...]
+        self._big = []
+        self._pad = 0.0        # 묶음 여유 px 최댓값
+
+    def rebuild(self, groups):
+        """groups: 화면 좌표 bbox 묶음 목록 (기준 좌표로 바꿔 저장)"""
+        view = self.view
+        self._groups = []
+        for (x1, y1, x2, y2), *rest in groups:
+            box = (view.ix(x1), view.iy(y1), view.ix(x2), view.iy(y2))
+            self._groups.append((box, *rest))
+        self._cells = {}
+        self._big = []
+        self._pad = max((g[1] for g in self._groups), default=0.0)
+        for key, group in enumerate(self._groups):
+            i0, j0, i1, j1 = self._cell_range(*group[0])
+            if (i1 - i0 + 1) * (j1 - j0 + 1) > self.MAX_CELLS:
+                self._big.append(key)
+                continue
+            for i in range(i0, i1 + 1):
+                for j in range(j0, j1 + 1):
+                    self._cells.setdefault((i, j), []).append(key)
+
+    def _cell_range(self, x1, y1, x2, y2):
+        c = self.cell
+        return (int(floor(x1 / c)), int(floor(y1 / c)), int(floor(x2 / c)), int(floor(y2 / c)))
+
+    def group(self, key):
+        """(항상 보이는 ids, LOD ids, LOD 종류)"""
+        return self._groups[key][2:]
+
+    def __len__(self):
+        return len(self._groups)
+
+    def query(self, x1, y1, x2, y2):
+        """화면 좌표 영역과 (bbox + 여유)가 겹치는 묶음 key 집합"""
+        ix, iy = self.view.ix, self.view.iy
+        pad = self._pad
+        i0, j0, i1, j1 = self._cell_range(ix(x1 - pad), iy(y1 - pad), ix(x2 + pad), iy(y2 + pad))
+        cand = set(self._big)
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > len(self._cells):
+            for (i, j), keys in self._cells.items():
+                if i0 <= i <= i1 and j0 <= j <= j1:
+                    cand.update(keys)
+        else:
+            for i in range(i0, i1 + 1):
+                for j in range(j0, j1 + 1):
+                    cand.update(self._cells.get((i, j), ()))
+        out = set()
+        for key in cand:
+            (bx1, by1, bx2, by2), gpad = self._groups[key][:2]
+            if (bx2 >= ix(x1 - gpad) and bx1 <= ix(x2 + gpad)
+                    and by2 >= iy(y1 - gpad) and by1 <= iy(y2 + gpad)):
+                out.add(key)
+        return out
+
+
+# -------- HVAC 계통 매핑 --------
+
+class HvacMap(dict):
+    """HVAC 계통 매핑 {name: {'palette': Palette, 'ids': set, ...}} + 역색인 {palette: {id: {name}}}
+
+    기존 dict 인터페이스(get/items/[]=/del/clear)는 그대로 쓰고, 항목을 넣을 때
+    ids를 int로 정규화해 역색인에 올린다. 캔버스 id는 팔레트마다 따로 매겨지므로
+    역색인은 (팔레트, id) 기준이다. id -> 계통 조회와 충돌 검사가 O(1)이 된다.
+    다른 계통이 가진 id를 가져오는 것은 사용자가 확인한 뒤 remove_ids 로만 한다.
+    ids 집합을 직접 바꾼 뒤에는 hvac_map[name] = mapping 으로 다시 넣어 역색인을 갱신한다
+    (이전 색인은 넣을 때 복사해 둔 ids 기준으로 지운다).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._owners = {}    # palette -> {iid: {system name, ...}}
+        self._indexed = {}   # system name -> (palette, frozenset(ids)): 역색인에 올린 내용
+
+    @staticmethod
+    def normalize_ids(ids):
+        out = set()
+        for iid in ids or ():
+            try:
+                out.add(int(iid))
+            except Exception:
+                out.add(iid)
+        return out
+
+    def _index(self, name, palette, ids):
+        owners = self._owners.setdefault(palette, {})
+        for iid in ids:
+            owners.setdefault(iid, set()).add(name)
+        self._indexed[name] = (palette, frozenset(ids))
+
+    def _unindex(self, name):
+        entry = self._indexed.pop(name, None)
+        if entry is None:
+            return
+        palette, ids = entry
+        owners = self._owners.get(palette)
+        if owners is None:
+            return
+        for iid in ids:
+            names = owners.get(iid)
+            if names is not None:
+                names.discard(name)
+                if not names:
+                    del owners[iid]
+        if not owners:
+            del self._owners[palette]
+
+    def __setitem__(self, name, mapping):
+        self._unindex(name)
+        if isinstance(mapping, dict):
+            ids = self.normalize_ids(mapping.get('ids'))
+            mapping['ids'] = ids
+            self._index(name, mapping.get('palette'), ids)
+        super().__setitem__(name, mapping)
+
+    def __delitem__(self, name):
+        self._unindex(name)
+        super().__delitem__(name)
+
+    def pop(self, name, *default):
+        if name in self:
+            self._unindex(name)
+        return super().pop(name, *default)
+
+    def clear(self):
+        self._owners.clear()
+        self._indexed.clear()
+        super().clear()
+
+    def update(self, *args, **kwargs):
+        for name, mapping in dict(*args, **kwargs).items():
+            self[name] = mapping
+
+    def setdefault(self, name, default=None):
+        if name not in self:
+            self[name] = default
+        return dict.get(self, name)
+
+    def systems_of(self, palette, iid):
+        """palette의 id가 할당된 계통 이름 집합 (없으면 빈 집합)"""
+        try:
+            iid = int(iid)
+        except Exception:
+            pass
+        return set(self._owners.get(palette, {}).get(iid, ()))
+
+    def assigned_ids(self, palette):
+        """palette에서 어느 계통에든 할당된 id 집합 (읽기 전용 view)"""
+        return self._owners.get(palette, {}).keys()
+
+    def ids_of(self, name):
+        mapping = dict.get(self, name)
+        if not isinstance(mapping, dict):
+            return set()
+        return mapping.get('ids', set()) or set()
+
+    def conflicts(self, ids, name, palette):
+        """palette의 ids 중 name 이외의 계통에 이미 할당된 것: {other_name: {ids}}"""
+        owners = self._owners.get(palette, {})
+        out = {}
+        for iid in self.normalize_ids(ids):
+            for owner in owners.get(iid, ()):
+                if owner != name:
+                    out.setdefault(owner, set()).add(iid)
+        return out
+
+    def remove_ids(self, name, ids):
+        """계통 name에서 ids 제거 (재할당 확인 뒤 호출)"""
+        mapping = dict.get(self, name)
+        if not isinstance(mapping, dict):
+            return
+        cur = mapping.get('ids')
+        if not isinstance(cur, set):
+            cur = mapping['ids'] = self.normalize_ids(cur)
+        cur.difference_update(self.normalize_ids(ids))
+        self._unindex(name)
+        self._index(name, mapping.get('palette'), cur)
+
+    def remap_ids(self, palette, idmap):
+        """palette의 아이템이 다시 만들어져 id가 바뀐 경우 (idmap: old -> new)
+
+        해당 팔레트 계통의 ids / main_point_flows 를 제자리에서 바꾸고 그 팔레트의 역색인만
+        다시 만든다. 다른 팔레트의 계통에는 영향이 없다.
+        """
+        for name, (pal, ids) in list(self._indexed.items()):
+            if pal is not palette:
+                continue
+            mapping = dict.get(self, name)
+            if not isinstance(mapping, dict):
+                continue
+            mapping['ids'] = {idmap.get(iid, iid) for iid in ids}
+            flows = mapping.get('main_point_flows')
+            if flows:
+                mapping['main_point_flows'] = {idmap.get(self._as_int(k), k): v for k, v in flows.items()}
+            self._unindex(name)
+            self._index(name, palette, mapping['ids'])
+
+    @staticmethod
+    def _as_int(iid):
+        try:
+            return int(iid)
+        except Exception:
+            return iid
+
+
+# -------- CSV 로드 (인코딩 감지 / 청크 읽기 / 가상 표) --------
+
+CSV_SAMPLE_BYTES = 64 * 1024
+CSV_CHUNK_ROWS = 2000
+CSV_ENCODINGS = ('utf-8', 'cp949', 'latin-1')   # 감지/재시도 순서 (latin-1은 항상 성공)
+
+
+def detect_csv_encoding(path, sample_size=CSV_SAMPLE_BYTES):
+    """파일 앞부분 sample_size 바이트만 읽어 인코딩 추정 (BOM -> utf-8 -> cp949 -> latin-1)"""
+    import codecs
+    with open(path, 'rb') as f:
+        sample = f.read(sample_size)
+        more = bool(f.read(1))
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    for enc in CSV_ENCODINGS[:-1]:
+        try:
+            # 샘플 끝에서 잘린 멀티바이트 문자는 오류로 보지 않음 (final=False)
+            codecs.getincrementaldecoder(enc)().decode(sample, final=not more)
+            return enc
+        except UnicodeDecodeError:
+            continue
+    return CSV_ENCODINGS[-1]
+
+
+def _next_csv_encoding(encoding):
+    """encoding 으로 디코딩에 실패했을 때 다음 후보 (utf-8-sig 는 utf-8 다음으로 봄)"""
+    key = 'utf-8' if encoding == 'utf-8-sig' else encoding
+    try:
+        i = CSV_ENCODINGS.index(key)
+    except ValueError:
+        return None
+    return CSV_ENCODINGS[i + 1] if i + 1 < len(CSV_ENCODINGS) else None
+
+
+def read_csv_chunks(path, encoding, out_queue, cancel=None, chunk_rows=CSV_CHUNK_ROWS):
+    """작업 스레드용: CSV를 chunk_rows 행씩 읽어 out_queue 에 ('rows', [...]) 로 넣음.
+
+    끝나면 ('done', None), 실패하면 ('error', 예외). cancel(Event)이 설정되면 중단.
+    샘플 이후에 디코딩할 수 없는 바이트가 나오면 대체 문자를 넣지 않고 다음 인코딩 후보로
+    처음부터 다시 읽는다: ('restart', 새 인코딩) 을 받으면 그때까지 받은 행을 버려야 한다.
+    """
+    import csv
+    while True:
+        try:
+            with open(path, 'r', encoding=encoding, errors='strict', newline='') as f:
+                chunk = []
+                for r in csv.reader(f):
+                    chunk.append(r)
+                    if len(chunk) >= chunk_rows:
+                        if cancel is not None and cancel.is_set():
+                            return
+                        out_queue.put(('rows', chunk))
+                        chunk = []
+                if chunk:
+                    out_queue.put(('rows', chunk))
+            out_queue.put(('done', None))
+            return
+        except UnicodeDecodeError as e:
+            encoding = _next_csv_encoding(encoding)
+            if encoding is None:
+                out_queue.put(('error', e))
+                return
+            if cancel is not None and cancel.is_set():
+                return
+            out_queue.put(('restart', encoding))
+        except Exception as e:
+            out_queue.put(('error', e))
+            return
+
+
+class VirtualTable:
+    """행 목록 중 화면에 보이는 부분만 Treeview 항목으로 만드는 가상 표.
+
+    rows 리스트는 읽는 도중 계속 늘어날 수 있으며, 늘어난 뒤 refresh()를 호출한다.
+    Treeview 항목은 보이는 행 수만큼만 만들고 스크롤 시 값만 바꿔 재사용한다.
+    """
+
+    def __init__(self, master, rows, col_width=120):
+        self.rows = rows
+        self.col_width = col_width
+        self.top = 0
+        self.ncols = 0
+        self._items = []
+        self.frame = tk.Frame(master)
+        self.tree = ttk.Treeview(self.frame, show='headings', selectmode='none')
+        self.vsb = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self._on_yview)
+        self.hsb = ttk.Scrollbar(self.frame, orient=tk.HORIZONTAL, command=self.tree.xview)
+        self.tree.configure(xscrollcommand=self.hsb.set)
+        self.tree.grid(row=0, column=0, sticky='nsew')
+        self.vsb.grid(row=0, column=1, sticky='ns')
+        self.hsb.grid(row=1, column=0, sticky='ew')
+        self.frame.rowconfigure(0, weight=1)
+        self.frame.columnconfigure(0, weight=1)
+        try:
+            self.row_height = int(ttk.Style().lookup('Treeview', 'rowheight') or 20)
+        except Exception:
+            self.row_height = 20
+        self.tree.bind('<Configure>', lambda e: self.refresh())
+        self.tree.bind('<MouseWheel>', lambda e: self.scroll(-3 if e.delta > 0 else 3))
+        self.tree.bind('<Button-4>', lambda e: self.scroll(-3))
+        self.tree.bind('<Button-5>', lambda e: self.scroll(3))
+        self.tree.bind('<Prior>', lambda e: self.scroll(-self.visible_count()))
+        self.tree.bind('<Next>', lambda e: self.scroll(self.visible_count()))
+        self.tree.bind('<Up>', lambda e: self.scroll(-1))
+        self.tree.bind('<Down>', lambda e: self.scroll(1))
+
+    def set_columns(self, ncols):
+        """열 수가 늘었을 때만 머리글 재구성"""
+        if ncols <= self.ncols:
+            return
+        self.ncols = ncols
+        cols = [f"C{i+1}" for i in range(ncols)]
+        self.tree['columns'] = cols
+        for c in cols:
+            self.tree.heading(c, text=c)
+            self.tree.column(c, width=self.col_width, anchor='w', stretch=False)
+
+    def visible_count(self):
+        h = self.tree.winfo_height()
+        if h <= 1:
+            h = 400
+        # 머리글 한 줄을 뺀 나머지
+        return max(1, h // self.row_height - 1)
+
+    def scroll(self, delta):
+        self.top += int(delta)
+        self.refresh()
+        return 'break'
+
+    def _on_yview(self, *args):
+        n = len(self.rows)
+        if not args:
+            return
+        if args[0] == 'moveto':
+            try:
+                self.top = int(float(args[1]) * n)
+            except Exception:
+                return
+        elif args[0] == 'scroll':
+            try:
+                step = int(args[1])
+            except Exception:
+                return
+            if len(args) > 2 and args[2] == 'pages':
+                step *= self.visible_count()
+            self.top += step
+        self.refresh()
+
+    def refresh(self):
+        """보이는 범위의 행만 항목에 채우고 스크롤바 갱신"""
+        n = len(self.rows)
+        vis = self.visible_count()
+        self.top = max(0, min(self.top, n - vis))
+        want = max(0, min(vis, n - self.top))
+        while len(self._items) > want:
+            self.tree.delete(self._items.pop())
+        while len(self._items) < want:
+            self._items.append(self.tree.insert('', tk.END, values=()))
+        for i, iid in enumerate(self._items):
+            self.tree.item(iid, values=self.rows[self.top + i])
+        if n > 0:
+            self.vsb.set(self.top / n, min(1.0, (self.top + want) / n))
+        else:
+            self.vsb.set(0.0, 1.0)
+
+
+class EquipmentCatalog:
+    """로드된 CSV 장비 목록(1행: 머리글, 2행: 용량 kW)을 한 번만 해석해 둔 조회 구조.
+
+    - 공조상세 키워드별로 머리글이 일치하는 열을 찾고, 그 열들의 용량을 정렬해 둠 (키워드당 1회)
+    - select(): bisect로 목표 용량 이상 중 최소(없으면 미만 중 최대) 열을 O(log n)에 선택
+    - 표에 보일 (첫 열 제목, 값) 목록과 첫 값은 열별로 한 번만 만듦
+    동일 용량이면 왼쪽 열이 우선 (기존 min/max 선형 탐색과 같은 결과).
+    """
+
+    def __init__(self, rows):
+        self.rows = rows or []
+        self.headers = list(self.rows[0]) if self.rows else []
+        self._headers_lower = [str(h).lower() for h in self.headers]
+        second = self.rows[1] if len(self.rows) >= 2 else []
+        self.capacity = {}
+        for ci, val in enumerate(second):
+            try:
+                v = float(val)
+            except Exception:
+                continue
+            if v == v:   # NaN 제외
+                self.capacity[ci] = v
+        self._by_detail = {None: self._index(sorted(self.capacity))}
+        self._values = {}
+        self._first = {}
+
+    def _index(self, cols):
+        """열 목록 -> (머리글 순서 열 튜플, 정렬된 용량 리스트, 같은 순서의 열 리스트)"""
+        pairs = sorted((self.capacity[ci], ci) for ci in cols if ci in self.capacity)
+        return tuple(cols), [p[0] for p in pairs], [p[1] for p in pairs]
+
+    def _entry(self, detail):
+        key = detail.lower() if detail else None
+        entry = self._by_detail.get(key)
+        if entry is None:
+            cols = [ci for ci, h in enumerate(self._headers_lower) if key in h]
+            entry = self._index(cols)
+            self._by_detail[key] = entry
+        return entry
+
+    def columns_for(self, detail):
+        """머리글에 detail이 들어간 열 (detail이 없으면 용량이 숫자인 모든 열)"""
+        return self._entry(detail)[0]
+
+    def has_capacity(self, detail):
+        return bool(self._entry(detail)[1])
+
+    def max_capacity(self, detail):
+        caps = self._entry(detail)[1]
+        return caps[-1] if caps else 0.0
+
+    def select(self, detail, target, strict=False):
+        """용량이 target 이상(strict면 초과)인 열 중 최소, 없으면 그 아래 중 최대. 없으면 None"""
+        _, caps, cols = self._entry(detail)
+        if not caps:
+            return None
+        i = bisect.bisect_right(caps, target) if strict else bisect.bisect_left(caps, target)
+        if i < len(caps):
+            return cols[i]
+        # 아래쪽 최대 용량이 여러 열이면 가장 왼쪽 열
+        return cols[bisect.bisect_left(caps, caps[-1])]
+
+    def plan_quantity(self, detail, total_kw, stored_qty=None):
+        """대수와 대당 목표 용량 (qty, target).
+
+        저장된 대수가 있으면 그대로, 없으면 총 발열량이 최대 용량보다 작을 때 2대,
+        크면 ceil(총/최대)+2 대로 나눈다.
+        """
+        if stored_qty is not None:
+            return stored_qty, total_kw / max(1, stored_qty)
+        max_val = self.max_capacity(detail)
+        if max_val > 0 and total_kw < max_val:
+            return 2, total_kw / 2.0
+        ratio = total_kw / max_val if max_val > 0 else total_kw
+        qty = int(ceil(ratio)) + 2
+        if qty <= 0:
+            qty = 2
+        return qty, total_kw / qty if qty != 0 else total_kw
+
+    def header_of(self, ci):
+        return self.headers[ci] if ci < len(self.headers) else f'C{ci+1}'
+
+    def column_values(self, ci):
+        """(첫 열 제목, ci 열 값) 목록 (새 리스트; ci가 None이면 값은 빈 문자열)"""
+        vals = self._values.get(ci)
+        if vals is None:
+            if ci is None:
+                vals = [((r[0] if len(r) > 0 else ''), '') for r in self.rows]
+            else:
+                vals = [((r[0] if len(r) > 0 else ''), (r[ci] if ci < len(r) else '')) for r in self.rows]
+            self._values[ci] = vals
+        return list(vals)
+
+    def first_value(self, ci):
+        """데이터 행(2행부터) 중 ci 열의 첫 비어있지 않은 값"""
+        if ci not in self._first:
+            val = ''
+            for data_row in self.rows[1:]:
+                if ci < len(data_row) and data_row[ci] is not None and str(data_row[ci]).strip() != "":
+                    val = data_row[ci]
+                    break
+            self._first[ci] = val
+        return self._first[ci]
+
 
 class Palette:
     """팔레트 하나(캔버스)와 그 안의 모든 도형/동작을 관리하는 클래스"""
@@ -43,6 +721,14 @@ class Palette:
 
         # 상태
         self.shapes = []
+        self._view = ViewTransform()      # 누적 줌/팬 변환
+        self._shape_index = ShapeIndex(cell=32.0, view=self._view)  # 변/모서리 좌표 색인
+        self._lod_hidden = {}             # LOD/컬링으로 숨긴 아이템 id -> 좌표를 마지막으로 맞춘 affine
+        self._vis_index = ViewportIndex(view=self._view)  # 컬링 단위 묶음 색인
+        self._vis_in = set()              # 지난 갱신 때 뷰포트 안에 있던 묶음 key
+        self._vis_lod = None              # 지난 갱신 때의 (치수 표시, 작은 텍스트 표시)
+        self._vis_dirty = True            # 모델이 바뀌어 묶음 색인을 다시 만들어야 함
+        self._visibility_after_id = None
         self.next_shape_id = 1
         self.scale = 20.0  # 1m = 20px
         self.unit = "m"
@@ -54,6 +740,7 @@ class Palette:
         self.rect_draw_total = False
         self.rect_selecting = False
         self.selected_points = set()
+        self._point_state = {}            # 점 아이템 id -> 'assigned' | 'selected' (상태 태그 캐시)
 
         # drag / editing state
         self.active_shape = None
@@ -76,6 +763,11 @@ class Palette:
         self.flow_tooltip_id = None
         self.flow_tooltip_canvas = None
 
+        # coalesced motion events (latest only) and the scheduled flush
+        self._pending_motion = None
+        self._pending_drag = None
+        self._motion_after_id = None
+
         # panning
         self.panning = False
         self.pan_last_pos = None
@@ -83,6 +775,21 @@ class Palette:
         # snap and undo
         self.snap_tolerance = 8
         self.history = []
+        self._journal_after_id = None  # 예약된 저널 기록 (after_idle id)
+        # 다음 저널 기록에 넣을 변경 표시: 도형 id -> 도형, 삭제된 도형 id, id(라벨) -> (라벨, 항목들)
+        self._journal_shapes = {}
+        self._journal_deleted = set()
+        self._journal_labels = {}
+        self._journal_full = None      # 전체 교체: None / True(현재 상태) / (라벨 dict 목록, 좌표 affine)
+
+        # deferred rendering (load_from_dict): 생성 대기 항목 / 예약 id
+        self._realize_queue = deque()
+        self._realized = {"shape": [], "label": []}   # 생성 완료된 항목의 원래 순서 (정렬 리스트)
+        self._realize_models = {"shape": [], "label": []}
+        self._realize_gen = 0
+        self._realize_after_id = None
+        # 비활성 탭: 캔버스 아이템을 지우고 남겨 둔 압축 스냅샷 (None이면 실현 상태)
+        self._dormant = None
 
         # corner right-click menu
         self.corner_menu = tk.Menu(self.canvas, tearoff=0)
@@ -99,12 +806,14 @@ class Palette:
         self.grid_ids = []
         self.show_grid = True
         self._grid_redraw_after_id = None
+        self._grid_cache = None  # cached grid layer (spacing, anchor, line ids by index)
 
         # event bindings
         try:
-            self.canvas.bind("<Motion>", self.on_mouse_move)
+            # motion events are coalesced to one update per frame (see _queue_motion)
+            self.canvas.bind("<Motion>", self._queue_motion)
             self.canvas.bind("<ButtonPress-1>", self.on_left_down)
-            self.canvas.bind("<B1-Motion>", self.on_left_drag)
+            self.canvas.bind("<B1-Motion>", self._queue_drag)
             self.canvas.bind("<ButtonRelease-1>", self.on_left_up)
             self.canvas.bind("<ButtonPress-3>", self.on_right_click)
             self.canvas.bind("<MouseWheel>", self.on_mouse_wheel)
@@ -283,6 +992,7 @@ class Palette:
             except Exception:
                 pass
         self.grid_ids = []
+        self._grid_cache = None
 
     def toggle_grid(self, show: bool):
         """Show or hide the grid. If showing, draw it for current viewport."""
@@ -298,14 +1008,33 @@ class Palette:
             except Exception:
                 pass
 
+    def _grid_note_move(self, dx, dy):
+        """canvas.move("all")로 그리드 선도 같이 이동했을 때 캐시 기준점을 맞춰 둔다."""
+        cache = getattr(self, '_grid_cache', None)
+        if not cache:
+            return
+        cache["ax"] += dx
+        cache["ay"] += dy
+        l, t, r, b = cache["extent"]
+        cache["extent"] = (l + dx, t + dy, r + dx, b + dy)
+
+    def _grid_cache_alive(self, cache):
+        """캔버스 전체 삭제 등으로 캐시된 선이 사라졌는지 확인 (한 개만 검사)"""
+        for ids in (cache["v"], cache["h"]):
+            for lid in ids.values():
+                try:
+                    return bool(self.canvas.type(lid))
+                except Exception:
+                    return False
+        return True
+
+    @PERF.timed(cat='redraw')
     def draw_grid(self):
-        """Viewport-limited 0.5m grid. Coarsen spacing if too many lines to avoid UI freeze."""
-        # remove old grid
-        try:
-            self.clear_grid()
-        except Exception:
-            self.grid_ids = []
+        """Viewport-limited 0.5m grid. Coarsen spacing if too many lines to avoid UI freeze.
 
+        그리드 선은 캐시된 레이어로 유지한다. 팬으로 이동한 경우에는 기존 선을 재사용하고
+        새로 드러난 영역의 선만 추가/길이 연장하며, 줌(간격 변경)이나 기준점 변경 시에만 다시 만든다.
+        """
         # get widget size
         try:
             w = int(self.canvas.winfo_width())
@@ -347,58 +1076,127 @@ class Palette:
             anchor_x = 0.0
             anchor_y = 0.0
 
-        # compute remainder offset so anchor_x == (k*spacing + rem_x)
-        rem_x = anchor_x - math.floor(anchor_x / spacing) * spacing
-        rem_y = anchor_y - math.floor(anchor_y / spacing) * spacing
-
-        kmin = math.floor((view_left - rem_x) / spacing)
-        kmax = math.ceil((view_right - rem_x) / spacing)
-        hmin = math.floor((view_top - rem_y) / spacing)
-        hmax = math.ceil((view_bottom - rem_y) / spacing)
+        def line_ranges(sp):
+            # line j lies at anchor + j*sp, so every (coarsened) line passes through the anchor
+            return (math.floor((view_left - anchor_x) / sp), math.ceil((view_right - anchor_x) / sp),
+                    math.floor((view_top - anchor_y) / sp), math.ceil((view_bottom - anchor_y) / sp))
 
+        kmin, kmax, hmin, hmax = line_ranges(spacing)
         v_count = max(0, int(kmax - kmin + 1))
         h_count = max(0, int(hmax - hmin + 1))
 
-        # cap total lines to avoid freezing
+        # cap total lines to avoid freezing (anchor remainder kept while coarsening)
         MAX_LINES = 1200
         total = v_count + h_count
         while total > MAX_LINES and spacing < max(w, h):
             spacing *= 2
-            kmin = math.floor(view_left / spacing)
-            kmax = math.ceil(view_right / spacing)
-            hmin = math.floor(view_top / spacing)
-            hmax = math.ceil(view_bottom / spacing)
+            kmin, kmax, hmin, hmax = line_ranges(spacing)
             v_count = max(0, int(kmax - kmin + 1))
             h_count = max(0, int(hmax - hmin + 1))
             total = v_count + h_count
 
+        # pre-build a quarter viewport around the view so short pans need no new items
+        pad_x = max(spacing, (view_right - view_left) / 4)
+        pad_y = max(spacing, (view_bottom - view_top) / 4)
+        ext_left, ext_right = view_left - pad_x, view_right + pad_x
+        ext_top, ext_bottom = view_top - pad_y, view_bottom + pad_y
+
+        # reuse the cached layer if spacing is unchanged and the lines still sit on the anchor lattice
+        cache = getattr(self, '_grid_cache', None)
+        reuse = False
+        if cache and abs(cache["spacing"] - spacing) < 1e-9 and self._grid_cache_alive(cache):
+            nx = (anchor_x - cache["ax"]) / spacing
+            ny = (anchor_y - cache["ay"]) / spacing
+            if abs(nx - round(nx)) < 1e-6 and abs(ny - round(ny)) < 1e-6:
+                nx, ny = int(round(nx)), int(round(ny))
+                if nx or ny:
+                    cache["v"] = {j - nx: lid for j, lid in cache["v"].items()}
+                    cache["h"] = {j - ny: lid for j, lid in cache["h"].items()}
+                cache["ax"], cache["ay"] = anchor_x, anchor_y
+                reuse = True
+        if not reuse:
+            try:
+                self.clear_grid()
+            except Exception:
+                self.grid_ids = []
+            cache = {"spacing": spacing, "ax": anchor_x, "ay": anchor_y,
+                     "v": {}, "h": {}, "extent": (ext_left, ext_top, ext_right, ext_bottom)}
+
+        # extend existing lines only when the view left the cached extent
+        l, t, r, b = cache["extent"]
+        if view_left < l or view_right > r or view_top < t or view_bottom > b:
+            l, t, r, b = ext_left, ext_top, ext_right, ext_bottom
+            cache["extent"] = (l, t, r, b)
+            for j, lid in cache["v"].items():
+                x = anchor_x + j * spacing
+                try:
+                    self.canvas.coords(lid, x, t, x, b)
+                except Exception:
+                    pass
+            for j, lid in cache["h"].items():
+                y = anchor_y + j * spacing
+                try:
+                    self.canvas.coords(lid, l, y, r, y)
+                except Exception:
+                    pass
+
+        jv = (math.floor((ext_left - anchor_x) / spacing), math.ceil((ext_right - anchor_x) / spacing))
+        jh = (math.floor((ext_top - anchor_y) / spacing), math.ceil((ext_bottom - anchor_y) / spacing))
+
+        # drop lines that scrolled far out of the padded range
+        for lines, (lo, hi) in ((cache["v"], jv), (cache["h"], jh)):
+            for j in [j for j in lines if j < lo or j > hi]:
+                try:
+                    self.canvas.delete(lines.pop(j))
+                except Exception:
+                    pass
+
         color = "#e6e6e6"
-        # draw vertical lines
-        for k in range(kmin, kmax + 1):
-            x = k * spacing + rem_x
+        created = False
+        # draw missing vertical lines
+        for k in range(jv[0], jv[1] + 1):
+            if k in cache["v"]:
+                continue
+            x = anchor_x + k * spacing
             try:
-                lid = self.canvas.create_line(x, view_top, x, view_bottom, fill=color, width=1, tags=("grid",))
-                self.grid_ids.append(lid)
+                cache["v"][k] = self.canvas.create_line(x, t, x, b, fill=color, width=1, tags=("grid",))
+                created = True
             except Exception:
                 continue
 
-        # draw horizontal lines
-        for k in range(hmin, hmax + 1):
-            y = k * spacing + rem_y
+        # draw missing horizontal lines
+        for k in range(jh[0], jh[1] + 1):
+            if k in cache["h"]:
+                continue
+            y = anchor_y + k * spacing
             try:
-                lid = self.canvas.create_line(view_left, y, view_right, y, fill=color, width=1, tags=("grid",))
-                self.grid_ids.append(lid)
+                cache["h"][k] = self.canvas.create_line(l, y, r, y, fill=color, width=1, tags=("grid",))
+                created = True
             except Exception:
                 continue
 
-        try:
-            self.canvas.tag_lower("grid")
-        except Exception:
-            pass
+        self._grid_cache = cache
+        self.grid_ids = list(cache["v"].values()) + list(cache["h"].values())
+
+        if created:
+            try:
+                self.canvas.tag_lower("grid")
+            except Exception:
+                pass
 
-    def push_history(self):
+    @PERF.timed(cat='history')
+    def push_history(self, edit=True):
+        """되돌리기 스냅샷 저장
+
+        edit=False: 줌/팬처럼 보기만 바뀌는 경우 (모델은 그대로이므로 컬링 색인/저널은 그대로 둔다)
+        """
+        # 지연 생성 중인 항목이 있으면 편집 전에 먼저 모두 생성
+        self._flush_pending_realize()
+        if edit:
+            self._mark_visibility_dirty()
         snapshot = {
             "scale": self.scale,
+            "view": self._view.affine,
             "next_shape_id": self.next_shape_id,
             "shapes": [],
             "generated_space_labels": []
@@ -413,16 +1211,17 @@ class Palette:
 
         # 자동생성 라벨 저장 (디퓨저 위치 포함)
         for lab in self.generated_space_labels:
-            name_bbox = self.canvas.bbox(lab["name_id"])
-            heat_norm_bbox = self.canvas.bbox(lab["heat_norm_id"])
-            heat_equip_bbox = self.canvas.bbox(lab["heat_equip_id"])
-            area_bbox = self.canvas.bbox(lab["area_id"])
+            # LOD/컬링으로 숨겨진 텍스트는 bbox가 비므로 좌표(중심)로 위치를 기록
+            name_bbox = self._text_pos_box(lab["name_id"])
+            heat_norm_bbox = self._text_pos_box(lab["heat_norm_id"])
+            heat_equip_bbox = self._text_pos_box(lab["heat_equip_id"])
+            area_bbox = self._text_pos_box(lab["area_id"])
             
             # 디퓨저 좌표 저장
             diffuser_coords = []
             if "diffuser_ids" in lab:
                 for did in lab["diffuser_ids"]:
-                    coords = self.canvas.coords(did)
+                    coords = self._item_coords(did)
                     if coords:
                         # oval coords (x1, y1, x2, y2) -> center (cx, cy)
                         cx = (coords[0] + coords[2]) / 2
@@ -443,19 +1242,136 @@ class Palette:
             })
 
         self.history.append(snapshot)
+        # push_history는 편집 직전에 호출되므로, 편집이 끝난 뒤(idle) 저널에 기록
+        if edit:
+            self._schedule_journal()
+
+    def _text_pos_box(self, item_id):
+        """텍스트 아이템 위치를 (x, y, x, y) 형태로 반환 (숨김 상태에서도 유효)"""
+        try:
+            c = self._item_coords(item_id)
+            if len(c) >= 2:
+                return (c[0], c[1], c[0], c[1])
+        except Exception:
+            pass
+        return self.canvas.bbox(item_id)
+
+    def _schedule_journal(self):
+        """편집 후 상태를 idle 시점에 한 번만 저널에 기록하도록 예약"""
+        if getattr(self, '_journal_after_id', None):
+            return
+        try:
+            self._journal_after_id = self.canvas.after_idle(self._journal_edit)
+        except Exception:
+            self._journal_after_id = None
+
+    def _journal_shape(self, shape, schedule=True):
+        """도형 추가/이동/크기 변경을 저널에 표시 (드래그 중에는 schedule=False, 놓을 때 기록)"""
+        self._journal_shapes[shape.shape_id] = shape
+        self._journal_deleted.discard(shape.shape_id)
+        if schedule:
+            self._schedule_journal()
+
+    def _journal_shape_deleted(self, shape):
+        self._journal_shapes.pop(shape.shape_id, None)
+        self._journal_deleted.add(shape.shape_id)
+        self._schedule_journal()
+
+    def _journal_label(self, lab, *parts):
+        """라벨의 일부 항목(texts / hvac / diffusers / geometry) 변경을 저널에 표시"""
+        entry = self._journal_labels.get(id(lab))
+        merged = set(parts) if entry is None else entry[1] | set(parts)
+        self._journal_labels[id(lab)] = (lab, merged)
+        self._schedule_journal()
+
+    def _journal_reset(self, labels=None):
+        """일괄 변경(되돌리기/자동생성/불러오기/초기화): 다음 기록에서 팔레트 전체를 비교
+
+        labels: 불러온 라벨 dict 목록 (아직 캔버스에 생성되지 않았을 수 있어 그대로 사용)
+        """
+        self._journal_shapes = {}
+        self._journal_deleted = set()
+        self._journal_labels = {}
+        self._journal_full = True if labels is None else (labels, self._view.affine)
+        self._schedule_journal()
+
+    def _journal_edit(self):
+        """표시된 변경만 작업 단위로 저널에 넘김 (비교/직렬화/파일 기록은 저널 스레드에서)"""
+        self._journal_after_id = None
+        full, shapes, deleted, labels = (self._journal_full, self._journal_shapes,
+                                         self._journal_deleted, self._journal_labels)
+        self._journal_full = None
+        self._journal_shapes = {}
+        self._journal_deleted = set()
+        self._journal_labels = {}
+        journal = getattr(self.app, 'journal', None)
+        if journal is None or not (full or shapes or deleted or labels):
+            return
+        try:
+            index = self.app.palettes.index(self)
+        except Exception:
+            return
+        try:
+            meta = {"scale": self.scale, "show_grid": bool(getattr(self, 'show_grid', False))}
+            ops = [("meta", meta)]
+            if full:
+                shape_ops = [(s.shape_id, list(s.coords), s.editable, s.color) for s in self.shapes]
+                if full is True:
+                    self._flush_pending_realize()
+                    label_recs = [self._label_record(lab) for lab in self.generated_space_labels]
+                else:
+                    label_recs, affine = full
+                    if tuple(affine) != self._view.affine:
+                        label_recs = [self._remap_label_record(rec, affine) for rec in label_recs]
+                ops.append(("reset", meta, shape_ops, label_recs))
+            else:
+                ops.extend(("shape_del", sid) for sid in deleted)
+                ops.extend(("shape", s.shape_id, list(s.coords), s.editable, s.color)
+                           for s in shapes.values() if s in self.shapes)
+                if labels:
+                    numbers = {id(lab): no for no, lab in enumerate(self.generated_space_labels)}
+                    for key, (lab, parts) in labels.items():
+                        if key not in numbers:
+                            continue
+                        try:
+                            ops.append(("label", numbers[key], self._label_record(lab, parts)))
+                        except Exception:
+                            continue
+            journal.record(index, self._view.affine, ops)
+        except Exception:
+            pass
+
+    def _remap_label_record(self, rec, affine):
+        """affine 시점 좌표로 저장된 라벨 dict의 텍스트/디퓨저 위치를 현재 화면 좌표로"""
+        out = dict(rec)
+        for key in EditJournal.LABEL_POINT_KEYS:
+            if out.get(key) is not None:
+                out[key] = list(self._view.remap(out[key], affine))
+        if out.get("diffuser_coords") is not None:
+            out["diffuser_coords"] = [list(self._view.remap(p, affine)) for p in out["diffuser_coords"]]
+        return out
 
+    @PERF.timed(cat='history')
     def undo(self):
         if not self.history:
             return
 
         snapshot = self.history.pop()
+        self._cancel_pending_realize()
         self.canvas.delete("all")
+        self._lod_hidden = {}
+        self._mark_visibility_dirty()
         self.shapes.clear()
+        self._shape_index.clear()
         self.generated_space_labels.clear()
         self.highlight_line_id = None
         self.tooltip_id = None
         self.corner_highlight_id = None
 
+        # 스냅샷 당시의 보기(줌/팬)로 되돌린다
+        snap_view = snapshot.get("view")
+        if snap_view is not None:
+            self._view.affine = tuple(snap_view)
         self.scale = snapshot["scale"]
         self.next_shape_id = snapshot["next_shape_id"]
 
@@ -510,7 +1426,7 @@ class Palette:
                 for (cx, cy) in lab["diffuser_coords"]:
                     did = self.canvas.create_oval(
                         cx - r, cy - r, cx + r, cy + r,
-                        fill="green", outline=""
+                        fill="green", outline="", tags=("point",)
                     )
                     diffuser_ids.append(did)
 
@@ -533,6 +1449,8 @@ class Palette:
         self.active_shape = None
         self.active_side_name = None
         self.app.update_selected_area_label(self)
+        self._schedule_visibility_update()
+        self._journal_reset()
 
     # -------- 도형 생성/그리기 --------
 
@@ -590,9 +1508,12 @@ class Palette:
 
         shape = RectShape(shape_id, (x1, y1, x2, y2),
                           rect_id, side_ids, dim_items,
-                          editable=editable, color=color)
+                          editable=editable, color=color, view=self._view)
 
         self.shapes.append(shape)
+        self._shape_index.add(shape)
+        self._journal_shape(shape)
+        self._apply_lod_to_shape(shape)
         self.bring_shape_to_front(shape)
         
         try:
@@ -604,6 +1525,9 @@ class Palette:
         return shape
 
     def bring_shape_to_front(self, shape: RectShape):
+        if shape.rect_id is None:
+            # 지연 생성 대기 중인 도형: 아이템이 생길 때 제자리에 놓인다
+            return
         ids = [shape.rect_id]
         ids.extend(shape.side_ids.values())
         for part in shape.dim_items.values():
@@ -611,8 +1535,11 @@ class Palette:
             ids.extend(part["ticks"])
             ids.append(part["text"])
         for item_id in ids:
-            if item_id in self.canvas.find_all():
+            # find_all() 멤버십 검사는 아이템 수에 비례하므로 바로 raise 시도
+            try:
                 self.canvas.tag_raise(item_id)
+            except Exception:
+                pass
 
     def draw_dimensions_for_shape(self, shape_id, x1, y1, x2, y2, color="black"):
         dim_items = {}
@@ -702,27 +1629,36 @@ class Palette:
         if shape:
             self.bring_shape_to_front(shape)
 
+    # 거리가 같을 때의 변 우선순위 (한 도형 안에서 top, bottom, left, right 순)
+    SIDE_PRIORITY = {"top": 0, "bottom": 1, "left": 2, "right": 3}
+
     def find_side_under_mouse(self, x, y, tol=5):
         best_shape = None
         best_side = None
-        best_dist2 = None
+        best_key = None
 
-        for shape in reversed(self.shapes):
+        # 색인에서 x±tol 세로 변, y±tol 가로 변만 후보로.
+        # 거리가 같으면 나중에 추가된 도형, 같은 도형이면 SIDE_PRIORITY 순서가 우선
+        index = self._shape_index
+        candidates = []
+        for shape, side_name in index.horizontal_edges(y - tol, y + tol):
             x1, y1, x2, y2 = shape.coords
-            candidates = []
             if x1 <= x <= x2:
-                candidates.append(("top", (y - y1) ** 2, abs(y - y1)))
-                candidates.append(("bottom", (y - y2) ** 2, abs(y - y2)))
+                ey = y1 if side_name == "top" else y2
+                candidates.append((shape, side_name, (y - ey) ** 2, abs(y - ey)))
+        for shape, side_name in index.vertical_edges(x - tol, x + tol):
+            x1, y1, x2, y2 = shape.coords
             if y1 <= y <= y2:
-                candidates.append(("left", (x - x1) ** 2, abs(x - x1)))
-                candidates.append(("right", (x - x2) ** 2, abs(x - x2)))
-
-            for side_name, d2, absd in candidates:
-                if absd <= tol:
-                    if best_dist2 is None or d2 < best_dist2:
-                        best_dist2 = d2
-                        best_shape = shape
-                        best_side = side_name
+                ex = x1 if side_name == "left" else x2
+                candidates.append((shape, side_name, (x - ex) ** 2, abs(x - ex)))
+
+        for shape, side_name, d2, absd in candidates:
+            if absd <= tol:
+                key = (d2, -index.order(shape), self.SIDE_PRIORITY[side_name])
+                if best_key is None or key < best_key:
+                    best_key = key
+                    best_shape = shape
+                    best_side = side_name
         return best_shape, best_side
 
     def highlight_side(self, shape, side_name):
@@ -753,20 +1689,23 @@ class Palette:
         best_index = None
         best_cx = best_cy = None
         best_d2 = None
+        best_order = None
 
-        for shape in self.shapes:
+        index = self._shape_index
+        for shape, idx in index.corners_near(x, y, tol):
             x1, y1, x2, y2 = shape.coords
-            corners = [(x1, y1), (x2, y1), (x1, y2), (x2, y2)]
-            for idx, (cx, cy) in enumerate(corners):
-                dx = x - cx
-                dy = y - cy
-                d2 = dx * dx + dy * dy
-                if abs(dx) <= tol and abs(dy) <= tol:
-                    if best_d2 is None or d2 < best_d2:
-                        best_d2 = d2
-                        best_shape = shape
-                        best_index = idx
-                        best_cx, best_cy = cx, cy
+            cx, cy = ((x1, y1), (x2, y1), (x1, y2), (x2, y2))[idx]
+            dx = x - cx
+            dy = y - cy
+            d2 = dx * dx + dy * dy
+            if abs(dx) <= tol and abs(dy) <= tol:
+                key = (index.order(shape), idx)
+                if best_d2 is None or d2 < best_d2 or (d2 == best_d2 and key < best_order):
+                    best_d2 = d2
+                    best_order = key
+                    best_shape = shape
+                    best_index = idx
+                    best_cx, best_cy = cx, cy
         return best_shape, best_index, best_cx, best_cy
 
     # -------- 스냅 하이라이트 --------
@@ -820,35 +1759,27 @@ class Palette:
     def find_shared_vertical_edges(self, shape):
         x1, y1, x2, y2 = shape.coords
         shared = {"left": False, "right": False}
-        for other in self.shapes:
-            if other is shape:
-                continue
-            ox1, oy1, ox2, oy2 = other.coords
-            if abs(ox1 - x1) < 1e-6 or abs(ox2 - x1) < 1e-6:
-                overlap = min(y2, oy2) - max(y1, oy1)
-                if overlap > 0:
-                    shared["left"] = True
-            if abs(ox1 - x2) < 1e-6 or abs(ox2 - x2) < 1e-6:
-                overlap = min(y2, oy2) - max(y1, oy1)
-                if overlap > 0:
-                    shared["right"] = True
+        for side, x in (("left", x1), ("right", x2)):
+            for other, _side in self._shape_index.vertical_edges(x - 1e-6, x + 1e-6):
+                if other is shape:
+                    continue
+                ox1, oy1, ox2, oy2 = other.coords
+                if min(y2, oy2) - max(y1, oy1) > 0:
+                    shared[side] = True
+                    break
         return shared
 
     def find_shared_horizontal_edges(self, shape):
         x1, y1, x2, y2 = shape.coords
         shared = {"top": False, "bottom": False}
-        for other in self.shapes:
-            if other is shape:
-                continue
-            ox1, oy1, ox2, oy2 = other.coords
-            if abs(oy1 - y1) < 1e-6 or abs(oy2 - y1) < 1e-6:
-                overlap = min(x2, ox2) - max(x1, ox1)
-                if overlap > 0:
-                    shared["top"] = True
-            if abs(oy1 - y2) < 1e-6 or abs(oy2 - y2) < 1e-6:
-                overlap = min(x2, ox2) - max(x1, ox1)
-                if overlap > 0:
-                    shared["bottom"] = True
+        for side, y in (("top", y1), ("bottom", y2)):
+            for other, _side in self._shape_index.horizontal_edges(y - 1e-6, y + 1e-6):
+                if other is shape:
+                    continue
+                ox1, oy1, ox2, oy2 = other.coords
+                if min(x2, ox2) - max(x1, ox1) > 0:
+                    shared[side] = True
+                    break
         return shared
 
     # -------- 코너 팝업 삭제 --------
@@ -869,6 +1800,8 @@ class Palette:
 
         if shape in self.shapes:
             self.shapes.remove(shape)
+        self._shape_index.remove(shape)
+        self._journal_shape_deleted(shape)
 
         if self.active_shape is shape:
             self.active_shape = None
@@ -880,6 +1813,65 @@ class Palette:
 
     # -------- 마우스 이벤트 --------
 
+    # 한 프레임(idle 콜백)에서 모션 처리에 쓸 시간 예산(초)
+    MOTION_FRAME_BUDGET = 0.012
+
+    def _queue_motion(self, event):
+        """<Motion>: 최신 이벤트만 보관하고 프레임당 한 번 처리하도록 예약"""
+        self._pending_motion = event
+        self._schedule_motion_flush()
+
+    def _queue_drag(self, event):
+        """<B1-Motion>: 최신 드래그 이벤트만 보관 (이전 것은 버림)"""
+        self._pending_drag = event
+        # 드래그 중의 호버 처리는 의미가 없으므로 대기 중인 호버 이벤트도 버림
+        self._pending_motion = None
+        self._schedule_motion_flush()
+
+    def _schedule_motion_flush(self, delay_ms=0):
+        if self._motion_after_id is not None:
+            return
+        try:
+            if delay_ms:
+                self._motion_after_id = self.canvas.after(delay_ms, self._flush_motion)
+            else:
+                self._motion_after_id = self.canvas.after_idle(self._flush_motion)
+        except Exception:
+            self._motion_after_id = None
+            self._flush_motion()
+
+    def _flush_motion(self):
+        """대기 중인 드래그/호버 이벤트를 처리. 드래그가 예산을 다 쓰면 호버는 다음 프레임으로"""
+        self._motion_after_id = None
+        t0 = time.perf_counter()
+        drag, self._pending_drag = self._pending_drag, None
+        if drag is not None:
+            try:
+                self.on_left_drag(drag)
+            except Exception:
+                pass
+        if self._pending_motion is None:
+            return
+        if drag is not None and time.perf_counter() - t0 > self.MOTION_FRAME_BUDGET:
+            self._schedule_motion_flush(delay_ms=16)
+            return
+        move, self._pending_motion = self._pending_motion, None
+        try:
+            self.on_mouse_move(move)
+        except Exception:
+            pass
+
+    def _flush_pending_motion(self):
+        """버튼 누름/뗌 전에 남은 모션을 즉시 처리해 이벤트 순서를 보장"""
+        if self._motion_after_id is not None:
+            try:
+                self.canvas.after_cancel(self._motion_after_id)
+            except Exception:
+                pass
+            self._motion_after_id = None
+        if self._pending_drag is not None or self._pending_motion is not None:
+            self._flush_motion()
+
     def on_mouse_move(self, event):
         if self.moving_shape:
             return
@@ -1015,8 +2007,8 @@ class Palette:
                 return
 
             try:
-                print(f"DEBUG: _diffuser_enter called for item(s)={canvas.find_withtag('current')}")
-                sys.stdout.flush()
+                if PERF.enabled:
+                    PERF.mark('diffuser_enter', 'ui', items=canvas.find_withtag('current'))
                 if self.flow_tooltip_id and self.flow_tooltip_id in self.canvas.find_all():
                     self.canvas.delete(self.flow_tooltip_id)
                     self.flow_tooltip_id = None
@@ -1026,11 +2018,7 @@ class Palette:
             try:
                 text = f"{val:.2f} m3/hr"
                 self._show_flow_tooltip(text, event.x, event.y)
-                try:
-                    print(f"DEBUG: created tooltip (box+text) at {event.x},{event.y} text={text}")
-                    sys.stdout.flush()
-                except Exception:
-                    pass
+                PERF.count('ui.flow_tooltip')
             except Exception:
                 self._hide_flow_tooltip()
         except Exception:
@@ -1113,23 +2101,18 @@ class Palette:
             self.flow_tooltip_canvas = None
 
     def on_left_down(self, event):
-        try:
-            print(f"DEBUG on_left_down ENTRY at ({event.x},{event.y}) widget={event.widget} state=0x{getattr(event, 'state', 0):04x}")
-        except Exception:
-            pass
-
-        try:
-            try:
-                current_widget = self.app.left_notebook.nametowidget(self.app.left_notebook.select())
-            except Exception:
-                current_widget = None
-            is_duct_dbg = (current_widget is getattr(self.app, 'duct_tab', None))
+        self._flush_pending_motion()
+        if PERF.enabled:
             try:
-                print(f"DEBUG on_left_down: notebook_tab={current_widget} is_duct={is_duct_dbg} hvac_active={bool(getattr(self.app, '_active_hvac_name', None))}")
+                try:
+                    current_widget = self.app.left_notebook.nametowidget(self.app.left_notebook.select())
+                except Exception:
+                    current_widget = None
+                PERF.mark('left_down', 'ui', x=event.x, y=event.y, state=getattr(event, 'state', 0),
+                          is_duct=(current_widget is getattr(self.app, 'duct_tab', None)),
+                          hvac_active=bool(getattr(self.app, '_active_hvac_name', None)))
             except Exception:
                 pass
-        except Exception:
-            pass
 
         # corner handle move takes precedence
         if self.corner_hover_shape is not None:
@@ -1170,23 +2153,16 @@ class Palette:
                     try:
                         if self._is_diffuser_item(iid):
                             if iid in self.selected_points:
-                                try:
-                                    self.canvas.itemconfigure(iid, outline='')
-                                except Exception:
-                                    pass
                                 try:
                                     self.selected_points.remove(iid)
                                 except Exception:
                                     pass
                             else:
-                                try:
-                                    self.canvas.itemconfigure(iid, outline='red', width=2)
-                                except Exception:
-                                    pass
                                 try:
                                     self.selected_points.add(iid)
                                 except Exception:
                                     pass
+                            self._set_point_states({iid: self._point_state_for(iid)})
                             try:
                                 if getattr(self.app, 'duct_selected_label_var', None) is not None:
                                     self.app.duct_selected_label_var.set(f"선택 디퓨저: {len(self.selected_points)}")
@@ -1327,10 +2303,8 @@ class Palette:
                                                                                     outline='black', dash=(), width=2, fill='yellow', tags=('rect_select',))
                                 except Exception:
                                     self.rect_select_id = None
-                            try:
-                                print(f"DEBUG on_left_drag: auto-began rect at ({event.x},{event.y}) id={self.rect_select_id} ctrl={self.rect_select_ctrl}")
-                            except Exception:
-                                pass
+                            if PERF.enabled:
+                                PERF.mark('rect_select_begin', 'ui', x=event.x, y=event.y, ctrl=self.rect_select_ctrl)
                             try:
                                 # ensure rectangle is on top so it's visible above shapes
                                 if getattr(self, 'overlay', None) and self.rect_select_id in self.overlay.find_all():
@@ -1514,10 +2488,9 @@ class Palette:
 
     def on_left_up(self, event):
         """Handle left mouse button release: finish moves/drags and finalize rect selection."""
-        try:
-            print(f"DEBUG on_left_up ENTRY at ({event.x},{event.y}) widget={event.widget}")
-        except Exception:
-            pass
+        self._flush_pending_motion()
+        if PERF.enabled:
+            PERF.mark('left_up', 'ui', x=event.x, y=event.y)
         if self.moving_shape:
             self.clear_edge_snap_highlight(self.moving_shape)
         self.moving_shape = None
@@ -1530,6 +2503,8 @@ class Palette:
         self.drag_start_mouse_pos = None
         self.drag_start_coords = None
         self.hide_length_tooltip()
+        # 드래그 편집 결과를 저널에 기록
+        self._schedule_journal()
 
         # finalize rectangle selection if active
         try:
@@ -1564,20 +2539,17 @@ class Palette:
                     maxx = max(x0, x1)
                     maxy = max(y0, y1)
                     mode = 'invert' if getattr(self, 'rect_select_ctrl', False) else 'replace'
-                    try:
-                        print(f"DEBUG on_left_up: rect ({minx},{miny})-({maxx},{maxy}) mode={mode}")
-                    except Exception:
-                        pass
+                    if PERF.enabled:
+                        PERF.mark('rect_select', 'ui', minx=minx, miny=miny, maxx=maxx, maxy=maxy, mode=mode)
                     # clear the stored ctrl flag for next operation
                     try:
                         self.rect_select_ctrl = False
                     except Exception:
                         pass
-                    self._select_points_in_rect(minx, miny, maxx, maxy, mode=mode)
-                    try:
-                        print(f"DEBUG on_left_up: selection_count={len(getattr(self, 'selected_points', set()))}")
-                    except Exception:
-                        pass
+                    with PERF.span('select_points_in_rect', 'ui', mode=mode):
+                        self._select_points_in_rect(minx, miny, maxx, maxy, mode=mode)
+                    if PERF.enabled:
+                        PERF.mark('rect_select_done', 'ui', count=len(getattr(self, 'selected_points', set())))
                 except Exception:
                     pass
         except Exception:
@@ -1588,118 +2560,45 @@ class Palette:
 
         mode: 'replace' (default) will clear existing selection and set new selection.
               'invert' will invert selection state for items inside the rect.
+
+        Candidates come from canvas.find_overlapping() on the rectangle filtered by the
+        'point' tag, and the HVAC assignment set is computed once per call.
         """
         try:
-            # Collect candidate items from two sources:
-            # 1) canvas items tagged 'point' (if diffusers were created with that tag)
-            # 2) diffuser IDs tracked in generated_space_labels (if available)
-            items_set = set()
+            # Candidates: items overlapping the rectangle that carry the 'point' tag
+            # (every diffuser is created with it), so the cost follows the rectangle contents
             try:
-                for iid in self.canvas.find_withtag('point'):
-                    items_set.add(iid)
+                items = {iid for iid in self.canvas.find_overlapping(minx, miny, maxx, maxy)
+                         if 'point' in self.canvas.gettags(iid)}
             except Exception:
-                pass
-            # include diffuser ids tracked on generated labels
-            try:
-                for lab in getattr(self, 'generated_space_labels', []):
-                    for did in lab.get('diffuser_ids', []) or []:
-                        try:
-                            items_set.add(int(did))
-                        except Exception:
-                            pass
-            except Exception:
-                pass
-            items = list(items_set)
+                items = self._point_item_ids()
+            # ids assigned to any HVAC system (assigned items are drawn red)
+            assigned_all = self._assigned_point_ids()
             # If replace mode, start with a fresh selection. If invert, toggle membership.
             if mode == 'replace':
                 current_selected = set()
             else:
                 current_selected = set(self.selected_points)
 
+            states = {}
             for iid in items:
                 coords = self.canvas.coords(iid)
                 if not coords or len(coords) < 4:
                     continue
                 cx = (coords[0] + coords[2]) / 2
                 cy = (coords[1] + coords[3]) / 2
-                if minx <= cx <= maxx and miny <= cy <= maxy:
-                    if mode == 'invert':
-                        # toggle
-                        if iid in current_selected:
-                            try:
-                                current_selected.remove(iid)
-                            except Exception:
-                                pass
-                            try:
-                                # if this item is assigned to any HVAC, keep it red; else clear
-                                assigned = False
-                                try:
-                                    for m in getattr(self.app, 'hvac_map', {}).values():
-                                        try:
-                                            ids_set = set(int(x) if isinstance(x, (int, str)) and str(x).isdigit() else x for x in (m.get('ids', set()) or set()))
-                                        except Exception:
-                                            ids_set = set(m.get('ids', set()) or set())
-                                        if iid in ids_set:
-                                            assigned = True
-                                            break
-                                except Exception:
-                                    assigned = False
-                                if assigned:
-                                    self.canvas.itemconfigure(iid, outline='red', width=2)
-                                else:
-                                    self.canvas.itemconfigure(iid, outline='')
-                            except Exception:
-                                pass
-                        else:
-                            try:
-                                current_selected.add(iid)
-                            except Exception:
-                                pass
-                            try:
-                                # when user selects via drag, show selected-but-unassigned as blue
-                                assigned = False
-                                try:
-                                    for m in getattr(self.app, 'hvac_map', {}).values():
-                                        try:
-                                            ids_set = set(int(x) if isinstance(x, (int, str)) and str(x).isdigit() else x for x in (m.get('ids', set()) or set()))
-                                        except Exception:
-                                            ids_set = set(m.get('ids', set()) or set())
-                                        if iid in ids_set:
-                                            assigned = True
-                                            break
-                                except Exception:
-                                    assigned = False
-                                if assigned:
-                                    self.canvas.itemconfigure(iid, outline='red', width=2)
-                                else:
-                                    self.canvas.itemconfigure(iid, outline='blue')
-                            except Exception:
-                                pass
-                    else:
-                        try:
-                            current_selected.add(iid)
-                        except Exception:
-                            pass
-                        # visually mark selection: blue if unassigned, red if assigned
-                        try:
-                            assigned = False
-                            try:
-                                for m in getattr(self.app, 'hvac_map', {}).values():
-                                    try:
-                                        ids_set = set(int(x) if isinstance(x, (int, str)) and str(x).isdigit() else x for x in (m.get('ids', set()) or set()))
-                                    except Exception:
-                                        ids_set = set(m.get('ids', set()) or set())
-                                    if iid in ids_set:
-                                        assigned = True
-                                        break
-                            except Exception:
-                                assigned = False
-                            if assigned:
-                                self.canvas.itemconfigure(iid, outline='red', width=2)
-                            else:
-                                self.canvas.itemconfigure(iid, outline='blue')
-                        except Exception:
-                            pass
+                if not (minx <= cx <= maxx and miny <= cy <= maxy):
+                    continue
+                if mode == 'invert' and iid in current_selected:
+                    # toggle off
+                    current_selected.discard(iid)
+                    state = ''
+                else:
+                    current_selected.add(iid)
+                    # when user selects via drag, show selected-but-unassigned as blue
+                    state = 'selected'
+                states[iid] = 'assigned' if iid in assigned_all else state
+            self._set_point_states(states)
             # finalize selection set
             try:
                 self.selected_points = set(current_selected)
@@ -1714,38 +2613,96 @@ class Palette:
         except Exception as e:
             print(f"select_points_in_rect error: {e}")
 
-    def _clear_point_selection(self):
+    def _point_item_ids(self):
+        """선택 가능한 점(디퓨저) 아이템 id 집합: 'point' 태그 (디퓨저는 모두 이 태그로 만든다)"""
+        try:
+            return set(self.canvas.find_withtag('point'))
+        except Exception:
+            return set()
+
+    def _assigned_point_ids(self):
+        """HVAC 계통에 할당된 모든 점 id 집합 (int로 정규화)"""
+        hvac_map = getattr(self.app, 'hvac_map', None)
+        if isinstance(hvac_map, HvacMap):
+            return hvac_map.assigned_ids(self)
+        assigned_all = set()
         try:
-            # compute global set of assigned ids so assigned items stay red
-            assigned_all = set()
+            for m in (hvac_map or {}).values():
+                if m.get('palette') is self:
+                    assigned_all.update(HvacMap.normalize_ids(m.get('ids', set())))
+        except Exception:
+            pass
+        return assigned_all
+
+    # -------- 점(디퓨저) 상태 태그 --------
+
+    # 할당 -> 빨강, 선택(미할당) -> 파랑. 스타일은 태그 단위로 적용한다.
+    POINT_STATE_TAGS = {'assigned': 'pt_assigned', 'selected': 'pt_selected'}
+    POINT_DIRTY_TAG = 'pt_dirty'
+    POINT_STYLABLE_TYPES = ('oval', 'rectangle', 'polygon', 'arc')
+
+    def _point_state_for(self, iid, assigned_all=None):
+        if assigned_all is None:
+            assigned_all = self._assigned_point_ids()
+        if iid in assigned_all:
+            return 'assigned'
+        if iid in self.selected_points:
+            return 'selected'
+        return ''
+
+    def _set_point_states(self, states):
+        """점 아이템 상태 갱신: states {iid: 'assigned' | 'selected' | ''}
+
+        상태가 바뀐 id만 다시 태그하고, 윤곽선은 태그식 itemconfigure 몇 번으로 적용한다.
+        """
+        canvas = self.canvas
+        cache = self._point_state
+        tags = self.POINT_STATE_TAGS
+        dirty = self.POINT_DIRTY_TAG
+        changed = False
+        for iid, state in states.items():
+            old = cache.get(iid, '')
+            if old == state:
+                continue
             try:
-                for m in getattr(self.app, 'hvac_map', {}).values():
-                    try:
-                        for iid in m.get('ids', set()) or set():
-                            try:
-                                assigned_all.add(int(iid))
-                            except Exception:
-                                assigned_all.add(iid)
-                    except Exception:
-                        continue
+                # 텍스트/선 등 outline 옵션이 없는 아이템은 태그식 itemconfigure를 깨뜨림
+                if canvas.type(iid) not in self.POINT_STYLABLE_TYPES:
+                    if state:
+                        cache[iid] = state
+                    else:
+                        cache.pop(iid, None)
+                    continue
+                if old:
+                    canvas.dtag(iid, tags[old])
+                if state:
+                    canvas.addtag_withtag(tags[state], iid)
+                canvas.addtag_withtag(dirty, iid)
             except Exception:
-                assigned_all = set()
+                continue
+            if state:
+                cache[iid] = state
+            else:
+                cache.pop(iid, None)
+            changed = True
+        if not changed:
+            return
+        try:
+            canvas.itemconfigure(f"{dirty}&&{tags['assigned']}", outline='red', width=2)
+            canvas.itemconfigure(f"{dirty}&&{tags['selected']}", outline='blue')
+            canvas.itemconfigure(f"{dirty}&&!{tags['assigned']}&&!{tags['selected']}", outline='')
+        except Exception:
+            pass
+        try:
+            canvas.dtag(dirty)
+        except Exception:
+            pass
 
-            for iid in list(self.selected_points):
-                try:
-                    # if this item is assigned to any HVAC, leave it red; otherwise clear outline
-                    if iid in assigned_all:
-                        try:
-                            self.canvas.itemconfigure(iid, outline='red', width=2)
-                        except Exception:
-                            pass
-                    else:
-                        try:
-                            self.canvas.itemconfigure(iid, outline='')
-                        except Exception:
-                            pass
-                except Exception:
-                    pass
+    def _clear_point_selection(self):
+        try:
+            # assigned items stay red, everything else loses its outline
+            assigned_all = self._assigned_point_ids()
+            self._set_point_states({iid: ('assigned' if iid in assigned_all else '')
+                                    for iid in self.selected_points})
             # clear selection set (assigned items remain highlighted red)
             self.selected_points.clear()
             try:
@@ -1785,63 +2742,124 @@ class Palette:
         x1, y1, x2, y2 = coords
         snap = self.snap_tolerance
 
-        candidate_positions = []
-        for other in self.shapes:
+        # 색인에서 현재 변 위치 ±snap 범위의 다른 도형 변 좌표만 후보로
+        if side in ("top", "bottom"):
+            cur = y1 if side == "top" else y2
+            found = self._shape_index.horizontal_edges(cur - snap, cur + snap)
+        else:
+            cur = x1 if side == "left" else x2
+            found = self._shape_index.vertical_edges(cur - snap, cur + snap)
+
+        best = cur
+        best_diff = None
+        for other, other_side in found:
             if other is shape:
                 continue
-            ox1, oy1, ox2, oy2 = other.coords
-            if side in ("top", "bottom"):
-                candidate_positions.extend([oy1, oy2])
-            else:
-                candidate_positions.extend([ox1, ox2])
+            pos = other.coords[("left", "top", "right", "bottom").index(other_side)]
+            diff = abs(pos - cur)
+            if diff <= snap and (best_diff is None or diff < best_diff):
+                best_diff = diff
+                best = pos
 
-        if not candidate_positions:
+        if best_diff is None:
             return coords, False
 
-        snapped = False
-        if side in ("top", "bottom"):
-            cur_y = y1 if side == "top" else y2
-            best_y = cur_y
-            best_diff = None
-            for py in candidate_positions:
-                diff = abs(py - cur_y)
-                if diff <= snap and (best_diff is None or diff < best_diff):
-                    best_diff = diff
-                    best_y = py
-            if best_diff is not None:
-                snapped = True
-                if side == "top":
-                    y1 = best_y
-                else:
-                    y2 = best_y
+        if side == "top":
+            y1 = best
+        elif side == "bottom":
+            y2 = best
+        elif side == "left":
+            x1 = best
         else:
-            cur_x = x1 if side == "left" else x2
-            best_x = cur_x
-            best_diff = None
-            for px in candidate_positions:
-                diff = abs(px - cur_x)
-                if diff <= snap and (best_diff is None or diff < best_diff):
-                    best_diff = diff
-                    best_x = px
-            if best_diff is not None:
-                snapped = True
-                if side == "left":
-                    x1 = best_x
-                else:
-                    x2 = best_x
-
-        return (x1, y1, x2, y2), snapped
+            x2 = best
+        return (x1, y1, x2, y2), True
 
     # -------- 다시 그리기 --------
 
+    @PERF.timed(cat='redraw')
     def redraw_shape(self, shape):
-        self.canvas.delete(shape.rect_id)
+        """도형 좌표 변경을 캔버스에 반영.
+
+        기존 아이템이 살아 있으면 coords/itemconfigure로 제자리 갱신하여 id를 유지하고
+        (드래그 중 캔버스 아이템 생성/삭제 없음), 없어졌거나 태그가 어긋난 경우에만 다시 만든다.
+        """
+        self._mark_visibility_dirty()
+        self._journal_shape(shape, schedule=False)
+        try:
+            in_place = f"shape_{shape.shape_id}" in self.canvas.gettags(shape.side_ids["top"])
+        except Exception:
+            in_place = False
+        if not in_place:
+            self._recreate_shape_items(shape)
+            return
+
+        x1, y1, x2, y2 = shape.coords
+        color = shape.color
+
+        self.canvas.coords(shape.rect_id, x1, y1, x2, y2)
+        # 생성 경로와 같은 규칙: 검정이 아니면 점선
+        self.canvas.itemconfigure(shape.rect_id, outline=color,
+                                  dash=() if color == "black" else (3, 2))
+        side_coords = {"top": (x1, y1, x2, y1), "bottom": (x1, y2, x2, y2),
+                       "left": (x1, y1, x1, y2), "right": (x2, y1, x2, y2)}
+        for side_name, lid in shape.side_ids.items():
+            self.canvas.coords(lid, *side_coords[side_name])
+            self.canvas.itemconfigure(lid, fill=color, width=3)
+
+        self.update_dimensions_for_shape(shape, x1, y1, x2, y2)
+        # 숨겨 둔 아이템도 방금 현재 화면 좌표로 맞췄다
+        self._sync_hidden_items([shape.rect_id] + list(shape.side_ids.values()) + self._dim_item_ids(shape))
+
+        # 좌표가 바뀐 도형의 색인 갱신
+        self._shape_index.update(shape)
+
+        self.bring_shape_to_front(shape)
+
+    def update_dimensions_for_shape(self, shape, x1, y1, x2, y2):
+        """draw_dimensions_for_shape로 만든 치수 아이템을 제자리에서 갱신"""
+        offset = 30
+        tick_len = 8
+        text_offset = 4
+        color = shape.color
+
+        top = shape.dim_items["top"]
+        dim_y = y1 - offset
+        self.canvas.coords(top["lines"][0], x1, dim_y, x2, dim_y)
+        self.canvas.coords(top["ticks"][0], x1, dim_y - tick_len / 2, x1, dim_y + tick_len / 2)
+        self.canvas.coords(top["ticks"][1], x2, dim_y - tick_len / 2, x2, dim_y + tick_len / 2)
+        self.canvas.coords(top["text"], (x1 + x2) / 2, dim_y - text_offset)
+        self.canvas.itemconfigure(top["text"], text=f"{self.pixel_to_meter(x2 - x1):.2f} {self.unit}", fill=color)
+
+        left = shape.dim_items["left"]
+        dim_x = x1 - offset
+        self.canvas.coords(left["lines"][0], dim_x, y1, dim_x, y2)
+        self.canvas.coords(left["ticks"][0], dim_x - tick_len / 2, y1, dim_x + tick_len / 2, y1)
+        self.canvas.coords(left["ticks"][1], dim_x - tick_len / 2, y2, dim_x + tick_len / 2, y2)
+        self.canvas.coords(left["text"], dim_x - text_offset, (y1 + y2) / 2)
+        self.canvas.itemconfigure(left["text"], text=f"{self.pixel_to_meter(y2 - y1):.2f} {self.unit}", fill=color)
+
+        for lid in top["lines"] + top["ticks"] + left["lines"] + left["ticks"]:
+            self.canvas.itemconfigure(lid, fill=color)
+
+    def _recreate_shape_items(self, shape):
+        """도형의 캔버스 아이템을 모두 지우고 다시 생성 (아이템이 사라진 경우의 fallback)"""
+        if shape.rect_id is not None:
+            self.canvas.delete(shape.rect_id)
         for lid in shape.side_ids.values():
             self.canvas.delete(lid)
         for part in shape.dim_items.values():
             for lid in part["lines"] + part["ticks"] + [part["text"]]:
                 self.canvas.delete(lid)
 
+        self._create_shape_items(shape)
+        # 좌표가 바뀐 도형의 색인 갱신
+        self._shape_index.update(shape)
+        self._apply_lod_to_shape(shape)
+
+        self.bring_shape_to_front(shape)
+
+    def _create_shape_items(self, shape):
+        """모델(shape.coords / color)에서 사각형, 네 변, 치수 아이템을 만들어 id를 채운다"""
         x1, y1, x2, y2 = shape.coords
         color = shape.color
 
@@ -1867,8 +2885,6 @@ class Palette:
         shape.side_ids = side_ids
         shape.dim_items = dim_items
 
-        self.bring_shape_to_front(shape)
-
     # -------- 치수 클릭 (공유벽 고정 규칙 포함) --------
 
     def on_dim_width_click(self, event):
@@ -2278,43 +3294,18 @@ class Palette:
                                                     sel_detail_local = detail_combo.get().strip() if detail_combo.get() else None
                                                 except Exception:
                                                     sel_detail_local = None
-                                                local_rows = getattr(self.app, 'last_csv_rows', None)
-                                                headers_local = local_rows[0] if local_rows else []
-                                                preferred = []
-                                                if sel_detail_local:
-                                                    for ci, h in enumerate(headers_local):
-                                                        try:
-                                                            if sel_detail_local.lower() in str(h).lower():
-                                                                preferred.append(ci)
-                                                        except Exception:
-                                                            continue
-                                                # build candidate list from preferred columns; if none, leave unchanged
-                                                cand = []
-                                                if preferred:
-                                                    for ci in preferred:
-                                                        try:
-                                                            v = float(local_rows[1][ci]) if local_rows and ci < len(local_rows[1]) else None
-                                                            if v is not None:
-                                                                cand.append((ci, v))
-                                                        except Exception:
-                                                            continue
                                                 # select column whose second-row value is > tval and closest
-                                                chosen = None
-                                                if cand:
-                                                    greater_local = [c for c in cand if c[1] > tval]
-                                                    if greater_local:
-                                                        chosen = min(greater_local, key=lambda x: x[1])
-                                                    else:
-                                                        lesser_local = [c for c in cand if c[1] <= tval]
-                                                        if lesser_local:
-                                                            chosen = min(lesser_local, key=lambda x: abs(x[1] - tval))
+                                                # (header-matched columns only; if none, leave unchanged)
+                                                catalog = self.app.get_equipment_catalog()
+                                                nci = None
+                                                if catalog is not None and sel_detail_local:
+                                                    nci = catalog.select(sel_detail_local, tval, strict=True)
                                                 # if chosen found, update csv_shown values to that column
-                                                if chosen:
-                                                    nci = chosen[0]
+                                                if nci is not None:
                                                     try:
-                                                        new_values = [((r[0] if len(r) > 0 else ''), (r[nci] if nci < len(r) else '')) for r in (local_rows if local_rows else [])]
+                                                        new_values = catalog.column_values(nci)
                                                         csv_shown['col_index'] = nci
-                                                        csv_shown['header'] = headers_local[nci] if nci < len(headers_local) else csv_shown.get('header', '')
+                                                        csv_shown['header'] = catalog.headers[nci] if nci < len(catalog.headers) else csv_shown.get('header', '')
                                                         csv_shown['values'] = new_values
                                                         # ensure quantity row is first
                                                         try:
@@ -2433,8 +3424,9 @@ class Palette:
                             pass
                         return
 
-                    headers = rows[0]
-                    second = rows[1]
+                    # header keyword lookup / sorted capacities are compiled once per loaded CSV
+                    catalog = self.app.get_equipment_catalog()
+                    headers = catalog.headers
                     # prefer columns where the CSV first-row header matches the selected 공조상세
                     try:
                         # if HVAC is not 개별공조 (2), ignore detail_combo value even if present
@@ -2445,22 +3437,13 @@ class Palette:
                     except Exception:
                         sel_detail = None
 
-                    headers = rows[0]
-                    preferred_cols = []
-                    if sel_detail:
-                        for ci, h in enumerate(headers):
-                            try:
-                                if sel_detail.lower() in str(h).lower():
-                                    preferred_cols.append(ci)
-                            except Exception:
-                                continue
+                    preferred_cols = catalog.columns_for(sel_detail) if sel_detail else ()
 
-                    candidates = []
                     # if sel_detail provided but no preferred columns found, do not show table
                     if sel_detail and not preferred_cols:
                         # No header match: show table with empty values and DO NOT run fallback selection.
                         try:
-                            first_col_vals = [((r[0] if len(r) > 0 else ''), '') for r in rows]
+                            first_col_vals = catalog.column_values(None)
                         except Exception:
                             first_col_vals = []
                         csv_shown = {
@@ -2513,24 +3496,9 @@ class Palette:
                             pass
                         return
 
-                    # if we have preferred columns from header matching, only consider them
-                    if preferred_cols:
-                        for ci in preferred_cols:
-                            try:
-                                v = float(second[ci]) if ci < len(second) else None
-                                if v is not None:
-                                    candidates.append((ci, v))
-                            except Exception:
-                                continue
-                    else:
-                        for ci, val in enumerate(second):
-                            try:
-                                v = float(val)
-                                candidates.append((ci, v))
-                            except Exception:
-                                continue
-
-                    if not candidates:
+                    # only header-matched columns are considered when there are any
+                    sel_key = sel_detail if preferred_cols else None
+                    if not catalog.has_capacity(sel_key):
                         if tbl is not None:
                             try:
                                 tbl.destroy()
@@ -2541,7 +3509,6 @@ class Palette:
                         return
 
                     # Special selection when we have preferred columns (header match)
-                    import math
                     # if user previously saved a quantity for this lab, prefer it
                     stored_qty = None
                     try:
@@ -2550,9 +3517,6 @@ class Palette:
                     except Exception:
                         stored_qty = None
                     if preferred_cols and sel_detail:
-                        # consider only the candidate values (from preferred columns)
-                        vals_only = [c[1] for c in candidates]
-                        max_val = max(vals_only) if vals_only else 0.0
                         # Assumptions:
                         # - If total_kw < max_val -> divide total by 2, use qty=2.
                         # - If total_kw > max_val -> compute ratio = total_kw / max_val,
@@ -2565,39 +3529,15 @@ class Palette:
                             total_kw = 0.0
 
                         # if stored_qty exists, use it; else compute per original logic
-                        if stored_qty is not None:
-                            qty = stored_qty
-                            target = total_kw / max(1, qty)
-                        else:
-                            if max_val > 0 and total_kw < max_val:
-                                target = total_kw / 2.0
-                                qty = 2
-                            else:
-                                if max_val > 0:
-                                    ratio = total_kw / max_val
-                                else:
-                                    ratio = total_kw
-                                qty = int(math.ceil(ratio)) + 2
-                                if qty <= 0:
-                                    qty = 2
-                                target = total_kw / qty if qty != 0 else total_kw
+                        qty, target = catalog.plan_quantity(sel_detail, total_kw, stored_qty)
 
                         # pick candidate column closest above target, else largest below
-                        greater = [c for c in candidates if c[1] >= target]
-                        if greater:
-                            best = min(greater, key=lambda x: x[1])
-                        else:
-                            lesser = [c for c in candidates if c[1] < target]
-                            if lesser:
-                                best = max(lesser, key=lambda x: x[1])
-                            else:
-                                best = candidates[0]
-                        ci, cv = best
+                        ci = catalog.select(sel_detail, target)
                         csv_shown = {
                             'col_index': ci,
-                            'header': headers[ci] if ci < len(headers) else f'C{ci+1}',
+                            'header': catalog.header_of(ci),
                             # values: tuples of (first-column title, selected-column value) per row
-                            'values': [((r[0] if len(r) > 0 else ''), (r[ci] if ci < len(r) else '')) for r in rows]
+                            'values': catalog.column_values(ci)
                         }
                         # prepend quantity row with computed qty
                         try:
@@ -2607,21 +3547,12 @@ class Palette:
                             pass
                     else:
                         # default selection logic (no header-priority special rules)
-                        greater = [c for c in candidates if c[1] >= total_kw]
-                        if greater:
-                            best = min(greater, key=lambda x: x[1])
-                        else:
-                            lesser = [c for c in candidates if c[1] < total_kw]
-                            if lesser:
-                                best = max(lesser, key=lambda x: x[1])
-                            else:
-                                best = candidates[0]
-                        ci, cv = best
+                        ci = catalog.select(None, total_kw)
                         csv_shown = {
                             'col_index': ci,
-                            'header': headers[ci] if ci < len(headers) else f'C{ci+1}',
+                            'header': catalog.header_of(ci),
                             # values: tuples of (first-column title, selected-column value) per row
-                            'values': [((r[0] if len(r) > 0 else ''), (r[ci] if ci < len(r) else '')) for r in rows]
+                            'values': catalog.column_values(ci)
                         }
                         # If we found preferred columns by header match, prepend a quantity row as before
                         try:
@@ -2849,6 +3780,7 @@ class Palette:
                             lab['hvac_qty'] = qv
             except Exception:
                 pass
+            self._journal_label(lab, "texts", "hvac")
             dlg.destroy()
 
         def on_cancel():
@@ -2937,6 +3869,7 @@ class Palette:
             lab["heat_norm_id"],
             text=f"Norm: {new_val:.2f} W/m²"
         )
+        self._journal_label(lab, "texts")
 
     def on_space_heat_equip_click(self, event):
         item_id = event.widget.find_closest(event.x, event.y)[0]
@@ -2962,6 +3895,7 @@ class Palette:
             lab["heat_equip_id"],
             text=f"Equip: {new_val:.2f} W/m²"
         )
+        self._journal_label(lab, "texts")
 
     # -------- 오른쪽 클릭 --------
 
@@ -3001,6 +3935,7 @@ class Palette:
 
     # -------- Shapely 기반 자동 공간 생성 (텍스트 유지/새로 생성 규칙) --------
 
+    @PERF.timed(cat='rooms')
     def auto_generate_space_labels(self):
         if not self.shapes:
             messagebox.showinfo("자동생성", "도형이 없습니다.")
@@ -3043,7 +3978,7 @@ class Palette:
         for lab in self.generated_space_labels:
             poly_old = lab["polygon"]
             try:
-                name_coords = self.canvas.coords(lab["name_id"])
+                name_coords = self._item_coords(lab["name_id"])
                 if name_coords:
                     nx, ny = name_coords[0], name_coords[1]
                 else:
@@ -3213,6 +4148,7 @@ class Palette:
                         self.canvas.delete(did)
 
         self.generated_space_labels = new_labels
+        self._journal_reset()
 
     # -------- 일괄 발열량 적용 --------
 
@@ -3225,6 +4161,7 @@ class Palette:
                 self.canvas.itemconfigure(lab["heat_norm_id"], text=f"Norm: {value:.2f} W/m²")
             except Exception:
                 continue
+            self._journal_label(lab, "texts")
 
     def apply_equip_to_all(self, value: float):
         if not self.generated_space_labels:
@@ -3235,10 +4172,14 @@ class Palette:
                 self.canvas.itemconfigure(lab["heat_equip_id"], text=f"Equip: {value:.2f} W/m²")
             except Exception:
                 continue
+            self._journal_label(lab, "texts")
 
+    @PERF.timed(cat='flow')
     def compute_and_apply_supply_flow(self):
         if not self.generated_space_labels:
             return 0.0
+        # 면적/발열량은 라벨 텍스트에서 읽으므로 지연 생성 중인 라벨을 먼저 완성
+        self._flush_pending_realize()
 
         try:
             indoor_t = float(self.app.indoor_temp_entry.get())
@@ -3306,7 +4247,7 @@ class Palette:
                 if not updated:
                     # remove any stray flow texts near the area to avoid duplicates
                     try:
-                        x, y = self.canvas.coords(lab["area_id"])
+                        x, y = self._item_coords(lab["area_id"])
                         # small bbox around area text
                         bx1, by1 = x - 10, y
                         bx2, by2 = x + 10, y + 28
@@ -3323,7 +4264,7 @@ class Palette:
 
                     # create new flow text and tag it
                     try:
-                        x, y = self.canvas.coords(lab["area_id"])
+                        x, y = self._item_coords(lab["area_id"])
                         fid = self.canvas.create_text(x, y + 14, text=f"Flow: {flow_text} m3/hr",
                                                       fill="purple", font=("Arial", 10), tags=("flow",))
                         lab["flow_id"] = fid
@@ -3343,6 +4284,7 @@ class Palette:
 
         return total_flow
 
+    @PERF.timed(cat='flow')
     def _distribute_supply_for_lab(self, lab: dict):
         """Distribute lab['supply_flow_value'] equally among supply diffusers in lab.
         Create/update small text labels near each supply diffuser and store numeric mapping
@@ -3502,6 +4444,7 @@ class Palette:
         fallback = self._select_points_greedy_maxmin(pts, k)
         return fallback
 
+    @PERF.timed(cat='placement')
     def _generate_diffuser_points_for_poly(self, poly, N: int):
         if N <= 0:
             return []
@@ -3643,6 +4586,7 @@ class Palette:
         - inside_count / outside_count: counts of ALL diffuser items (from any lab) whose centers are inside/outside the room polygon
         This lets us detect when diffusers exist on the canvas but are not assigned to the target lab (or vice versa).
         """
+        self._flush_pending_realize()
         inside = 0
         outside = 0
         outside_ids = []
@@ -3664,7 +4608,7 @@ class Palette:
         # check diffuser ids from all labs (spatial containment)
         for lab in self.generated_space_labels:
             for did in lab.get("diffuser_ids", []):
-                coords = self.canvas.coords(did)
+                coords = self._item_coords(did)
                 if not coords or len(coords) < 4:
                     continue
                 cx = (coords[0] + coords[2]) / 2.0
@@ -3682,6 +4626,7 @@ class Palette:
 
         return assigned_count, inside, outside, outside_ids
 
+    @PERF.timed(cat='placement')
     def auto_place_diffusers(self, area_per_diffuser: float):
         """각 실의 면적 기준으로 디퓨저 개수 산정 및 배치"""
         if not self.generated_space_labels:
@@ -3717,10 +4662,11 @@ class Palette:
         except Exception:
             pass
 
-        # 각 lab 내부의 ID 리스트들도 초기화
+        # 각 lab 내부의 ID 리스트들도 초기화 (배치 결과는 idle 시점에 저널에 기록)
         for lab in self.generated_space_labels:
             lab["diffuser_ids"] = []
             lab["diffuser_label_ids"] = []
+            self._journal_label(lab, "diffusers")
 
         # 각 실별 디퓨저 생성
         for lab in self.generated_space_labels:
@@ -3788,8 +4734,8 @@ class Palette:
                     is_supply = ((ri + ci) % 2 == 0)
                     color = "green" if is_supply else "skyblue"
                     tag2 = "supply" if is_supply else "return"
-                    # assemble tags: diffuser, supply/return tag, and hvac tag if available
-                    tgs = ["diffuser", tag2]
+                    # assemble tags: diffuser, supply/return tag, selectable point, and hvac tag if available
+                    tgs = ["diffuser", tag2, "point"]
                     try:
                         hv_txt = lab.get('hvac_text') if lab else None
                         if hv_txt:
@@ -3834,7 +4780,7 @@ class Palette:
                 df_map = lab.get('diffuser_flows', {}) if lab else {}
                 for did in list(diffuser_ids):
                     try:
-                        coords = self.canvas.coords(did)
+                        coords = self._item_coords(did)
                         if not coords or len(coords) < 4:
                             continue
                         cx = (coords[0] + coords[2]) / 2.0
@@ -3887,8 +4833,18 @@ class Palette:
 
     # -------- 저장/불러오기용 직렬화 --------
 
+    @PERF.timed(cat='io')
     def to_dict(self):
         """현재 Palette 상태를 JSON 직렬화용 dict로 반환"""
+        if self.is_dormant():
+            # 비활성 탭은 잠시 실현해서 직렬화한 뒤 다시 비운다
+            if not self.rehydrate():
+                raise RuntimeError("비활성 탭을 다시 그리지 못해 저장할 수 없습니다.")
+            try:
+                return self.to_dict()
+            finally:
+                self.dehydrate()
+        self._flush_pending_realize()
         data = {
             "scale": self.scale,
             "shapes": [],
@@ -3902,49 +4858,69 @@ class Palette:
             })
 
         for lab in self.generated_space_labels:
-            # 텍스트와 위치
-            name_x, name_y = self.canvas.coords(lab["name_id"])
-            norm_x, norm_y = self.canvas.coords(lab["heat_norm_id"])
-            equip_x, equip_y = self.canvas.coords(lab["heat_equip_id"])
-            area_x, area_y = self.canvas.coords(lab["area_id"])
-            
+            data["labels"].append(self._label_record(lab))
+        # save grid visibility
+        data["show_grid"] = bool(getattr(self, 'show_grid', False))
+        return data
+
+    LABEL_RECORD_PARTS = ("geometry", "texts", "diffusers", "hvac")
+
+    def _label_record(self, lab, parts=LABEL_RECORD_PARTS):
+        """라벨 하나의 저장용 dict (to_dict 형식). parts로 일부 항목만 읽을 수 있음 (저널용)
+
+        geometry: 다각형/텍스트 위치, texts: 텍스트 내용, diffusers: 디퓨저 위치, hvac: 공조 정보
+        """
+        rec = {}
+        if "geometry" in parts:
+            rec["polygon_coords"] = list(lab["polygon"].exterior.coords)
+        if "texts" in parts:
+            rec["name_text"] = self.canvas.itemcget(lab["name_id"], "text")
+            rec["heat_norm_text"] = self.canvas.itemcget(lab["heat_norm_id"], "text")
+            rec["heat_equip_text"] = self.canvas.itemcget(lab["heat_equip_id"], "text")
+            rec["area_text"] = self.canvas.itemcget(lab["area_id"], "text")
+        if "geometry" in parts:
+            # 텍스트 위치
+            for key, item in (("name_pos", "name_id"), ("heat_norm_pos", "heat_norm_id"),
+                              ("heat_equip_pos", "heat_equip_id"), ("area_pos", "area_id")):
+                x, y = self._item_coords(lab[item])
+                rec[key] = [x, y]
+        if "diffusers" in parts:
             # 디퓨저 위치 저장
             diffuser_coords = []
             if "diffuser_ids" in lab:
                 for did in lab["diffuser_ids"]:
-                    coords = self.canvas.coords(did)
+                    coords = self._item_coords(did)
                     if coords:
                         cx = (coords[0] + coords[2]) / 2
                         cy = (coords[1] + coords[3]) / 2
                         diffuser_coords.append([cx, cy])
-
-            data["labels"].append({
-                "polygon_coords": list(lab["polygon"].exterior.coords),
-                "name_text": self.canvas.itemcget(lab["name_id"], "text"),
-                "heat_norm_text": self.canvas.itemcget(lab["heat_norm_id"], "text"),
-                "heat_equip_text": self.canvas.itemcget(lab["heat_equip_id"], "text"),
-                "area_text": self.canvas.itemcget(lab["area_id"], "text"),
-                "name_pos": [name_x, name_y],
-                "heat_norm_pos": [norm_x, norm_y],
-                "heat_equip_pos": [equip_x, equip_y],
-                "area_pos": [area_x, area_y],
-                "diffuser_coords": diffuser_coords
-                ,
-                "hvac_type": int(lab.get("hvac_type", 1)),
-                "hvac_detail": int(lab.get("hvac_detail", 1)) if lab.get("hvac_detail", None) is not None else 0,
-                "hvac_text": lab.get("hvac_text", None),
-                # persist edited quantity and detail text if present
-                "hvac_qty": int(lab.get("hvac_qty")) if lab.get("hvac_qty", None) is not None else None,
-                "hvac_detail_text": lab.get("hvac_detail_text", None)
-            })
-        # save grid visibility
-        data["show_grid"] = bool(getattr(self, 'show_grid', False))
-        return data
-
+            rec["diffuser_coords"] = diffuser_coords
+        if "hvac" in parts:
+            rec["hvac_type"] = int(lab.get("hvac_type", 1))
+            rec["hvac_detail"] = int(lab.get("hvac_detail", 1)) if lab.get("hvac_detail", None) is not None else 0
+            rec["hvac_text"] = lab.get("hvac_text", None)
+            # persist edited quantity and detail text if present
+            rec["hvac_qty"] = int(lab.get("hvac_qty")) if lab.get("hvac_qty", None) is not None else None
+            rec["hvac_detail_text"] = lab.get("hvac_detail_text", None)
+        return rec
+
+    @PERF.timed(cat='io')
     def load_from_dict(self, data: dict):
-        """JSON dict로부터 Palette 상태 복원"""
+        """JSON dict로부터 Palette 상태 복원
+
+        모델(shapes, 도형 색인, generated_space_labels)은 바로 모두 만들고, 캔버스 아이템만
+        화면에 보이는 것부터 idle 시점에 청크 단위로 생성한다(큰 파일 로드 시 UI 멈춤 방지).
+        라벨 텍스트/디퓨저 좌표처럼 캔버스에서 읽는 값이 필요하면 _flush_pending_realize()를 먼저 부른다.
+        """
+        self._cancel_pending_realize()
+        self._dormant = None
         self.canvas.delete("all")
+        self.grid_ids = []
+        self._grid_cache = None
+        self._lod_hidden = {}
+        self._mark_visibility_dirty()
         self.shapes.clear()
+        self._shape_index.clear()
         self.generated_space_labels.clear()
         self.highlight_line_id = None
         self.tooltip_id = None
@@ -3953,74 +4929,51 @@ class Palette:
         self.scale = data.get("scale", 20.0)
         self.next_shape_id = 1
 
-        # 도형 복원
-        for info in data.get("shapes", []):
+        # 1) 모델: 도형(RectShape + 색인)과 라벨 dict를 원래 순서대로 모두 만든다.
+        #    캔버스 아이템 id만 비어 있고, 생성 작업(job)이 나중에 채운다.
+        jobs = []
+        for order, info in enumerate(data.get("shapes", [])):
             coords = info.get("coords", [0, 0, 0, 0])
-            editable = info.get("editable", True)
-            color = info.get("color", "black")
-            s = self.create_rect_shape(
-                coords[0], coords[1], coords[2], coords[3],
-                editable=editable, color=color, push_to_history=False
-            )
-
-        # 라벨 복원
-        for lab in data.get("labels", []):
-            poly = Polygon(lab["polygon_coords"])
-
-            name_x, name_y = lab["name_pos"]
-            norm_x, norm_y = lab["heat_norm_pos"]
-            equip_x, equip_y = lab["heat_equip_pos"]
-            area_x, area_y = lab["area_pos"]
-
-            name_id = self.canvas.create_text(
-                name_x, name_y,
-                text=lab["name_text"], fill="blue", font=("Arial", 11, "bold"),
-                tags=("space_name",)
-            )
-            heat_norm_id = self.canvas.create_text(
-                norm_x, norm_y,
-                text=lab["heat_norm_text"], fill="darkred", font=("Arial", 10),
-                tags=("space_heat_norm",)
-            )
-            heat_equip_id = self.canvas.create_text(
-                equip_x, equip_y,
-                text=lab["heat_equip_text"], fill="darkred", font=("Arial", 10),
-                tags=("space_heat_equip",)
-            )
-            area_id = self.canvas.create_text(
-                area_x, area_y,
-                text=lab["area_text"], fill="green", font=("Arial", 10)
-            )
-            
-            # 디퓨저 복원
-            diffuser_ids = []
-            diffuser_coords = lab.get("diffuser_coords", [])
-            r = 3
-            for (cx, cy) in diffuser_coords:
-                did = self.canvas.create_oval(
-                    cx - r, cy - r, cx + r, cy + r,
-                    fill="green", outline=""
-                )
-                diffuser_ids.append(did)
-
-            # hvac_detail stored as 0 when missing; convert back to None
-            stored_detail = lab.get("hvac_detail", 0)
-            if stored_detail == 0:
-                stored_detail = None
-            self.generated_space_labels.append({
-                "polygon": poly,
-                "name_id": name_id,
-                "heat_norm_id": heat_norm_id,
-                "heat_equip_id": heat_equip_id,
-                "area_id": area_id,
-                "diffuser_ids": diffuser_ids,
-                "hvac_type": int(lab.get("hvac_type", 1)),
-                "hvac_detail": int(stored_detail) if stored_detail is not None else None,
-                "hvac_text": lab.get("hvac_text", None),
-                # restore persisted quantity and detail text if present
-                "hvac_qty": int(lab.get("hvac_qty")) if lab.get("hvac_qty", None) is not None else None,
-                "hvac_detail_text": lab.get("hvac_detail_text", None)
-            })
+            x1, x2 = sorted((coords[0], coords[2]))
+            y1, y2 = sorted((coords[1], coords[3]))
+            shape = RectShape(self.next_shape_id, (x1, y1, x2, y2), None, {}, {},
+                              editable=info.get("editable", True), color=info.get("color", "black"),
+                              view=self._view)
+            self.next_shape_id += 1
+            self.shapes.append(shape)
+            self._shape_index.add(shape)
+            jobs.append(("shape", order, (x1, y1, x2, y2), shape))
+        for order, lab in enumerate(data.get("labels", [])):
+            entry = self._label_model(lab)
+            self.generated_space_labels.append(entry)
+            try:
+                xs = [c[0] for c in lab["polygon_coords"]]
+                ys = [c[1] for c in lab["polygon_coords"]]
+                bbox = (min(xs), min(ys), max(xs), max(ys))
+            except Exception:
+                x, y = lab.get("name_pos", [0, 0])
+                bbox = (x, y, x, y)
+            jobs.append(("label", order, bbox, (entry, lab)))
+
+        # 2) 생성 순서: 현재 뷰포트와 겹치는 항목 먼저, 그다음 뷰포트 중심에서 가까운 순
+        #    (쌓임 순서는 생성 순서와 무관하게 원래 순서로 맞춘다: _place_realized)
+        view = self._viewport_bounds()
+        if view is not None:
+            vx1, vy1, vx2, vy2 = view
+            vcx, vcy = (vx1 + vx2) / 2, (vy1 + vy2) / 2
+
+            def priority(job):
+                bx1, by1, bx2, by2 = job[2]
+                visible = bx2 >= vx1 and bx1 <= vx2 and by2 >= vy1 and by1 <= vy2
+                dist = abs((bx1 + bx2) / 2 - vcx) + abs((by1 + by2) / 2 - vcy)
+                return (0 if visible else 1, dist)
+            jobs.sort(key=priority)
+
+        self._realize_queue = deque(jobs)
+        self._realize_affine = self._view.affine   # 생성 전 줌/팬은 라벨 좌표에 remap
+        self._realized = {"shape": [], "label": []}
+        self._realize_models = {"shape": list(self.shapes), "label": list(self.generated_space_labels)}
+        self._realize_gen = getattr(self, '_realize_gen', 0) + 1
 
         # 태그 바인딩 복원
         self.canvas.tag_bind("dim_width", "<Button-1>", self.on_dim_width_click)
@@ -4032,103 +4985,669 @@ class Palette:
         self.active_shape = None
         self.active_side_name = None
         self.app.update_selected_area_label(self)
-        # restore grid visibility
+        # restore grid visibility (그리드는 모든 항목 생성 후 그림)
         self.show_grid = bool(data.get("show_grid", False))
-        if getattr(self, 'show_grid', False):
-            try:
-                self.draw_grid()
-            except Exception:
-                pass
-
-    # -------- 줌 / 팬 --------
-
-    def on_mouse_wheel(self, event):
-        zoom_in = event.delta > 0
-        self.apply_zoom(zoom_in, event.x, event.y)
-
-    def on_mouse_wheel_linux(self, event):
-        zoom_in = (event.num == 4)
-        self.apply_zoom(zoom_in, event.x, event.y)
-
-    def apply_zoom(self, zoom_in, cx, cy):
-        factor = 1.1 if zoom_in else 1 / 1.1
-        new_scale = self.scale * factor
-        if new_scale < 2.0 or new_scale > 200.0:
-            return
+        # 저널: 라벨은 캔버스 생성 완료를 기다리지 않고 불러온 dict로 기록
+        self._journal_reset(list(data.get("labels", [])))
 
-        self.push_history()
-
-        self.canvas.scale("all", cx, cy, factor, factor)
-        for shape in self.shapes:
-            x1, y1, x2, y2 = shape.coords
-            x1 = cx + (x1 - cx) * factor
-            y1 = cy + (y1 - cy) * factor
-            x2 = cx + (x2 - cx) * factor
-            y2 = cy + (y2 - cy) * factor
-            shape.coords = (x1, y1, x2, y2)
+        # 첫 청크(보이는 영역)는 즉시, 나머지는 idle 시점에
+        self._realize_chunk(self._realize_gen)
 
-        self.scale = new_scale
-        self.app.update_selected_area_label(self)
-        # redraw grid to match new scale
+    def _viewport_bounds(self):
+        """현재 보이는 캔버스 영역 (x1, y1, x2, y2). 아직 배치 전이면 None"""
         try:
-            self.clear_grid()
-            if getattr(self, 'show_grid', False):
-                self.draw_grid()
+            w = int(self.canvas.winfo_width())
+            h = int(self.canvas.winfo_height())
+            if w <= 1 or h <= 1:
+                return None
+            return (self.canvas.canvasx(0), self.canvas.canvasy(0),
+                    self.canvas.canvasx(w), self.canvas.canvasy(h))
         except Exception:
-            pass
+            return None
 
-    def on_middle_button_down(self, event):
-        self.push_history()
-        self.panning = True
-        self.pan_last_pos = (event.x, event.y)
+    # 한 번의 idle 콜백에서 생성할 최대 항목 수 / 시간 예산(초)
+    REALIZE_CHUNK = 40
+    REALIZE_BUDGET = 0.012
 
-    def on_middle_button_drag(self, event):
-        if not self.panning or self.pan_last_pos is None:
+    @PERF.timed(cat='redraw')
+    def _realize_chunk(self, gen):
+        """대기 중인 항목을 한 청크만큼 캔버스에 생성하고, 남으면 다음 idle에 재예약"""
+        self._realize_after_id = None
+        if gen != getattr(self, '_realize_gen', 0):
             return
-        last_x, last_y = self.pan_last_pos
-        dx = event.x - last_x
-        dy = event.y - last_y
-
-        self.canvas.move("all", dx, dy)
-        for shape in self.shapes:
-            x1, y1, x2, y2 = shape.coords
-            shape.coords = (x1 + dx, y1 + dy, x2 + dx, y2 + dy)
-        self.pan_last_pos = (event.x, event.y)
+        q = getattr(self, '_realize_queue', None)
+        if not q:
+            return
+        t0 = time.perf_counter()
+        n = 0
+        while q and n < self.REALIZE_CHUNK:
+            self._realize_job(q.popleft())
+            n += 1
+            if time.perf_counter() - t0 > self.REALIZE_BUDGET:
+                break
+        if q:
+            try:
+                self._realize_after_id = self.canvas.after_idle(lambda: self._realize_chunk(gen))
+            except Exception:
+                self._flush_pending_realize()
+        else:
+            self._finish_realize()
 
-    def on_middle_button_up(self, event):
-        self.panning = False
-        self.pan_last_pos = None
-        # after panning, redraw grid for the new viewport
+    def _realize_job(self, job):
+        kind, order, _bbox, model = job
         try:
-            if getattr(self, 'show_grid', False):
-                # clear any old grid items and draw fresh
-                self.clear_grid()
-                self.draw_grid()
+            if kind == "shape":
+                self._create_shape_items(model)
+                self._apply_lod_to_shape(model)
+                ids = [model.rect_id] + list(model.side_ids.values()) + self._dim_item_ids(model)
+            else:
+                entry, lab = model
+                self._realize_label(entry, lab)
+                ids = [entry[k] for k in ("name_id", "heat_norm_id", "heat_equip_id", "area_id")]
+                ids.extend(entry["diffuser_ids"])
+            self._place_realized(kind, order, ids)
         except Exception:
             pass
+        self._mark_visibility_dirty()
 
+    def _place_realized(self, kind, order, ids):
+        """새로 만든 아이템을 원래(저장) 순서의 쌓임 위치로 옮김
 
-# ================= 상위 App =================
-
-# Backward compatibility: previous code used the name RectCanvas
-RectCanvas = Palette
+        모든 도형은 모든 라벨 아래, 같은 종류끼리는 저장된 순서대로 쌓인다. 이미 생성된
+        항목 중 순서상 바로 다음 항목(없으면 라벨 중 가장 아래 것)의 첫 아이템 아래로 내린다.
+        """
+        realized = self._realized[kind]
+        models = self._realize_models
+        j = bisect.bisect_right(realized, order)
+        anchor = None
+        if j < len(realized):
+            nxt = models[kind][realized[j]]
+            anchor = nxt.rect_id if kind == "shape" else nxt["name_id"]
+        elif kind == "shape" and self._realized["label"]:
+            anchor = models["label"][self._realized["label"][0]]["name_id"]
+        realized.insert(j, order)
+        if anchor is None:
+            return
+        for iid in ids:
+            self.canvas.tag_lower(iid, anchor)
+
+    @staticmethod
+    def _label_model(lab):
+        """저장된 라벨 dict에서 캔버스 아이템을 뺀 generated_space_labels 항목을 만든다"""
+        # hvac_detail stored as 0 when missing; convert back to None
+        stored_detail = lab.get("hvac_detail", 0)
+        if stored_detail == 0:
+            stored_detail = None
+        return {
+            "polygon": Polygon(lab["polygon_coords"]),
+            "name_id": None,
+            "heat_norm_id": None,
+            "heat_equip_id": None,
+            "area_id": None,
+            "diffuser_ids": [],
+            "hvac_type": int(lab.get("hvac_type", 1)),
+            "hvac_detail": int(stored_detail) if stored_detail is not None else None,
+            "hvac_text": lab.get("hvac_text", None),
+            # restore persisted quantity and detail text if present
+            "hvac_qty": int(lab.get("hvac_qty")) if lab.get("hvac_qty", None) is not None else None,
+            "hvac_detail_text": lab.get("hvac_detail_text", None)
+        }
 
-class ResizableRectApp:
-    def __init__(self, root):
-        self.root = root
-        self.root.title("도형 편집기 (디퓨저 배치 기능 추가됨)")
+    def _realize_label(self, entry, lab):
+        """저장된 라벨 lab의 텍스트/디퓨저 아이템을 만들어 모델 항목 entry에 id를 채운다
 
-        # left-side control panel (wider so controls are not clipped)
-        left_panel = tk.Frame(self.root, width=280)
-        left_panel.pack(side=tk.LEFT, fill=tk.Y)
-        left_panel.pack_propagate(False)
+        로드 이후에 줌/팬이 있었으면 저장 좌표를 현재 보기로 옮겨 만든다.
+        """
+        view = self._view
+        affine = getattr(self, '_realize_affine', None)
+        name_x, name_y = view.remap(lab["name_pos"], affine)
+        norm_x, norm_y = view.remap(lab["heat_norm_pos"], affine)
+        equip_x, equip_y = view.remap(lab["heat_equip_pos"], affine)
+        area_x, area_y = view.remap(lab["area_pos"], affine)
+
+        entry["name_id"] = self.canvas.create_text(
+            name_x, name_y,
+            text=lab["name_text"], fill="blue", font=("Arial", 11, "bold"),
+            tags=("space_name",)
+        )
+        entry["heat_norm_id"] = self.canvas.create_text(
+            norm_x, norm_y,
+            text=lab["heat_norm_text"], fill="darkred", font=("Arial", 10),
+            tags=("space_heat_norm",)
+        )
+        entry["heat_equip_id"] = self.canvas.create_text(
+            equip_x, equip_y,
+            text=lab["heat_equip_text"], fill="darkred", font=("Arial", 10),
+            tags=("space_heat_equip",)
+        )
+        entry["area_id"] = self.canvas.create_text(
+            area_x, area_y,
+            text=lab["area_text"], fill="green", font=("Arial", 10)
+        )
 
-        # Left-side notebook hosting Room Design as a tab
-        self.left_notebook = ttk.Notebook(left_panel)
-        self.left_notebook.pack(fill=tk.BOTH, expand=False, padx=6, pady=6)
+        # 디퓨저 복원
+        r = 3
+        for pos in lab.get("diffuser_coords", []):
+            cx, cy = view.remap(pos, affine)
+            did = self.canvas.create_oval(
+                cx - r, cy - r, cx + r, cy + r,
+                fill="green", outline="", tags=("point",)
+            )
+            entry["diffuser_ids"].append(did)
+        return entry
 
-        # Room Design tab/frame inside left_notebook
-        tab_frame = tk.Frame(self.left_notebook)
+    def _finish_realize(self):
+        """모든 항목 생성 완료: 그리드/컬링 갱신"""
+        self._realized = {"shape": [], "label": []}
+        self._realize_models = {"shape": [], "label": []}
+        if getattr(self, 'show_grid', False):
+            try:
+                self.draw_grid()
+            except Exception:
+                pass
+        self._schedule_visibility_update()
+
+    def _flush_pending_realize(self):
+        """지연 생성 중인 항목을 모두 즉시 생성 (편집/저장 전에 모델을 완성)"""
+        q = getattr(self, '_realize_queue', None)
+        if not q:
+            return
+        after_id = getattr(self, '_realize_after_id', None)
+        if after_id:
+            try:
+                self.canvas.after_cancel(after_id)
+            except Exception:
+                pass
+            self._realize_after_id = None
+        while q:
+            self._realize_job(q.popleft())
+        self._finish_realize()
+
+    def _cancel_pending_realize(self):
+        """지연 생성 작업 취소 (캔버스를 새로 채우기 전에 호출)"""
+        self._realize_gen = getattr(self, '_realize_gen', 0) + 1
+        after_id = getattr(self, '_realize_after_id', None)
+        if after_id:
+            try:
+                self.canvas.after_cancel(after_id)
+            except Exception:
+                pass
+        self._realize_after_id = None
+        self._realize_queue = deque()
+        self._realized = {"shape": [], "label": []}
+        self._realize_models = {"shape": [], "label": []}
+
+    # -------- 비활성 탭 (캔버스 아이템 해제 / 재실현) --------
+
+    # 캔버스 전체를 한 번의 Tcl 호출로 덤프: {id type coords {옵션(기본값과 다른 것만)} {아이템 바인딩}} 목록
+    _DUMP_TCL = """proc ::drawer_canvas_dump {c} {
+    set out {}
+    foreach i [$c find all] {
+        set cfg {}
+        foreach o [$c itemconfigure $i] {
+            if {[llength $o] == 5 && [lindex $o 3] ne [lindex $o 4]} {
+                lappend cfg [lindex $o 0] [lindex $o 4]
+            }
+        }
+        set b {}
+        foreach seq [$c bind $i] {
+            lappend b $seq [$c bind $i $seq]
+        }
+        lappend out [list $i [$c type $i] [$c coords $i] $cfg $b]
+    }
+    return $out
+}"""
+    # 덤프를 쌓임 순서대로 다시 생성하고 {이전 id 새 id ...} 목록을 반환
+    _RESTORE_TCL = """proc ::drawer_canvas_restore {c items} {
+    set map {}
+    foreach it $items {
+        lassign $it old type coords cfg b
+        set n [$c create $type $coords {*}$cfg]
+        foreach {seq script} $b {
+            $c bind $n $seq $script
+        }
+        lappend map $old $n
+    }
+    return $map
+}"""
+
+    def _ensure_canvas_procs(self):
+        tk_app = self.canvas.tk
+        if not tk_app.call('info', 'commands', '::drawer_canvas_dump'):
+            tk_app.eval(self._DUMP_TCL)
+            tk_app.eval(self._RESTORE_TCL)
+
+    def is_dormant(self):
+        """탭이 숨겨져 캔버스 아이템을 해제한 상태인지"""
+        return getattr(self, '_dormant', None) is not None
+
+    @PERF.timed(cat='redraw')
+    def dehydrate(self):
+        """숨겨진 탭의 캔버스 아이템을 스냅샷으로 압축해 두고 모두 삭제
+
+        모델(shapes, 라벨 dict, hvac 매핑)은 그대로 두고 아이템 id만 보관되므로,
+        메모리는 화면에 보이는 탭의 아이템 수에만 비례한다.
+        """
+        if self.is_dormant():
+            return
+        try:
+            if not self.canvas.winfo_exists():
+                return
+        except Exception:
+            return
+        self._flush_pending_realize()
+        # 예약된 저널 기록은 아이템이 있을 때 먼저 처리
+        if getattr(self, '_journal_after_id', None):
+            try:
+                self.canvas.after_cancel(self._journal_after_id)
+            except Exception:
+                pass
+            self._journal_edit()
+        for attr in ('_visibility_after_id', '_motion_after_id', '_grid_redraw_after_id'):
+            after_id = getattr(self, attr, None)
+            if after_id:
+                try:
+                    self.canvas.after_cancel(after_id)
+                except Exception:
+                    pass
+            setattr(self, attr, None)
+        self._pending_motion = None
+        self._pending_drag = None
+
+        # 임시 표시(툴팁/강조/선택 사각형)와 그리드는 저장하지 않고 지운 뒤 다시 그린다
+        try:
+            self._hide_flow_tooltip()
+        except Exception:
+            pass
+        for attr in ('highlight_line_id', 'tooltip_id', 'corner_highlight_id', 'rect_select_id'):
+            iid = getattr(self, attr, None)
+            if iid:
+                try:
+                    self.canvas.delete(iid)
+                except Exception:
+                    pass
+            setattr(self, attr, None)
+        try:
+            self.canvas.delete('flow_tooltip')
+        except Exception:
+            pass
+        self.clear_grid()
+
+        try:
+            self._ensure_canvas_procs()
+            dump = self.canvas.tk.eval(f'::drawer_canvas_dump {self.canvas._w}')
+        except Exception:
+            return
+        self._dormant = zlib.compress(dump.encode('utf-8'), 1)
+        self.canvas.delete("all")
+        if PERF.enabled:
+            PERF.mark('palette.dehydrate', 'redraw', chars=len(dump), bytes=len(self._dormant))
+
+    @PERF.timed(cat='redraw')
+    def rehydrate(self):
+        """스냅샷에서 캔버스 아이템을 다시 만들고 보관 중인 id 참조를 새 id로 바꾼다
+
+        복원이나 id 갱신이 실패하면 만든 아이템을 지우고 스냅샷을 그대로 둔 채 오류를 알린다
+        (다음 선택 때 다시 시도). 성공하면 True.
+        """
+        blob = getattr(self, '_dormant', None)
+        if blob is None:
+            return True
+        try:
+            self._ensure_canvas_procs()
+            pairs = self.canvas.tk.splitlist(self.canvas.tk.call(
+                '::drawer_canvas_restore', self.canvas._w, zlib.decompress(blob).decode('utf-8')))
+            idmap = {int(pairs[k]): int(pairs[k + 1]) for k in range(0, len(pairs) - 1, 2)}
+            self._remap_item_ids(idmap)
+        except Exception as e:
+            try:
+                self.canvas.delete("all")
+            except Exception:
+                pass
+            if PERF.enabled:
+                PERF.mark('palette.rehydrate_failed', 'redraw', error=repr(e))
+            try:
+                messagebox.showerror("오류", f"탭의 도형/라벨을 다시 그리지 못했습니다: {e}")
+            except Exception:
+                pass
+            return False
+        self._dormant = None
+        if PERF.enabled:
+            PERF.mark('palette.rehydrate', 'redraw', items=len(idmap))
+        if getattr(self, 'show_grid', False):
+            try:
+                self.draw_grid()
+            except Exception:
+                pass
+        self._schedule_visibility_update()
+        return True
+
+    def _remap_item_ids(self, idmap):
+        """재생성으로 바뀐 아이템 id를 도형/라벨/선택 상태/hvac 매핑에 반영
+
+        새 값을 모두 계산한 뒤에 한꺼번에 바꾸므로, 중간에 실패하면 모델은 그대로 남는다.
+        """
+        def m(iid):
+            try:
+                return idmap.get(int(iid), iid)
+            except Exception:
+                return iid
+
+        shape_ids = []
+        for shape in self.shapes:
+            dims = {}
+            for side, part in shape.dim_items.items():
+                part = dict(part)
+                part["lines"] = [m(i) for i in part["lines"]]
+                part["ticks"] = [m(i) for i in part["ticks"]]
+                part["text"] = m(part["text"])
+                dims[side] = part
+            shape_ids.append((shape, m(shape.rect_id), {k: m(v) for k, v in shape.side_ids.items()}, dims))
+
+        label_ids = []
+        for lab in self.generated_space_labels:
+            new = {}
+            for key in ("name_id", "heat_norm_id", "heat_equip_id", "area_id", "flow_id"):
+                if lab.get(key) is not None:
+                    new[key] = m(lab[key])
+            for key in ("diffuser_ids", "diffuser_label_ids"):
+                if lab.get(key) is not None:
+                    new[key] = [m(i) for i in lab[key]]
+            if lab.get("diffuser_flows"):
+                new["diffuser_flows"] = {m(k): v for k, v in lab["diffuser_flows"].items()}
+            label_ids.append((lab, new))
+
+        lod_hidden = {m(i): affine for i, affine in self._lod_hidden.items()}
+        selected = {m(i) for i in self.selected_points}
+        point_state = {m(k): v for k, v in self._point_state.items()}
+
+        for shape, rect_id, side_ids, dims in shape_ids:
+            shape.rect_id = rect_id
+            shape.side_ids = side_ids
+            shape.dim_items = dims
+        for lab, new in label_ids:
+            lab.update(new)
+        self._lod_hidden = lod_hidden
+        self._mark_visibility_dirty()
+        self.selected_points = selected
+        self._point_state = point_state
+
+        # 이 팔레트에 매핑된 hvac 계통의 ids만 제자리에서 갱신 (다른 팔레트 계통은 건드리지 않음)
+        hvac_map = getattr(self.app, 'hvac_map', None)
+        if isinstance(hvac_map, HvacMap):
+            hvac_map.remap_ids(self, idmap)
+
+    # -------- 줌 LOD / 뷰포트 컬링 --------
+
+    # px/m 기준 임계값: 이보다 작게 축소되면 치수선 / 작은 텍스트를 숨김
+    LOD_DIM_SCALE = 8.0
+    LOD_TEXT_SCALE = 12.0
+    # 뷰포트 밖으로 이 정도(px)까지는 컬링하지 않음 (팬 시 깜빡임 방지)
+    CULL_MARGIN = 100
+    # LOD/컬링으로 숨긴 아이템 태그: 줌/팬은 이 태그가 없는 아이템만 옮긴다
+    CULL_TAG = "culled"
+
+    def _dim_item_ids(self, shape):
+        ids = []
+        for part in shape.dim_items.values():
+            ids.extend(part["lines"])
+            ids.extend(part["ticks"])
+            ids.append(part["text"])
+        return ids
+
+    def _apply_lod_to_shape(self, shape):
+        """redraw로 새로 만든 치수 아이템에 현재 LOD 규칙 적용"""
+        if self.scale >= self.LOD_DIM_SCALE:
+            return
+        self._hide_items(self._dim_item_ids(shape))
+
+    def _hide_items(self, ids):
+        """LOD/컬링으로 숨김. 숨긴 아이템은 줌/팬에서 빠지고(CULL_TAG) 다시 보일 때 따라잡는다."""
+        hidden = self._lod_hidden
+        affine = self._view.affine
+        for iid in ids:
+            if iid in hidden:
+                continue
+            try:
+                self.canvas.itemconfigure(iid, state="hidden")
+                self.canvas.addtag_withtag(self.CULL_TAG, iid)
+            except Exception:
+                continue
+            hidden[iid] = affine
+
+    def _show_items(self, ids):
+        """_hide_items로 숨긴 아이템을 숨긴 뒤의 줌/팬만큼 옮기고 다시 표시"""
+        hidden = self._lod_hidden
+        view = self._view
+        for iid in ids:
+            affine = hidden.pop(iid, None)
+            if affine is None:
+                continue
+            try:
+                if affine != view.affine:
+                    k, dx, dy = view.step(affine)
+                    if k != 1.0:
+                        self.canvas.scale(iid, 0, 0, k, k)
+                    self.canvas.move(iid, dx, dy)
+                self.canvas.dtag(iid, self.CULL_TAG)
+                self.canvas.itemconfigure(iid, state="normal")
+            except Exception:
+                pass
+
+    def _item_coords(self, iid):
+        """캔버스 아이템 좌표 (현재 화면 기준, 숨긴 뒤 밀린 줌/팬도 반영)"""
+        c = self.canvas.coords(iid)
+        affine = self._lod_hidden.get(iid)
+        if affine is None or not c:
+            return c
+        return list(self._view.remap(c, affine))
+
+    def _sync_hidden_items(self, ids):
+        """숨긴 아이템 좌표를 현재 화면 기준으로 새로 설정했을 때 (redraw 등) 기록만 맞춘다"""
+        hidden = self._lod_hidden
+        affine = self._view.affine
+        for iid in ids:
+            if iid in hidden:
+                hidden[iid] = affine
+
+    def _mark_visibility_dirty(self):
+        """도형/라벨 아이템이 바뀜 -> 다음 갱신에서 컬링 묶음 색인을 다시 만든다"""
+        self._vis_dirty = True
+
+    def _item_box(self, iid):
+        c = self._item_coords(iid)
+        if len(c) < 2:
+            return None
+        xs, ys = c[0::2], c[1::2]
+        return (min(xs), min(ys), max(xs), max(ys))
+
+    def _visibility_groups(self):
+        """컬링 단위 묶음 목록: (bbox, 여유 px, 항상 보이는 ids, LOD ids, LOD 종류)"""
+        groups = []
+        for shape in self.shapes:
+            if shape.rect_id is None:
+                continue   # 아직 생성 전 (생성되면 다시 만든다)
+            # 치수선은 도형 바깥 30px 정도에 그려지므로 여유를 둔다
+            groups.append((shape.coords, 40.0,
+                           [shape.rect_id] + list(shape.side_ids.values()),
+                           self._dim_item_ids(shape), "dim"))
+
+        for lab in self.generated_space_labels:
+            if lab.get("name_id") is None:
+                continue
+            try:
+                small = [lab.get("heat_norm_id"), lab.get("heat_equip_id"), lab.get("area_id"),
+                         lab.get("flow_id")] + list(lab.get("diffuser_label_ids", []))
+                box = self._item_box(lab["name_id"])
+                if box is not None:
+                    groups.append((box, 0.0, [lab["name_id"]], [i for i in small if i], "text"))
+                for did in lab.get("diffuser_ids", []):
+                    box = self._item_box(did)
+                    if box is not None:
+                        groups.append((box, 0.0, [did], [], "text"))
+            except Exception:
+                continue
+        return groups
+
+    @PERF.timed(cat='redraw')
+    def update_visibility(self):
+        """LOD 규칙과 뷰포트 컬링을 적용해 관리 대상 아이템의 표시 상태를 갱신
+
+        - 배율이 LOD_DIM_SCALE 미만이면 치수선/치수 텍스트 숨김
+        - 배율이 LOD_TEXT_SCALE 미만이면 발열량/면적/풍량/디퓨저 라벨 같은 작은 텍스트 숨김
+        - 뷰포트(+여유)와 겹치지 않는 도형/라벨 아이템 숨김
+        컬링 묶음은 ViewportIndex에 두고 도형/라벨이 바뀐 뒤에만 다시 만든다. 줌/팬 때는
+        뷰포트와 겹치는 묶음만 색인에서 찾아, 뷰포트를 드나든 묶음과 LOD 임계값을 넘은
+        아이템만 바꾼다. 이 함수가 숨긴 아이템만 다시 보이게 하므로 다른 로직의 표시 상태와
+        충돌하지 않는다. 숨긴 아이템은 줌/팬에서 빠지고, 다시 보일 때 밀린 변환을 한 번에 적용한다.
+        """
+        self._visibility_after_id = None
+        view = self._viewport_bounds()
+        if view is None:
+            return
+        m = self.CULL_MARGIN
+        lod = (self.scale >= self.LOD_DIM_SCALE, self.scale >= self.LOD_TEXT_SCALE)
+
+        def lod_shown(kind, flags):
+            return flags[0] if kind == "dim" else flags[1]
+
+        index = self._vis_index
+        hide, show = set(), set()
+        if self._vis_dirty:
+            # 전체 재구성: 원하는 숨김 집합을 새로 계산하고 나머지는 복원
+            self._vis_dirty = False
+            index.rebuild(self._visibility_groups())
+            now_in = index.query(view[0] - m, view[1] - m, view[2] + m, view[3] + m)
+            for key in range(len(index)):
+                main, extra, kind = index.group(key)
+                if key not in now_in:
+                    hide.update(main)
+                    hide.update(extra)
+                elif not lod_shown(kind, lod):
+                    hide.update(extra)
+            show = set(self._lod_hidden) - hide
+        else:
+            now_in = index.query(view[0] - m, view[1] - m, view[2] + m, view[3] + m)
+            old_in, old_lod = self._vis_in, self._vis_lod
+            for key in old_in - now_in:
+                main, extra, _kind = index.group(key)
+                hide.update(main)
+                hide.update(extra)
+            for key in now_in - old_in:
+                main, extra, kind = index.group(key)
+                show.update(main)
+                (show if lod_shown(kind, lod) else hide).update(extra)
+            if old_lod != lod:
+                for key in now_in & old_in:
+                    main, extra, kind = index.group(key)
+                    if lod_shown(kind, lod) != lod_shown(kind, old_lod):
+                        (show if lod_shown(kind, lod) else hide).update(extra)
+
+        self._hide_items(hide)
+        self._show_items(show - hide)
+        self._vis_in = now_in
+        self._vis_lod = lod
+
+    def _schedule_visibility_update(self):
+        """팬 중에는 idle 시점에 한 번만 컬링을 갱신 (새로 보이는 아이템을 지연 복원)"""
+        if getattr(self, '_visibility_after_id', None):
+            return
+        try:
+            self._visibility_after_id = self.canvas.after_idle(self.update_visibility)
+        except Exception:
+            self._visibility_after_id = None
+
+    # -------- 줌 / 팬 --------
+
+    def on_mouse_wheel(self, event):
+        zoom_in = event.delta > 0
+        self.apply_zoom(zoom_in, event.x, event.y)
+
+    def on_mouse_wheel_linux(self, event):
+        zoom_in = (event.num == 4)
+        self.apply_zoom(zoom_in, event.x, event.y)
+
+    @PERF.timed(cat='redraw')
+    def apply_zoom(self, zoom_in, cx, cy):
+        factor = 1.1 if zoom_in else 1 / 1.1
+        new_scale = self.scale * factor
+        if new_scale < 2.0 or new_scale > 200.0:
+            return
+
+        self.push_history(edit=False)
+        # LOD/컬링으로 숨긴 아이템은 건너뛴다 (다시 보일 때 _show_items가 따라잡음).
+        # 도형 좌표와 색인은 누적 변환만 바꾸고, 도형 좌표는 읽을 때 반영된다.
+        self.canvas.scale("!" + self.CULL_TAG, cx, cy, factor, factor)
+        self._view.zoom(cx, cy, factor)
+
+        self.scale = new_scale
+        self.app.update_selected_area_label(self)
+        # redraw grid to match new scale (spacing changed -> rebuild the cached layer)
+        try:
+            self.clear_grid()
+            if getattr(self, 'show_grid', False):
+                self.draw_grid()
+        except Exception:
+            pass
+        # LOD 규칙 / 뷰포트 컬링 적용
+        try:
+            self.update_visibility()
+        except Exception:
+            pass
+
+    def on_middle_button_down(self, event):
+        self.push_history(edit=False)
+        self.panning = True
+        self.pan_last_pos = (event.x, event.y)
+
+    def on_middle_button_drag(self, event):
+        if not self.panning or self.pan_last_pos is None:
+            return
+        last_x, last_y = self.pan_last_pos
+        dx = event.x - last_x
+        dy = event.y - last_y
+
+        self.canvas.move("!" + self.CULL_TAG, dx, dy)
+        self._grid_note_move(dx, dy)
+        self._view.move(dx, dy)
+        self.pan_last_pos = (event.x, event.y)
+        # 새로 화면에 들어온 아이템은 idle 시점에 복원
+        self._schedule_visibility_update()
+
+    def on_middle_button_up(self, event):
+        self.panning = False
+        self.pan_last_pos = None
+        # after panning, extend the cached grid over the newly exposed area
+        try:
+            if getattr(self, 'show_grid', False):
+                self.draw_grid()
+        except Exception:
+            pass
+        self._schedule_visibility_update()
+
+
+# ================= 상위 App =================
+
+# Backward compatibility: previous code used the name RectCanvas
+RectCanvas = Palette
+
+class ResizableRectApp:
+    def __init__(self, root, journal=True):
+        """journal=False: 편집 저널(자동 저장/복구 확인)을 쓰지 않음 (일괄 실행용)"""
+        self.root = root
+        self.root.title("도형 편집기 (디퓨저 배치 기능 추가됨)")
+
+        # left-side control panel (wider so controls are not clipped)
+        left_panel = tk.Frame(self.root, width=280)
+        left_panel.pack(side=tk.LEFT, fill=tk.Y)
+        left_panel.pack_propagate(False)
+
+        # Left-side notebook hosting Room Design as a tab
+        self.left_notebook = ttk.Notebook(left_panel)
+        self.left_notebook.pack(fill=tk.BOTH, expand=False, padx=6, pady=6)
+
+        # Room Design tab/frame inside left_notebook
+        tab_frame = tk.Frame(self.left_notebook)
         self.left_notebook.add(tab_frame, text="Room Design")
 
         # Duct Design tab with simple runtime rename controls
@@ -4203,6 +5722,7 @@ class ResizableRectApp:
             b_clear = tk.Button(btn_frame, text="전체 지우기", width=12, command=lambda: self._sizing_clear())
             b_fence = tk.Button(btn_frame, text="펜슬 모드", width=12, command=lambda: self._sizing_pencil_mode())
             b_auto = tk.Button(btn_frame, text="자동완성", width=12, command=lambda: self._sizing_auto())
+            b_batch = tk.Button(btn_frame, text="일괄 사이징", width=12, command=lambda: self._sizing_batch_open())
 
             # arrange buttons in grid 3x2 (matching screenshot style)
             b_calc.grid(row=0, column=0, padx=4, pady=4)
@@ -4211,6 +5731,7 @@ class ResizableRectApp:
             b_clear.grid(row=1, column=1, padx=4, pady=4)
             b_fence.grid(row=2, column=0, padx=4, pady=4)
             b_auto.grid(row=2, column=1, padx=4, pady=4)
+            b_batch.grid(row=3, column=0, padx=4, pady=4)
 
             # Bottom area: scrolled text output placed under the buttons
             bottom_area = tk.Frame(self.duct_main_tab)
@@ -4299,7 +5820,7 @@ class ResizableRectApp:
         # currently active hvac name (set when listbox selection changes)
         self._active_hvac_name = None
         # mapping from hvac name -> set of canvas item ids (points and diffusers)
-        self.hvac_map = {}
+        self.hvac_map = HvacMap()
         # currently highlighted ids for HVAC selection
         self._hvac_highlighted = set()
         self.hvac_scroll = tk.Scrollbar(listbox_frame, orient=tk.VERTICAL, command=self.hvac_listbox.yview)
@@ -4446,15 +5967,46 @@ class ResizableRectApp:
         csv_btn.pack(side=tk.LEFT, padx=5)
         equip_btn = tk.Button(top_frame, text="장비일람표 추출", command=self.extract_equipment_list)
         equip_btn.pack(side=tk.LEFT, padx=5)
+        diag_btn = tk.Button(top_frame, text="진단", command=self.open_diagnostics)
+        diag_btn.pack(side=tk.LEFT, padx=5)
 
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(fill=tk.BOTH, expand=True)
 
         self.palettes = []
         self.add_new_tab()
+        # 탭 전환: 선택된 탭만 캔버스 아이템을 유지하고 나머지는 idle 시점에 해제
+        self._dehydrate_after_id = None
+        self.notebook.bind("<<NotebookTabChanged>>", self._on_palette_tab_changed)
 
         self.root.bind_all("<Control-z>", lambda e: self.undo_current())
 
+        # 편집 저널: 비정상 종료된 세션(주인 프로세스가 없는 저널)이 있으면 복구 여부 확인.
+        # 복구하면 그 저널을 이어서 쓰고, 아니면 이 실행 전용 저널을 새로 만든다.
+        self.journal = None
+        try:
+            if journal:
+                adopted = None
+                for directory in EditJournal.orphans()[:1]:
+                    orphan = EditJournal(directory)
+                    recovered = orphan.recover()
+                    if recovered and messagebox.askyesno(
+                            "작업 복구",
+                            "이전 작업이 정상적으로 종료되지 않았습니다.\n자동 저장된 내용을 복구하시겠습니까?"):
+                        self._restore_from_journal(recovered)
+                        adopted = orphan
+                    else:
+                        orphan.close(discard=True)
+                journal = adopted or EditJournal()
+                journal.start()
+                self.journal = journal
+        except Exception:
+            self.journal = None
+        try:
+            self.root.protocol("WM_DELETE_WINDOW", self._on_close)
+        except Exception:
+            pass
+
     # ---------- 버튼 콜백 ----------
     def _on_apply_norm(self):
         try:
@@ -4496,11 +6048,9 @@ class ResizableRectApp:
             return
 
         try:
-            base = 3.295e-10 * (flow ** 1.9) / resistance
-            if base <= 0:
+            if flow <= 0:
                 raise ValueError("내부 계산 값이 0 이하입니다.")
-            raw_val = (base ** 0.199) * 1000
-            rounded = float(raw_val)
+            rounded = calc_circular_diameter(flow, resistance, round_mm=False)
             rounded_int = int(round(rounded, 0))
 
             # We'll build the final three-line output after rectangle rounding logic
@@ -4515,59 +6065,13 @@ class ResizableRectApp:
                 self.sizing_text.insert(tk.END, f"종횡비 입력 오류: '{self.sizing_ratio_cb.get()}'\n")
                 return
 
-            # continuous a,b
-            D = rounded
+            # 50mm 단위 사각 환산: 두 변 내림 -> 큰 변 올림 -> 두 변 올림 중 D 이상인 첫 후보
             try:
-                a_cont = (D / 1.3) * ((1.0 + r) ** 0.25) / (r ** 0.625)
-                b_cont = r * a_cont
+                w_final, h_final, _, _ = size_rect_stepped(rounded, r)
             except Exception as e:
                 self.sizing_text.insert(tk.END, f"사각 환산 실패: {e}\n")
                 return
 
-            # ensure width (w) is the larger dimension
-            w_cont = max(a_cont, b_cont)
-            h_cont = min(a_cont, b_cont)
-
-            import math
-            def floor50(x):
-                v = math.floor(x / 50.0) * 50
-                return int(max(50, v))
-            def ceil50(x):
-                v = math.ceil(x / 50.0) * 50
-                return int(max(50, v))
-
-            # candidate 1: both floor to 50 (economic)
-            w1 = floor50(w_cont)
-            h1 = floor50(h_cont)
-
-            def rect_to_circle(a_rect, b_rect):
-                # D = 1.3 * ((a*b)^0.625 / (a+b)^0.25)
-                try:
-                    return 1.3 * (((a_rect * b_rect) ** 0.625) / ((a_rect + b_rect) ** 0.25))
-                except Exception:
-                    return 0.0
-
-            D1 = rect_to_circle(w1, h1)
-            # If the rectangle rounded down still yields >= required circular D, accept it
-            if D1 >= D:
-                w_final, h_final = w1, h1
-                reason = f"floor both (경제적): {w1}x{h1} gives D({D1:.1f}) >= required({D:.1f})"
-            else:
-                # candidate 2: increase width to ceil (keep height floored)
-                w2 = ceil50(w_cont)
-                h2 = h1
-                D2 = rect_to_circle(w2, h2)
-                if D2 >= D:
-                    w_final, h_final = w2, h2
-                    reason = f"width up: {w2}x{h2} gives D({D2:.1f}) >= required({D:.1f})"
-                else:
-                    # otherwise increase height as well (ceil) and accept
-                    h3 = ceil50(h_cont)
-                    w3 = w2
-                    D3 = rect_to_circle(w3, h3)
-                    w_final, h_final = w3, h3
-                    reason = f"width up & height up: {w3}x{h3} gives D({D3:.1f}) (forced since previous < required)"
-
             # Helper: format numbers with thousand separators and trim decimals
             import math
             def fmt_num(x, decimals=3):
@@ -4626,41 +6130,8 @@ class ResizableRectApp:
             self.sizing_text.delete('1.0', tk.END)
         except Exception:
             pass
-        # Before running routing, normalize hvac_map so that no canvas id
-        # appears in more than one mapping. This prevents cross-system mixing
-        # caused by duplicated ids in multiple hvac entries.
-        try:
-            assigned_global = set()
-            for name in list(self.hvac_map.keys()):
-                try:
-                    mapping = self.hvac_map.get(name)
-                    if not mapping or not isinstance(mapping, dict):
-                        continue
-                    orig_ids = set(mapping.get('ids', set()) or set())
-                    new_ids = set()
-                    removed = []
-                    for iid in orig_ids:
-                        try:
-                            iid_int = int(iid)
-                        except Exception:
-                            iid_int = iid
-                        if iid_int in assigned_global:
-                            removed.append(iid_int)
-                            continue
-                        new_ids.add(iid_int)
-                        assigned_global.add(iid_int)
-                    if removed:
-                        # cleanup log disabled in UI result pane; enable for debugging by changing to print()
-                        try:
-                            pass
-                        except Exception:
-                            pass
-                    mapping['ids'] = new_ids
-                    self.hvac_map[name] = mapping
-                except Exception:
-                    continue
-        except Exception:
-            pass
+        # hvac_map (HvacMap) keeps every canvas id in at most one mapping, so
+        # no cross-system normalization pass is needed before routing.
 
         # run router for every HVAC system recorded
         try:
@@ -4713,6 +6184,7 @@ class ResizableRectApp:
         except Exception:
             pass
 
+    @PERF.timed(cat='route')
     def auto_route_ducts(self, hvac_name, max_add_steiner=30):
         """Auto-route ducts for the HVAC system named `hvac_name`.
 
@@ -4724,6 +6196,7 @@ class ResizableRectApp:
         mapping = self.hvac_map.get(hvac_name)
         if not mapping:
             raise ValueError('해당 HVAC 매핑이 없습니다.')
+        stage = PERF.stages('route', 'route')
         # collect terminals: inlets (main supply points) and outlets (diffusers)
         terminals = []  # list of (ix, iy) grid indices
         terminal_items = []  # parallel list of (palette, iid, kind)
@@ -4734,46 +6207,43 @@ class ResizableRectApp:
         pal = mapping.get('palette')
         if pal is None:
             raise ValueError('매핑된 팔레트가 없습니다.')
+        # 숨겨진 탭이면 아이템을 다시 만들어야 좌표를 읽을 수 있다 (idle 시점에 다시 해제)
+        try:
+            self._realize_palette(pal)
+            mapping = self.hvac_map.get(hvac_name) or mapping
+            ids = set(mapping.get('ids', set()) or set())
+        except Exception:
+            pass
 
         # use a common world grid (meters) so terminals on different palettes align
         grid_m = 0.5  # grid spacing in meters
 
         # iterate palette(s) belonging to this hvac mapping and collect terminals
         # only collect items that belong to this hvac mapping (by id list and hvac tag or mapping palette)
-        # diag output disabled by default; enable for debugging by changing to `if True:` below
-        if False:
+        # diag: with instrumentation enabled, record where each mapping id lives (palette and tags)
+        if PERF.enabled:
             try:
-                # diagnostic: list mapping ids and where they live (palette and tags)
-                try:
-                    self.sizing_text.insert(tk.END, f"[DIAG] hvac mapping '{hvac_name}' ids (count={len(ids)}):\n")
-                    for did in list(ids):
-                        try:
-                            did_int = int(did)
-                        except Exception:
-                            did_int = did
-                        found_pal = None
-                        found_name = None
-                        try:
-                            for p in getattr(self, 'palettes', []):
-                                try:
-                                    if did_int in p.canvas.find_all():
-                                        found_pal = p
-                                        found_name = getattr(p, 'name', None) or repr(p)
-                                        break
-                                except Exception:
-                                    continue
-                        except Exception:
-                            pass
-                        try:
-                            tags = found_pal.canvas.gettags(did_int) if found_pal is not None else ()
-                        except Exception:
-                            tags = ()
+                PERF.mark('route.mapping', 'route', hvac=hvac_name, ids=len(ids))
+                for did in list(ids):
+                    try:
+                        did_int = int(did)
+                    except Exception:
+                        did_int = did
+                    found_pal = None
+                    for p in getattr(self, 'palettes', []):
                         try:
-                            self.sizing_text.insert(tk.END, f"  id={did_int} on={found_name} tags={tags}\n")
+                            if p.canvas.type(did_int):
+                                found_pal = p
+                                break
                         except Exception:
-                            pass
-                except Exception:
-                    pass
+                            continue
+                    try:
+                        tags = found_pal.canvas.gettags(did_int) if found_pal is not None else ()
+                    except Exception:
+                        tags = ()
+                    PERF.mark('route.mapping_id', 'route', id=did_int,
+                              palette=(getattr(found_pal, 'name', None) or repr(found_pal)) if found_pal is not None else None,
+                              tags=' '.join(tags))
             except Exception:
                 pass
         for did in list(ids):
@@ -4781,15 +6251,8 @@ class ResizableRectApp:
                 did_int = int(did)
             except Exception:
                 did_int = did
-            # find palette that contains this id
-            found_pal = None
-            for p in getattr(self, 'palettes', []):
-                try:
-                    if did_int in p.canvas.find_all():
-                        found_pal = p
-                        break
-                except Exception:
-                    continue
+            # find palette that contains this id (mapping palette first; hidden tabs are realized)
+            found_pal = self._palette_with_item(did_int, prefer=pal)
             if not found_pal:
                 continue
             try:
@@ -4806,7 +6269,7 @@ class ResizableRectApp:
                 pass
             # compute center pixel coords
             try:
-                c = found_pal.canvas.coords(did_int)
+                c = found_pal._item_coords(did_int)
                 if not c or len(c) < 4:
                     continue
                 cx = (c[0] + c[2]) / 2.0
@@ -4849,6 +6312,7 @@ class ResizableRectApp:
             terminals.append((ix, iy))
             terminal_items.append((found_pal, did_int, terminal_type, cx, cy))
 
+        stage.lap('collect_terminals', count=len(terminals))
         if len(terminals) < 2:
             raise ValueError('라우팅할 터미널이 충분하지 않습니다 (최소 2개 필요).')
 
@@ -5280,6 +6744,8 @@ class ResizableRectApp:
         ts_supply, ti_supply = pick_by_idxs(supply_idxs)
         ts_return, ti_return = pick_by_idxs(return_idxs)
 
+        stage.lap('partition', supply=len(ts_supply), ret=len(ts_return))
+
         # run router for supply only (do not draw return network)
         try:
             # choose a single supply main-point as root (prefer an 'inlet' in the supply terminal items)
@@ -5351,22 +6817,49 @@ class ResizableRectApp:
             seg_flow_map_supply = {}
             seg_flow_map_return = {}
 
-        # sizing function (circular equivalent) - copy of calc formula
-        def calc_circular_diameter_mm(q_m3h, dp_mm_per_m):
+        stage.lap('steiner_route', segments=len(duct_segments))
+        PERF.count('route.segments', len(duct_segments))
+
+        # duct sizing (duct_sizing): every segment flow is sized in one batch call,
+        # using the dp / aspect ratio currently entered on the sizing tab
+        try:
+            dp_size = max(1e-6, float(self.sizing_pressure_entry.get() or 0.1))
+        except Exception:
+            dp_size = 0.1
+        try:
+            r_size = float(self.sizing_ratio_cb.get() or "2")
+            if r_size <= 0:
+                r_size = 2.0
+        except Exception:
+            r_size = 2.0
+        rect_sizes = {}
+        try:
+            all_flows = sorted({max(0.0, float(q))
+                                for m in (seg_flow_map, seg_flow_map_supply, seg_flow_map_return)
+                                for q in m.values()})
+            if all_flows:
+                _, ws, hs = size_ducts_batch(all_flows, dp_size, r_size, rule="stepped")
+                rect_sizes = {q: (int(w), int(h)) for q, w, h in zip(all_flows, ws, hs)}
+        except Exception:
+            rect_sizes = {}
+
+        def rect_wh_mm(q_m3h):
+            """구간 풍량 -> 사각 덕트 (W, H) mm (W >= H), 계산 불가 시 (0, 0)"""
             try:
-                q = float(q_m3h)
-                dp = float(dp_mm_per_m)
-                if q <= 0 or dp <= 0:
-                    return 0.0
-                C = 3.295e-10
-                D = ((C * (q ** 1.9) / dp) ** 0.199) * 1000.0
-                return float(D)
+                q = max(0.0, float(q_m3h))
             except Exception:
-                return 0.0
+                return 0, 0
+            wh = rect_sizes.get(q)
+            if wh is None:
+                try:
+                    D = calc_circular_diameter(q, dp_size, round_mm=False)
+                    wh = size_rect_stepped(D, r_size)[:2] if D > 0 else (0, 0)
+                except Exception:
+                    wh = (0, 0)
+                rect_sizes[q] = wh
+            return wh
 
-        def round_step_up(x, step=50.0):
-            import math
-            return math.ceil(x / step) * step
+        stage.lap('sizing', sizes=len(rect_sizes))
 
         # Before drawing anything, remove any previous duct items for this hvac.
         # Only remove items that are actual duct annotations/drawings (tagged 'duct')
@@ -5374,6 +6867,9 @@ class ResizableRectApp:
         try:
             for p in getattr(self, 'palettes', []):
                 try:
+                    # hidden tabs keep their ducts in the dormant snapshot: realize first
+                    if not self._realize_palette(p):
+                        continue
                     # iterate items already tagged as 'duct'
                     # delete segments that belong to this hvac (have matching hvac tag)
                     # and also remove legacy untagged duct segments (no hvac:* tag)
@@ -5422,68 +6918,8 @@ class ResizableRectApp:
                         y1, y2 = a * spacing_px, b * spacing_px
                         mx = x
                         my = (y1 + y2) / 2.0
-                    # compute D (mm) using default dp from UI
-                    try:
-                        dp_val = float(self.sizing_pressure_entry.get() or 0.1)
-                    except Exception:
-                        dp_val = 0.1
-                    D_exact = calc_circular_diameter_mm(max(0.0, q), max(1e-6, dp_val))
-                    # Convert circular D to rectangular W x H using chosen aspect ratio from sizing tab
-                    try:
-                        r_raw = (self.sizing_ratio_cb.get() or "2")
-                        r = float(r_raw)
-                        if r <= 0:
-                            r = 2.0
-                    except Exception:
-                        r = 2.0
-
-                    if D_exact > 0:
-                        try:
-                            a_cont = (D_exact / 1.3) * ((1.0 + r) ** 0.25) / (r ** 0.625)
-                            b_cont = r * a_cont
-                        except Exception:
-                            a_cont = D_exact / 1.3
-                            b_cont = a_cont * r
-
-                        # ensure width is larger
-                        w_cont = max(a_cont, b_cont)
-                        h_cont = min(a_cont, b_cont)
-
-                        import math
-                        def floor50(x):
-                            v = math.floor(x / 50.0) * 50
-                            return int(max(50, v))
-                        def ceil50(x):
-                            v = math.ceil(x / 50.0) * 50
-                            return int(max(50, v))
-
-                        w1 = floor50(w_cont)
-                        h1 = floor50(h_cont)
-
-                        def rect_to_circle(a_rect, b_rect):
-                            try:
-                                return 1.3 * (((a_rect * b_rect) ** 0.625) / ((a_rect + b_rect) ** 0.25))
-                            except Exception:
-                                return 0.0
-
-                        D1 = rect_to_circle(w1, h1)
-                        if D1 >= D_exact:
-                            w_final, h_final = w1, h1
-                        else:
-                            w2 = ceil50(w_cont)
-                            h2 = h1
-                            D2 = rect_to_circle(w2, h2)
-                            if D2 >= D_exact:
-                                w_final, h_final = w2, h2
-                            else:
-                                h3 = ceil50(h_cont)
-                                w3 = w2
-                                w_final, h_final = w3, h3
-                        W_lbl = int(w_final)
-                        H_lbl = int(h_final)
-                    else:
-                        W_lbl = 0
-                        H_lbl = 0
+                    # compute W x H (mm) using dp / aspect ratio from the sizing tab
+                    W_lbl, H_lbl = rect_wh_mm(q)
 
                     label = f"{q:.0f} m3/h\n{W_lbl} x {H_lbl} mm"
                     try:
@@ -5528,62 +6964,11 @@ class ResizableRectApp:
 
         # compute total duct surface area for supply and return and write only quantities to result box
         try:
-            def compute_rect_wh_mm(q_val):
-                try:
-                    dp_val_local = float(self.sizing_pressure_entry.get() or 0.1)
-                except Exception:
-                    dp_val_local = 0.1
-                D_exact_local = calc_circular_diameter_mm(max(0.0, q_val), max(1e-6, dp_val_local))
-                try:
-                    r_raw_local = (self.sizing_ratio_cb.get() or "2")
-                    r_local = float(r_raw_local)
-                    if r_local <= 0:
-                        r_local = 2.0
-                except Exception:
-                    r_local = 2.0
-                if D_exact_local <= 0:
-                    return 0, 0
-                try:
-                    a_cont_l = (D_exact_local / 1.3) * ((1.0 + r_local) ** 0.25) / (r_local ** 0.625)
-                    b_cont_l = r_local * a_cont_l
-                except Exception:
-                    a_cont_l = D_exact_local / 1.3
-                    b_cont_l = a_cont_l * r_local
-                w_cont_l = max(a_cont_l, b_cont_l)
-                h_cont_l = min(a_cont_l, b_cont_l)
-                import math
-                def _floor50(x):
-                    v = math.floor(x / 50.0) * 50
-                    return int(max(50, v))
-                def _ceil50(x):
-                    v = math.ceil(x / 50.0) * 50
-                    return int(max(50, v))
-                w1_l = _floor50(w_cont_l)
-                h1_l = _floor50(h_cont_l)
-                def rect_to_circle(a_rect, b_rect):
-                    try:
-                        return 1.3 * (((a_rect * b_rect) ** 0.625) / ((a_rect + b_rect) ** 0.25))
-                    except Exception:
-                        return 0.0
-                D1_l = rect_to_circle(w1_l, h1_l)
-                if D1_l >= D_exact_local:
-                    return int(w1_l), int(h1_l)
-                else:
-                    w2_l = _ceil50(w_cont_l)
-                    h2_l = h1_l
-                    D2_l = rect_to_circle(w2_l, h2_l)
-                    if D2_l >= D_exact_local:
-                        return int(w2_l), int(h2_l)
-                    else:
-                        h3_l = _ceil50(h_cont_l)
-                        w3_l = w2_l
-                        return int(w3_l), int(h3_l)
-
             supply_area = 0.0
             for seg, qv in seg_flow_map_supply.items():
                 try:
                     orient, fixed, a, b = seg
-                    W_mm, H_mm = compute_rect_wh_mm(qv)
+                    W_mm, H_mm = rect_wh_mm(qv)
                     if W_mm <= 0 or H_mm <= 0:
                         continue
                     W_m = float(W_mm) / 1000.0
@@ -5597,7 +6982,7 @@ class ResizableRectApp:
             for seg, qv in seg_flow_map_return.items():
                 try:
                     orient, fixed, a, b = seg
-                    W_mm, H_mm = compute_rect_wh_mm(qv)
+                    W_mm, H_mm = rect_wh_mm(qv)
                     if W_mm <= 0 or H_mm <= 0:
                         continue
                     W_m = float(W_mm) / 1000.0
@@ -5607,6 +6992,22 @@ class ResizableRectApp:
                 except Exception:
                     continue
 
+            # keep a structured summary for callers without a result box (drawer_batch)
+            def seg_rows(seg_map):
+                out = []
+                for (orient, fixed, a, b), qv in sorted(seg_map.items()):
+                    W_mm, H_mm = rect_wh_mm(qv)
+                    out.append({'orient': orient, 'fixed_m': fixed * grid_m, 'from_m': a * grid_m,
+                                'to_m': b * grid_m, 'flow_m3h': qv, 'w_mm': W_mm, 'h_mm': H_mm})
+                return out
+            self.last_route_result = {
+                'hvac': hvac_name,
+                'terminals': len(terminals),
+                'supply_area_m2': supply_area,
+                'return_area_m2': return_area,
+                'supply_segments': seg_rows(seg_flow_map_supply),
+                'return_segments': seg_rows(seg_flow_map_return),
+            }
             try:
                 # only write quantities to the result text area
                 self.sizing_text.insert(tk.END, f"[QUANTITY] Supply total duct area: {supply_area:,.2f} m2 (segments={len(seg_flow_map_supply)})\n")
@@ -5629,55 +7030,8 @@ class ResizableRectApp:
                         continue
                     try:
                         # compute rectangle size for terminal using sizing inputs
-                        try:
-                            dp_val_t = float(self.sizing_pressure_entry.get() or 0.1)
-                        except Exception:
-                            dp_val_t = 0.1
-                        # treat per-terminal flow similarly
-                        D_t = calc_circular_diameter_mm(max(0.0, tf), max(1e-6, dp_val_t))
-                        try:
-                            r_raw = (self.sizing_ratio_cb.get() or "2")
-                            r = float(r_raw)
-                            if r <= 0:
-                                r = 2.0
-                        except Exception:
-                            r = 2.0
-                        if D_t > 0:
-                            try:
-                                a_cont_t = (D_t / 1.3) * ((1.0 + r) ** 0.25) / (r ** 0.625)
-                                b_cont_t = r * a_cont_t
-                            except Exception:
-                                a_cont_t = D_t / 1.3
-                                b_cont_t = a_cont_t * r
-                            w_cont_t = max(a_cont_t, b_cont_t)
-                            h_cont_t = min(a_cont_t, b_cont_t)
-                            import math
-                            def floor50(x):
-                                v = math.floor(x / 50.0) * 50
-                                return int(max(50, v))
-                            def ceil50(x):
-                                v = math.ceil(x / 50.0) * 50
-                                return int(max(50, v))
-                            w1t = floor50(w_cont_t)
-                            h1t = floor50(h_cont_t)
-                            def rect_to_circle(a_rect, b_rect):
-                                try:
-                                    return 1.3 * (((a_rect * b_rect) ** 0.625) / ((a_rect + b_rect) ** 0.25))
-                                except Exception:
-                                    return 0.0
-                            D1t = rect_to_circle(w1t, h1t)
-                            if D1t >= D_t:
-                                w_final_t, h_final_t = w1t, h1t
-                            else:
-                                w2t = ceil50(w_cont_t)
-                                h2t = h1t
-                                D2t = rect_to_circle(w2t, h2t)
-                                if D2t >= D_t:
-                                    w_final_t, h_final_t = w2t, h2t
-                                else:
-                                    h3t = ceil50(h_cont_t)
-                                    w3t = w2t
-                                    w_final_t, h_final_t = w3t, h3t
+                        w_final_t, h_final_t = rect_wh_mm(tf)
+                        if w_final_t > 0:
                             labtxt = f"{tf:.0f} m3/h\n{int(w_final_t)} x {int(h_final_t)} mm"
                         else:
                             labtxt = f"{tf:.0f} m3/h"
@@ -5708,6 +7062,7 @@ class ResizableRectApp:
                             pass
         except Exception:
             pass
+        stage.lap('annotate')
 
     # draw onto palettes (convert grid indices back to pixel coords)
 
@@ -5774,60 +7129,8 @@ class ResizableRectApp:
                         mx = x
                         my = (y1 + y2) / 2.0
 
-                    # compute sizing for display (reuse same logic)
-                    try:
-                        dp_val = float(self.sizing_pressure_entry.get() or 0.1)
-                    except Exception:
-                        dp_val = 0.1
-                    D_exact = calc_circular_diameter_mm(max(0.0, q), max(1e-6, dp_val))
-                    try:
-                        r_raw = (self.sizing_ratio_cb.get() or "2")
-                        r = float(r_raw)
-                        if r <= 0:
-                            r = 2.0
-                    except Exception:
-                        r = 2.0
-                    if D_exact > 0:
-                        try:
-                            a_cont = (D_exact / 1.3) * ((1.0 + r) ** 0.25) / (r ** 0.625)
-                            b_cont = r * a_cont
-                        except Exception:
-                            a_cont = D_exact / 1.3
-                            b_cont = a_cont * r
-                        w_cont = max(a_cont, b_cont)
-                        h_cont = min(a_cont, b_cont)
-                        import math
-                        def _floor50(x):
-                            v = math.floor(x / 50.0) * 50
-                            return int(max(50, v))
-                        def _ceil50(x):
-                            v = math.ceil(x / 50.0) * 50
-                            return int(max(50, v))
-                        w1 = _floor50(w_cont)
-                        h1 = _floor50(h_cont)
-                        def rect_to_circle(a_rect, b_rect):
-                            try:
-                                return 1.3 * (((a_rect * b_rect) ** 0.625) / ((a_rect + b_rect) ** 0.25))
-                            except Exception:
-                                return 0.0
-                        D1 = rect_to_circle(w1, h1)
-                        if D1 >= D_exact:
-                            w_final, h_final = w1, h1
-                        else:
-                            w2 = _ceil50(w_cont)
-                            h2 = h1
-                            D2 = rect_to_circle(w2, h2)
-                            if D2 >= D_exact:
-                                w_final, h_final = w2, h2
-                            else:
-                                h3 = _ceil50(h_cont)
-                                w3 = w2
-                                w_final, h_final = w3, h3
-                        W_lbl = int(w_final)
-                        H_lbl = int(h_final)
-                    else:
-                        W_lbl = 0
-                        H_lbl = 0
+                    # compute sizing for display (batch-sized above)
+                    W_lbl, H_lbl = rect_wh_mm(q)
 
                     try:
                         spec_txt = f"{int(W_lbl):,} x {int(H_lbl):,} mm"
@@ -5993,60 +7296,8 @@ class ResizableRectApp:
                         x_draw = x + (max(4, int(spacing_px * 0.08)) if overlaps else 0)
                         mx = x_draw
 
-                    # compute sizing for display
-                    try:
-                        dp_val = float(self.sizing_pressure_entry.get() or 0.1)
-                    except Exception:
-                        dp_val = 0.1
-                    D_exact = calc_circular_diameter_mm(max(0.0, q), max(1e-6, dp_val))
-                    try:
-                        r_raw = (self.sizing_ratio_cb.get() or "2")
-                        r = float(r_raw)
-                        if r <= 0:
-                            r = 2.0
-                    except Exception:
-                        r = 2.0
-                    if D_exact > 0:
-                        try:
-                            a_cont = (D_exact / 1.3) * ((1.0 + r) ** 0.25) / (r ** 0.625)
-                            b_cont = r * a_cont
-                        except Exception:
-                            a_cont = D_exact / 1.3
-                            b_cont = a_cont * r
-                        w_cont = max(a_cont, b_cont)
-                        h_cont = min(a_cont, b_cont)
-                        import math
-                        def _floor50(x):
-                            v = math.floor(x / 50.0) * 50
-                            return int(max(50, v))
-                        def _ceil50(x):
-                            v = math.ceil(x / 50.0) * 50
-                            return int(max(50, v))
-                        w1 = _floor50(w_cont)
-                        h1 = _floor50(h_cont)
-                        def rect_to_circle(a_rect, b_rect):
-                            try:
-                                return 1.3 * (((a_rect * b_rect) ** 0.625) / ((a_rect + b_rect) ** 0.25))
-                            except Exception:
-                                return 0.0
-                        D1 = rect_to_circle(w1, h1)
-                        if D1 >= D_exact:
-                            w_final, h_final = w1, h1
-                        else:
-                            w2 = _ceil50(w_cont)
-                            h2 = h1
-                            D2 = rect_to_circle(w2, h2)
-                            if D2 >= D_exact:
-                                w_final, h_final = w2, h2
-                            else:
-                                h3 = _ceil50(h_cont)
-                                w3 = w2
-                                w_final, h_final = w3, h3
-                        W_lbl = int(w_final)
-                        H_lbl = int(h_final)
-                    else:
-                        W_lbl = 0
-                        H_lbl = 0
+                    # compute sizing for display (batch-sized above)
+                    W_lbl, H_lbl = rect_wh_mm(q)
 
                     try:
                         spec_txt = f"{int(W_lbl):,} x {int(H_lbl):,} mm"
@@ -6085,6 +7336,7 @@ class ResizableRectApp:
         except Exception:
             pass
 
+        stage.lap('draw')
         return True
 
     def _sizing_clear(self):
@@ -6098,6 +7350,197 @@ class ResizableRectApp:
 
     def _sizing_auto(self):
         self.sizing_text.insert(tk.END, "자동완성 수행(플레이스홀더)\n")
+
+    # -------- 일괄 사이징 (CSV / 붙여넣기) --------
+
+    BATCH_SIZING_COLUMNS = ("No", "풍량 (m³/h)", "정압값 (mmAq/m)", "종횡비", "원형덕트 (mm)", "W (mm)", "H (mm)")
+
+    def _sizing_batch_open(self):
+        """풍량 목록을 한 번에 사이징하는 시트 창"""
+        state = getattr(self, '_batch_sizing', None)
+        try:
+            if state and state['win'].winfo_exists():
+                state['win'].lift()
+                return
+        except Exception:
+            pass
+
+        win = tk.Toplevel(self.root)
+        win.title("일괄 사이징")
+        win.geometry("720x420")
+
+        bar = tk.Frame(win)
+        bar.pack(side=tk.TOP, fill=tk.X, padx=6, pady=6)
+        tk.Button(bar, text="CSV 불러오기", width=12, command=self._sizing_batch_load_csv).pack(side=tk.LEFT, padx=2)
+        tk.Button(bar, text="붙여넣기", width=12, command=self._sizing_batch_paste).pack(side=tk.LEFT, padx=2)
+        tk.Button(bar, text="내보내기", width=12, command=self._sizing_batch_export).pack(side=tk.LEFT, padx=2)
+        tk.Button(bar, text="닫기", width=8, command=win.destroy).pack(side=tk.RIGHT, padx=2)
+        status_var = tk.StringVar(value="풍량[, 정압값[, 종횡비]] 열을 CSV로 불러오거나 붙여넣으세요. 빈 값은 사이징 탭 입력값을 씁니다.")
+        tk.Label(win, textvariable=status_var, anchor='w').pack(side=tk.BOTTOM, fill=tk.X, padx=6, pady=(0, 6))
+
+        body = tk.Frame(win)
+        body.pack(fill=tk.BOTH, expand=True, padx=6)
+        cols = [f"c{i}" for i in range(len(self.BATCH_SIZING_COLUMNS))]
+        tree = ttk.Treeview(body, columns=cols, show='headings')
+        for c, title in zip(cols, self.BATCH_SIZING_COLUMNS):
+            tree.heading(c, text=title)
+            tree.column(c, width=50 if c == 'c0' else 100, anchor='e')
+        vsb = tk.Scrollbar(body, orient=tk.VERTICAL, command=tree.yview)
+        tree.configure(yscrollcommand=vsb.set)
+        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        vsb.pack(side=tk.LEFT, fill=tk.Y)
+
+        self._batch_sizing = {'win': win, 'tree': tree, 'status': status_var, 'results': []}
+
+    def _sizing_batch_load_csv(self):
+        from tkinter import filedialog
+        import csv
+        state = getattr(self, '_batch_sizing', None)
+        if not state:
+            return
+        fp = filedialog.askopenfilename(parent=state['win'], title="풍량 CSV 선택",
+                                        filetypes=[("CSV files", "*.csv"), ("Text files", "*.txt"), ("All files", "*")])
+        if not fp:
+            return
+        rows = None
+        for enc in ("utf-8-sig", "cp949", "latin-1"):
+            try:
+                with open(fp, 'r', encoding=enc, errors='strict', newline='') as f:
+                    rows = [r for r in csv.reader(f)]
+                break
+            except Exception:
+                continue
+        if rows is None:
+            messagebox.showerror("CSV 로드 오류", "파일을 읽을 수 없습니다.", parent=state['win'])
+            return
+        self._sizing_batch_run(rows)
+
+    def _sizing_batch_paste(self):
+        state = getattr(self, '_batch_sizing', None)
+        if not state:
+            return
+        try:
+            text = self.root.clipboard_get()
+        except Exception:
+            messagebox.showinfo("붙여넣기", "클립보드에 텍스트가 없습니다.", parent=state['win'])
+            return
+        rows = []
+        for line in text.splitlines():
+            # 엑셀 복사는 탭 구분, 그 외에는 세미콜론/공백 구분 (쉼표는 천 단위 구분자로 취급)
+            if '\t' in line:
+                cells = line.split('\t')
+            elif ';' in line:
+                cells = line.split(';')
+            else:
+                cells = line.split()
+            rows.append(cells)
+        self._sizing_batch_run(rows)
+
+    @staticmethod
+    def _parse_batch_number(cell):
+        try:
+            return float(str(cell).strip().replace(',', ''))
+        except Exception:
+            return None
+
+    def _sizing_batch_run(self, rows):
+        """행 목록([풍량, 정압, 종횡비]) -> 한 번의 배치 호출로 사이징 후 표에 표시"""
+        state = getattr(self, '_batch_sizing', None)
+        if not state:
+            return
+        try:
+            dp_default = float(self.sizing_pressure_entry.get() or 0.1)
+        except Exception:
+            dp_default = 0.1
+        try:
+            r_default = float(self.sizing_ratio_cb.get() or "2")
+        except Exception:
+            r_default = 2.0
+
+        flows, dps, ratios = [], [], []
+        skipped = 0
+        for cells in rows:
+            if not cells or not any(str(c).strip() for c in cells):
+                continue
+            q = self._parse_batch_number(cells[0])
+            if q is None:
+                # 머리글 또는 숫자가 아닌 행
+                skipped += 1
+                continue
+            dp = self._parse_batch_number(cells[1]) if len(cells) > 1 and str(cells[1]).strip() else None
+            r = self._parse_batch_number(cells[2]) if len(cells) > 2 and str(cells[2]).strip() else None
+            flows.append(q)
+            dps.append(dp if dp is not None else dp_default)
+            ratios.append(r if r is not None else r_default)
+
+        if not flows:
+            messagebox.showinfo("일괄 사이징", "풍량 값을 찾지 못했습니다.", parent=state['win'])
+            return
+
+        # 단일 계산(_sizing_calc)과 같은 규칙: D는 반올림 없이, 50mm 내림/올림 휴리스틱
+        D, W, H = size_ducts_batch(flows, dps, ratios, rule="stepped")
+        results = [(i + 1, q, dp, r, float(d), int(w), int(h))
+                   for i, (q, dp, r, d, w, h) in enumerate(zip(flows, dps, ratios, D, W, H))]
+        state['results'] = results
+
+        tree = state['tree']
+        tree.delete(*tree.get_children())
+        failed = 0
+        for no, q, dp, r, d, w, h in results:
+            if w <= 0 or h <= 0:
+                failed += 1
+                values = (no, f"{q:,.0f}", f"{dp:g}", f"{r:g}", "-", "-", "-")
+            else:
+                values = (no, f"{q:,.0f}", f"{dp:g}", f"{r:g}", f"{int(round(d)):,}", f"{w:,}", f"{h:,}")
+            tree.insert('', tk.END, values=values)
+        msg = f"{len(results)}건 사이징 완료"
+        if failed:
+            msg += f" (계산 불가 {failed}건: 풍량/정압값/종횡비 확인)"
+        if skipped:
+            msg += f", 숫자가 아닌 행 {skipped}건 제외"
+        state['status'].set(msg)
+
+    def _sizing_batch_export(self):
+        from tkinter import filedialog
+        state = getattr(self, '_batch_sizing', None)
+        if not state or not state.get('results'):
+            messagebox.showinfo("내보내기", "먼저 풍량 목록을 불러와 사이징하세요.",
+                                parent=state['win'] if state else self.root)
+            return
+        fp = filedialog.asksaveasfilename(parent=state['win'], defaultextension='.xlsx',
+                                          filetypes=[('Excel files', '*.xlsx'), ('CSV files', '*.csv'), ('All files', '*.*')],
+                                          title='일괄 사이징 결과 저장')
+        if not fp:
+            return
+        header = list(self.BATCH_SIZING_COLUMNS)
+        out_rows = [[no, q, dp, r, int(round(d)) if w > 0 else "", w or "", h or ""]
+                    for no, q, dp, r, d, w, h in state['results']]
+        try:
+            use_xlsx = fp.lower().endswith('.xlsx')
+            if use_xlsx:
+                try:
+                    from openpyxl import Workbook
+                except Exception:
+                    use_xlsx = False
+                    fp = fp[:-5] + '.csv'
+            if use_xlsx:
+                wb = Workbook()
+                ws = wb.active
+                ws.title = '일괄 사이징'
+                ws.append(header)
+                for row in out_rows:
+                    ws.append(row)
+                wb.save(fp)
+            else:
+                import csv
+                # BOM so Excel (Windows) recognizes UTF-8 Korean headers
+                with open(fp, 'w', newline='', encoding='utf-8-sig') as cf:
+                    writer = csv.writer(cf)
+                    writer.writerow(header)
+                    writer.writerows(out_rows)
+            messagebox.showinfo('저장 완료', f'일괄 사이징 결과를 저장했습니다: {fp}', parent=state['win'])
+        except Exception as e:
+            messagebox.showerror('저장 오류', f'파일 저장 중 오류가 발생했습니다:\n{e}', parent=state['win'])
     
     def _compute_thickness_breakdown(self):
         # Read the low/high pressure rule entries and display a simple summary
@@ -6186,14 +7629,16 @@ class ResizableRectApp:
                         continue
                     pal = mapping.get('palette')
                     ids = set(mapping.get('ids', set()) or set())
-                    if pal:
+                    # a hidden tab's markers live in its dormant snapshot: realize it
+                    # first so they are deleted instead of coming back as orphans
+                    if pal and self._realize_palette(pal):
                         for iid in list(ids):
                             try:
                                 iid_int = int(iid)
                             except Exception:
                                 iid_int = iid
                             try:
-                                if iid_int in pal.canvas.find_all():
+                                if pal.canvas.type(iid_int):
                                     try:
                                         tags = pal.canvas.gettags(iid_int)
                                     except Exception:
@@ -6213,12 +7658,7 @@ class ResizableRectApp:
                                 pass
                         # clear highlighted outlines on this palette
                         try:
-                            for hid in list(getattr(self, '_hvac_highlighted', set())):
-                                try:
-                                    if hid in pal.canvas.find_all():
-                                        pal.canvas.itemconfigure(hid, outline='')
-                                except Exception:
-                                    pass
+                            pal._set_point_states({hid: '' for hid in getattr(self, '_hvac_highlighted', set())})
                             self._hvac_highlighted.clear()
                         except Exception:
                             pass
@@ -6228,7 +7668,7 @@ class ResizableRectApp:
             try:
                 self.hvac_map.clear()
             except Exception:
-                self.hvac_map = {}
+                self.hvac_map = HvacMap()
             try:
                 if getattr(self, 'duct_selected_label_var', None) is not None:
                     self.duct_selected_label_var.set("선택 디퓨저: 0")
@@ -6244,23 +7684,11 @@ class ResizableRectApp:
         on whether the item id is present in any hvac_map mapping. If the item is also in
         the palette.selected_points set, selected-but-unassigned items are shown as blue.
         """
-        if palette is None:
+        if not self._realize_palette(palette):
             return
         try:
-            # build a set of all assigned ids across hvac_map (for fast lookup)
-            assigned_all = set()
-            try:
-                for m in getattr(self, 'hvac_map', {}).values():
-                    try:
-                        for iid in m.get('ids', set()) or set():
-                            try:
-                                assigned_all.add(int(iid))
-                            except Exception:
-                                assigned_all.add(iid)
-                    except Exception:
-                        continue
-            except Exception:
-                assigned_all = set()
+            # ids assigned to any system on this palette (reverse index, O(1) lookup)
+            assigned_all = self.hvac_map.assigned_ids(palette)
 
             # iterate diffuser items tracked on palette (use tag 'diffuser' where possible)
             try:
@@ -6268,25 +7696,18 @@ class ResizableRectApp:
             except Exception:
                 candidates = list(palette.canvas.find_all())
 
+            # assigned -> red, selected-but-unassigned -> blue, else cleared;
+            # only items whose state changed are re-tagged/re-styled
+            selected = getattr(palette, 'selected_points', None) or set()
+            states = {}
             for iid in candidates:
-                try:
-                    if iid in assigned_all:
-                        # assigned: red outline
-                        try:
-                            palette.canvas.itemconfigure(iid, outline='red', width=2)
-                        except Exception:
-                            pass
-                    else:
-                        # unassigned: if selected, blue; else clear
-                        try:
-                            if getattr(palette, 'selected_points', None) and iid in getattr(palette, 'selected_points', set()):
-                                palette.canvas.itemconfigure(iid, outline='blue')
-                            else:
-                                palette.canvas.itemconfigure(iid, outline='')
-                        except Exception:
-                            pass
-                except Exception:
-                    continue
+                if iid in assigned_all:
+                    states[iid] = 'assigned'
+                elif iid in selected:
+                    states[iid] = 'selected'
+                else:
+                    states[iid] = ''
+            palette._set_point_states(states)
         except Exception:
             pass
 
@@ -6411,24 +7832,8 @@ class ResizableRectApp:
             # already assigned to some other HVAC in self.hvac_map. If so, notify
             # the user and offer to reassign them to the current system.
             try:
-                conflicts = {}
-                for other_name, mapping in list(self.hvac_map.items()):
-                    try:
-                        if not mapping or not isinstance(mapping, dict):
-                            continue
-                        if other_name == name:
-                            continue
-                        other_ids = set()
-                        for oi in mapping.get('ids', set()) or set():
-                            try:
-                                other_ids.add(int(oi))
-                            except Exception:
-                                other_ids.add(oi)
-                        inter = set(sel_points_int) & other_ids
-                        if inter:
-                            conflicts[other_name] = inter
-                    except Exception:
-                        continue
+                # reverse index lookup on this palette: O(1) per selected id
+                conflicts = self.hvac_map.conflicts(sel_points_int, name, rc)
                 if conflicts:
                     # build message listing conflicts per system
                     parts = []
@@ -6452,32 +7857,7 @@ class ResizableRectApp:
                             other_map = self.hvac_map.get(oname)
                             if not other_map or not isinstance(other_map, dict):
                                 continue
-                            other_palette = other_map.get('palette')
-                            other_set = set()
-                            for oi in other_map.get('ids', set()) or set():
-                                try:
-                                    other_set.add(int(oi))
-                                except Exception:
-                                    other_set.add(oi)
-                            # remove conflicting ids
-                            for rem in ids:
-                                try:
-                                    if rem in other_set:
-                                        other_set.remove(rem)
-                                except Exception:
-                                    try:
-                                        other_set.discard(rem)
-                                    except Exception:
-                                        pass
-                            # update mapping
-                            try:
-                                other_map['ids'] = other_set
-                                self.hvac_map[oname] = other_map
-                            except Exception:
-                                try:
-                                    del self.hvac_map[oname]
-                                except Exception:
-                                    pass
+                            self.hvac_map.remove_ids(oname, ids)
                             # refresh outlines on the other palette if available
                             try:
                                 opal = other_map.get('palette')
@@ -6528,7 +7908,7 @@ class ResizableRectApp:
                                 except Exception:
                                     continue
                             try:
-                                if iid_int not in rc.canvas.find_all():
+                                if not rc.canvas.type(iid_int):
                                     continue
                             except Exception:
                                 # if find_all fails for this id, skip
@@ -6627,10 +8007,8 @@ class ResizableRectApp:
             if not sel:
                 return
             name = self.hvac_listbox.get(sel[0])
-            try:
-                print(f"DEBUG _on_hvac_select: selected_name={name}")
-            except Exception:
-                pass
+            if PERF.enabled:
+                PERF.mark('hvac_select', 'hvac', name=name)
             # track active hvac name for robust checks in mouse handlers
             try:
                 self._active_hvac_name = name
@@ -6639,15 +8017,9 @@ class ResizableRectApp:
             rc = self.get_current_palette()
             if not rc:
                 return
-            # clear previous highlights for this palette
+            # previous highlights: the point selection below resets their state
+            # (assigned ids keep the red tag), so only the bookkeeping is cleared
             try:
-                for iid in list(getattr(self, '_hvac_highlighted', set())):
-                    try:
-                        # only clear items that still exist on this canvas
-                        if iid in rc.canvas.find_all():
-                            rc.canvas.itemconfigure(iid, outline='')
-                    except Exception:
-                        pass
                 self._hvac_highlighted.clear()
             except Exception:
                 pass
@@ -6671,10 +8043,9 @@ class ResizableRectApp:
 
             # fetch mapping (stored as {'palette': rc_obj, 'ids': set(...)})
             mapping = self.hvac_map.get(name)
-            try:
-                print(f"DEBUG _on_hvac_select: mapping_exists={bool(mapping)} mapping={mapping}")
-            except Exception:
-                pass
+            if PERF.enabled:
+                PERF.mark('hvac_select.mapping', 'hvac', name=name, exists=bool(mapping),
+                          ids=len(mapping.get('ids', ()) or ()) if isinstance(mapping, dict) else 0)
             mapped_for_palette = []
             if mapping and isinstance(mapping, dict):
                 try:
@@ -6692,10 +8063,8 @@ class ResizableRectApp:
                         self.duct_selected_label_var.set("선택 디퓨저: 0")
                 except Exception:
                     pass
-                try:
-                    print(f"DEBUG _on_hvac_select: no mapped items for {name}; cleared selection on palette")
-                except Exception:
-                    pass
+                if PERF.enabled:
+                    PERF.mark('hvac_select.empty', 'hvac', name=name)
                 try:
                     # Force focus to the canvas so that a user clicking/dragging
                     # on the palette immediately after selecting an HVAC will
@@ -6717,28 +8086,27 @@ class ResizableRectApp:
                     pass
                 return
 
-            # apply new highlights and selection set
-            for iid in mapped_for_palette:
+            # apply new highlights and selection set: tag the mapped ids, then
+            # one find_withtag tells which of them still exist on this canvas
+            try:
+                rc._set_point_states({iid: 'assigned' for iid in mapped_for_palette})
+                live = set(rc.canvas.find_withtag(rc.POINT_STATE_TAGS['assigned']))
+                shown = [iid for iid in mapped_for_palette if iid in live]
                 try:
-                    if iid in rc.canvas.find_all():
-                        rc.canvas.itemconfigure(iid, outline='red', width=2)
-                        try:
-                            rc.selected_points.add(iid)
-                        except Exception:
-                            rc.selected_points = set([iid])
-                        self._hvac_highlighted.add(iid)
+                    rc.selected_points.update(shown)
                 except Exception:
-                    pass
+                    rc.selected_points = set(shown)
+                self._hvac_highlighted.update(shown)
+            except Exception:
+                pass
             # update selection count label
             try:
                 if getattr(self, 'duct_selected_label_var', None) is not None:
                     self.duct_selected_label_var.set(f"선택 디퓨저: {len(getattr(rc, 'selected_points', set()))}")
             except Exception:
                 pass
-            try:
-                print(f"DEBUG _on_hvac_select: restored {len(getattr(rc, 'selected_points', set()))} items for {name}")
-            except Exception:
-                pass
+            if PERF.enabled:
+                PERF.mark('hvac_select.restored', 'hvac', name=name, count=len(getattr(rc, 'selected_points', set())))
             try:
                 rc.canvas.focus_set()
             except Exception:
@@ -6826,7 +8194,7 @@ class ResizableRectApp:
             try:
                 # restore Palette instance handlers
                 canvas.bind('<ButtonPress-1>', rc.on_left_down)
-                canvas.bind('<B1-Motion>', rc.on_left_drag)
+                canvas.bind('<B1-Motion>', rc._queue_drag)
                 canvas.bind('<ButtonRelease-1>', rc.on_left_up)
                 # ensure canvas has focus to receive events
                 try:
@@ -6936,15 +8304,8 @@ class ResizableRectApp:
                                     for did in hvac_ids:
                                         try:
                                             # find the palette that contains this item id
-                                            found_pal = None
                                             found_lab = None
-                                            for pal in getattr(self, 'palettes', []):
-                                                try:
-                                                    if did in pal.canvas.find_all():
-                                                        found_pal = pal
-                                                        break
-                                                except Exception:
-                                                    continue
+                                            found_pal = self._palette_with_item(did, prefer=rc)
                                             if not found_pal:
                                                 continue
                                             try:
@@ -6991,16 +8352,7 @@ class ResizableRectApp:
                                     ft = f"{main_point_flows[iid]:.2f} m3/hr"
                                     # bind enter/leave on the palette canvas where the main point exists
                                     try:
-                                        mp_pal = rc
-                                        if iid not in mp_pal.canvas.find_all():
-                                            # try find the palette containing the main point
-                                            for pal2 in getattr(self, 'palettes', []):
-                                                try:
-                                                    if iid in pal2.canvas.find_all():
-                                                        mp_pal = pal2
-                                                        break
-                                                except Exception:
-                                                    continue
+                                        mp_pal = self._palette_with_item(iid, prefer=rc) or rc
                                         mp_pal.canvas.tag_bind(iid, '<Enter>', (lambda ev, pal=mp_pal, txt=ft: pal._show_flow_tooltip(txt, ev.x, ev.y)))
                                         mp_pal.canvas.tag_bind(iid, '<Leave>', (lambda ev, pal=mp_pal: pal._hide_flow_tooltip()))
                                     except Exception:
@@ -7018,15 +8370,7 @@ class ResizableRectApp:
                             for iid, qv in list(main_point_flows.items()):
                                 try:
                                     # find palette that contains this main point id
-                                    mp_pal = rc
-                                    if iid not in mp_pal.canvas.find_all():
-                                        for pal2 in getattr(self, 'palettes', []):
-                                            try:
-                                                if iid in pal2.canvas.find_all():
-                                                    mp_pal = pal2
-                                                    break
-                                            except Exception:
-                                                continue
+                                    mp_pal = self._palette_with_item(iid, prefer=rc) or rc
                                     # get coords
                                     try:
                                         coords = mp_pal.canvas.coords(iid)
@@ -7100,7 +8444,7 @@ class ResizableRectApp:
                     try:
                         existing = list(canvas.find_withtag('diffuser'))
                         if existing:
-                            c = canvas.coords(existing[0])
+                            c = rc._item_coords(existing[0])
                             if c and len(c) >= 4:
                                 radius = abs((c[2] - c[0]) / 2.0)
                     except Exception:
@@ -7178,7 +8522,7 @@ class ResizableRectApp:
                         existing = list(canvas.find_withtag('diffuser'))
                         if existing:
                             # use first diffuser's bbox to derive radius
-                            c = canvas.coords(existing[0])
+                            c = rc._item_coords(existing[0])
                             if c and len(c) >= 4:
                                 radius = abs((c[2] - c[0]) / 2.0)
                     except Exception:
@@ -7252,82 +8596,130 @@ class ResizableRectApp:
     def load_csv_preview(self):
         """Open a CSV file and show its contents in a new window as a simple table.
 
-        Uses several encoding fallbacks (utf-8, cp949, latin-1) to handle common CSV encodings.
+        The encoding is detected from a sample at the start of the file (BOM, utf-8,
+        cp949, latin-1); if a later part of the file does not decode, the reader starts
+        over with the next candidate instead of substituting characters. Rows are read in chunks on a background thread and shown in a
+        virtual table that only creates Treeview rows for the visible window, so large
+        catalogues open immediately. The rows become available to popups
+        (last_csv_rows) once the whole file has been read.
         """
         from tkinter import filedialog
-        import csv
 
         file_path = filedialog.askopenfilename(title="CSV 파일 선택", filetypes=[("CSV files", "*.csv"), ("All files", "*")])
         if not file_path:
             return
 
-        encodings = ["utf-8", "cp949", "latin-1"]
-        rows = []
-        used_enc = None
-        for enc in encodings:
-            try:
-                with open(file_path, 'r', encoding=enc, errors='strict') as f:
-                    reader = csv.reader(f)
-                    rows = [r for r in reader]
-                used_enc = enc
-                break
-            except Exception:
-                # try next encoding
-                continue
+        try:
+            used_enc = detect_csv_encoding(file_path)
+        except Exception as e:
+            messagebox.showerror("CSV 로드 오류", f"파일을 읽을 수 없습니다:\n{e}")
+            return
 
-        if used_enc is None:
-            # last resort: open with latin-1 permissive
-            try:
-                with open(file_path, 'r', encoding='latin-1', errors='replace') as f:
-                    reader = csv.reader(f)
-                    rows = [r for r in reader]
-                used_enc = 'latin-1'
-            except Exception as e:
-                messagebox.showerror("CSV 로드 오류", f"파일을 읽을 수 없습니다:\n{e}")
-                return
+        # 이전 로드가 진행 중이면 중단
+        prev = getattr(self, '_csv_load_cancel', None)
+        if prev is not None:
+            prev.set()
+        cancel = threading.Event()
+        self._csv_load_cancel = cancel
+
+        rows = []
+        results = queue.Queue()
+        threading.Thread(target=read_csv_chunks, args=(file_path, used_enc, results, cancel),
+                         daemon=True).start()
 
         # create preview window
-        # save loaded CSV on the app for later use by popups
-        try:
-            self.last_csv_rows = rows
-            self.last_csv_file_path = file_path
-            self.last_csv_encoding = used_enc
-        except Exception:
-            pass
-        
+        title_path = os.path.basename(file_path)
+        base_title = f"CSV 미리보기 - {title_path} ({used_enc})"
         win = tk.Toplevel(self.root)
-        win.title(f"CSV 미리보기 - {os.path.basename(file_path)} ({used_enc})")
+        win.title(base_title + " - 읽는 중...")
         win.geometry("800x400")
 
-        from tkinter import ttk
-        tree = ttk.Treeview(win, show='headings')
-
-        # determine column count
-        max_cols = max((len(r) for r in rows), default=0)
-        cols = [f"C{i+1}" for i in range(max_cols)]
-        tree['columns'] = cols
-        for i, c in enumerate(cols):
-            tree.heading(c, text=c)
-            tree.column(c, width=120, anchor='w')
-
-        # insert rows
-        for r in rows:
-            # pad shorter rows
-            row = list(r) + [""] * (max_cols - len(r))
-            tree.insert('', tk.END, values=row)
-
-        tree.pack(fill=tk.BOTH, expand=True)
+        table = VirtualTable(win, rows)
+        table.frame.pack(fill=tk.BOTH, expand=True)
 
         # add a simple close button
         btn = tk.Button(win, text="닫기", command=win.destroy)
         btn.pack(side=tk.BOTTOM, pady=6)
+
+        def poll():
+            nonlocal used_enc, base_title
+            if cancel.is_set():
+                return
+            done = False
+            error = None
+            grew = False
+            # 한 번에 너무 오래 잡지 않도록 틱당 처리할 청크 수 제한
+            for _ in range(20):
+                try:
+                    kind, payload = results.get_nowait()
+                except queue.Empty:
+                    break
+                if kind == 'rows':
+                    rows.extend(payload)
+                    table.set_columns(max((len(r) for r in payload), default=0))
+                    grew = True
+                elif kind == 'restart':
+                    # 뒤쪽에서 디코딩 실패: 다른 인코딩으로 처음부터 다시 읽음
+                    used_enc = payload
+                    base_title = f"CSV 미리보기 - {title_path} ({used_enc})"
+                    del rows[:]
+                    table.top = 0
+                    grew = True
+                elif kind == 'done':
+                    done = True
+                    break
+                else:
+                    error = payload
+                    break
+            win_alive = False
+            try:
+                win_alive = bool(win.winfo_exists())
+            except Exception:
+                pass
+            if error is not None:
+                self._csv_load_cancel = None
+                messagebox.showerror("CSV 로드 오류", f"파일을 읽을 수 없습니다:\n{error}")
+                return
+            if win_alive and grew:
+                table.refresh()
+            if done:
+                # save loaded CSV on the app for later use by popups
+                try:
+                    self.last_csv_rows = rows
+                    self.last_csv_file_path = file_path
+                    self.last_csv_encoding = used_enc
+                    self._equipment_catalog = EquipmentCatalog(rows)
+                except Exception:
+                    pass
+                self._csv_load_cancel = None
+                if win_alive:
+                    win.title(f"{base_title} - {len(rows)}행")
+                return
+            if win_alive and grew:
+                win.title(f"{base_title} - 읽는 중... {len(rows)}행")
+            self.root.after(30, poll)
+
+        self.root.after(30, poll)
  
+    def get_equipment_catalog(self):
+        """last_csv_rows 를 해석한 EquipmentCatalog (CSV가 바뀌었을 때만 다시 만듦)"""
+        rows = getattr(self, 'last_csv_rows', None)
+        if not rows:
+            return None
+        cat = getattr(self, '_equipment_catalog', None)
+        if cat is None or cat.rows is not rows:
+            cat = EquipmentCatalog(rows)
+            self._equipment_catalog = cat
+        return cat
+
     def extract_equipment_list(self):
-        """Collect per-room displayed values and export to .xlsx (or CSV fallback).
+        """Collect per-room values and export them to .xlsx (or CSV fallback).
 
         Uses the currently selected palette (tab). If CSV rows were loaded earlier via
         'CSV로드', those rows are used to select table values per-room similarly to the
-        popup logic.
+        popup logic. Room values are read once on the UI thread; column selection and
+        writing run on a background thread and stream rows (openpyxl write-only mode
+        or csv.writer), so memory stays flat for whole-building schedules.
         """
         rows = getattr(self, 'last_csv_rows', None)
         if not rows:
@@ -7339,231 +8731,15 @@ class ResizableRectApp:
             messagebox.showinfo('장비일람표 없음', '활성화된 팔레트를 선택하세요.')
             return
 
-        base_header = [
-            "Room Name",
-            "HVAC Type",
-            "HVAC Detail",
-            "Area (m2)",
-            "Norm (W/m2)",
-            "Equip (W/m2)",
-            "Matched CSV Column",
-            "Matched Value",
-        ]
-
-        export_rows = [base_header]
-
-        def _get_text(lab, key):
-            try:
-                return rc.canvas.itemcget(lab[key], 'text')
-            except Exception:
-                return ""
-
-        # helper to extract first numeric token
-        def _extract_num_token(s: str):
-            if not s:
-                return ""
-            for tok in s.replace(',', ' ').split():
-                try:
-                    float(tok)
-                    return tok
-                except Exception:
-                    continue
-            return ""
-
-        # iterate labels from the active palette
-        for lab in getattr(rc, 'generated_space_labels', []):
-            try:
-                name = _get_text(lab, 'name_id')
-                area_text = _get_text(lab, 'area_id')
-                norm_text = _get_text(lab, 'heat_norm_id')
-                equip_text = _get_text(lab, 'heat_equip_id')
-
-                area_val = _extract_num_token(area_text)
-                norm_val = _extract_num_token(norm_text)
-                equip_val = _extract_num_token(equip_text)
-
-                hvac_type = lab.get('hvac_type', '')
-                hvac_detail_text = lab.get('hvac_detail_text', '') or lab.get('hvac_detail', '') or ''
-
-                matched_col = ''
-                matched_val = ''
-                table_rows_for_export = []
-
-                # reproduce popup selection logic minimally
-                try:
-                    rows_local = rows
-                    if rows_local and len(rows_local) >= 2 and str(hvac_type) == '2' and hvac_detail_text:
-                        headers = rows_local[0]
-                        second = rows_local[1]
-                        sel_detail = hvac_detail_text
-
-                        preferred_cols = []
-                        for ci, h in enumerate(headers):
-                            try:
-                                if sel_detail.lower() in str(h).lower():
-                                    preferred_cols.append(ci)
-                            except Exception:
-                                continue
-
-                        candidates = []
-                        if preferred_cols:
-                            for ci in preferred_cols:
-                                try:
-                                    v = float(second[ci]) if ci < len(second) else None
-                                    if v is not None:
-                                        candidates.append((ci, v))
-                                except Exception:
-                                    continue
-                        else:
-                            for ci, val in enumerate(second):
-                                try:
-                                    v = float(val)
-                                    candidates.append((ci, v))
-                                except Exception:
-                                    continue
-
-                        csv_shown_vals = []
-                        if sel_detail and not preferred_cols:
-                            csv_shown_vals = [((r[0] if len(r) > 0 else ''), '') for r in rows_local]
-                        else:
-                            if candidates:
-                                import math
-                                # compute total_kw safely
-                                try:
-                                    total_kw_local = float(area_val) * (float(norm_val) if norm_val else 0.0 + float(equip_val) if equip_val else 0.0) / 1000.0
-                                except Exception:
-                                    total_kw_local = 0.0
-
-                                if preferred_cols and sel_detail:
-                                    vals_only = [c[1] for c in candidates]
-                                    max_val = max(vals_only) if vals_only else 0.0
-
-                                    # If the user previously saved a quantity for this lab, prefer it
-                                    stored_qty = None
-                                    try:
-                                        if 'hvac_qty' in lab and lab.get('hvac_qty') is not None:
-                                            stored_qty = int(lab.get('hvac_qty'))
-                                    except Exception:
-                                        stored_qty = None
-
-                                    # compute qty/target using stored quantity when available
-                                    if stored_qty is not None and stored_qty > 0:
-                                        qty = stored_qty
-                                        target = total_kw_local / max(1, qty)
-                                    else:
-                                        if max_val > 0 and total_kw_local < max_val:
-                                            target = total_kw_local / 2.0
-                                            qty = 2
-                                        else:
-                                            if max_val > 0:
-                                                ratio = total_kw_local / max_val
-                                            else:
-                                                ratio = total_kw_local
-                                            qty = int(math.ceil(ratio)) + 2
-                                            if qty <= 0:
-                                                qty = 2
-                                            target = total_kw_local / qty if qty != 0 else total_kw_local
-
-                                    greater = [c for c in candidates if c[1] >= target]
-                                    if greater:
-                                        best = min(greater, key=lambda x: x[1])
-                                    else:
-                                        lesser = [c for c in candidates if c[1] < target]
-                                        if lesser:
-                                            best = max(lesser, key=lambda x: x[1])
-                                        else:
-                                            best = candidates[0]
-                                    ci, cv = best
-                                    matched_col = headers[ci] if ci < len(headers) else f'C{ci+1}'
-                                    csv_shown_vals = [((r[0] if len(r) > 0 else ''), (r[ci] if ci < len(r) else '')) for r in rows_local]
-                                    try:
-                                        # ensure displayed quantity reflects stored value if present
-                                        csv_shown_vals.insert(0, ("대수(Q'ty)", str(qty)))
-                                    except Exception:
-                                        pass
-                                    for data_row in rows_local[1:]:
-                                        if ci < len(data_row) and data_row[ci] is not None and str(data_row[ci]).strip() != "":
-                                            matched_val = data_row[ci]
-                                            break
-                                else:
-                                            # consider stored quantity when available for default selection as well
-                                            stored_qty = None
-                                            try:
-                                                if 'hvac_qty' in lab and lab.get('hvac_qty') is not None:
-                                                    stored_qty = int(lab.get('hvac_qty'))
-                                            except Exception:
-                                                stored_qty = None
-
-                                            if stored_qty is not None and stored_qty > 0:
-                                                # compute target per-unit value and pick candidate closest >= target else closest below
-                                                target = total_kw_local / max(1, stored_qty)
-                                                greater = [c for c in candidates if c[1] >= target]
-                                                if greater:
-                                                    best = min(greater, key=lambda x: x[1])
-                                                else:
-                                                    lesser = [c for c in candidates if c[1] < target]
-                                                    if lesser:
-                                                        best = max(lesser, key=lambda x: abs(x[1] - target))
-                                                    else:
-                                                        best = candidates[0]
-                                            else:
-                                                greater = [c for c in candidates if c[1] >= total_kw_local]
-                                                if greater:
-                                                    best = min(greater, key=lambda x: x[1])
-                                                else:
-                                                    lesser = [c for c in candidates if c[1] < total_kw_local]
-                                                    if lesser:
-                                                        best = max(lesser, key=lambda x: x[1])
-                                                    else:
-                                                        best = candidates[0]
-                                            ci, cv = best
-                                            matched_col = headers[ci] if ci < len(headers) else f'C{ci+1}'
-                                            csv_shown_vals = [((r[0] if len(r) > 0 else ''), (r[ci] if ci < len(r) else '')) for r in rows_local]
-                                            # if stored_qty exists, insert it as the first quantity row so exported table reflects edited qty
-                                            try:
-                                                if stored_qty is not None:
-                                                    csv_shown_vals.insert(0, ("대수(Q'ty)", str(stored_qty)))
-                                                else:
-                                                    csv_shown_vals.insert(0, ("대수(Q'ty)", "1"))
-                                            except Exception:
-                                                pass
-                                            for data_row in rows_local[1:]:
-                                                if ci < len(data_row) and data_row[ci] is not None and str(data_row[ci]).strip() != "":
-                                                    matched_val = data_row[ci]
-                                                    break
-
-                        # prepare table rows list
-                        for t0, v0 in csv_shown_vals:
-                            table_rows_for_export.append((str(t0).strip(), str(v0).strip()))
-                except Exception:
-                    matched_col = ''
-                    matched_val = ''
-                    table_rows_for_export = []
-
-                export_rows.append([
-                    name,
-                    str(hvac_type),
-                    hvac_detail_text,
-                    area_val,
-                    norm_val,
-                    equip_val,
-                    matched_col,
-                    matched_val,
-                    table_rows_for_export
-                ])
-            except Exception:
-                # skip problematic label but continue
-                continue
+        worker = getattr(self, '_equipment_export_thread', None)
+        if worker is not None and worker.is_alive():
+            messagebox.showinfo('장비일람표', '이전 내보내기가 아직 진행 중입니다.')
+            return
 
-        # Build final header with Table columns expanded to maximum seen
-        max_table_pairs = 0
-        for r in export_rows[1:]:
-            trows = r[8] if len(r) > 8 else []
-            if trows and isinstance(trows, list):
-                max_table_pairs = max(max_table_pairs, len(trows))
+        records = self._equipment_room_records(rc)
 
-        # If we have only the base header and no room rows, show diagnostics and stop
-        if len(export_rows) <= 1:
+        # If there are no room rows, show diagnostics and stop
+        if not records:
             try:
                 cnt = len(getattr(rc, 'generated_space_labels', []))
                 rows_diag = []
@@ -7598,26 +8774,178 @@ class ResizableRectApp:
                 messagebox.showinfo('데이터 없음', '내보낼 실별 데이터가 없습니다. 캔버스의 라벨을 확인하세요.')
             return
 
-        final_header = base_header[:]
-        for i in range(1, max_table_pairs + 1):
-            final_header.append(f"Table_{i}_Title")
-            final_header.append(f"Table_{i}_Value")
-
         # Ask user where to save .xlsx
         from tkinter import filedialog
         fp = filedialog.asksaveasfilename(parent=self.root, defaultextension='.xlsx', filetypes=[('Excel files', '*.xlsx'), ('All files', '*.*')], title='장비일람표 저장 (.xlsx)')
         if not fp:
             return
 
-        # Try to save as .xlsx; fallback to CSV if openpyxl not available
+        results = queue.Queue()
+        worker = threading.Thread(target=self._write_equipment_list,
+                                  args=(fp, self.get_equipment_catalog(), records, results), daemon=True)
+        self._equipment_export_thread = worker
+        worker.start()
+        self.root.after(100, lambda: self._poll_equipment_export(results))
+
+    EQUIPMENT_BASE_HEADER = [
+        "Room Name",
+        "HVAC Type",
+        "HVAC Detail",
+        "Area (m2)",
+        "Norm (W/m2)",
+        "Equip (W/m2)",
+        "Matched CSV Column",
+        "Matched Value",
+    ]
+
+    def _equipment_room_records(self, rc):
+        """장비일람표용 실별 값 목록 (UI 스레드에서 한 번만 캔버스를 읽어 평범한 dict로)"""
+        # 불러오기 직후 지연 생성 중인 라벨이 있으면 먼저 모두 만들어야 텍스트를 읽을 수 있다
+        rc._flush_pending_realize()
+
+        def _get_text(lab, key):
+            try:
+                return rc.canvas.itemcget(lab[key], 'text')
+            except Exception:
+                return ""
+
+        # helper to extract first numeric token
+        def _extract_num_token(s: str):
+            if not s:
+                return ""
+            for tok in s.replace(',', ' ').split():
+                try:
+                    float(tok)
+                    return tok
+                except Exception:
+                    continue
+            return ""
+
+        records = []
+        for lab in getattr(rc, 'generated_space_labels', []):
+            try:
+                stored_qty = None
+                try:
+                    if 'hvac_qty' in lab and lab.get('hvac_qty') is not None:
+                        stored_qty = int(lab.get('hvac_qty'))
+                except Exception:
+                    stored_qty = None
+                records.append({
+                    'name': _get_text(lab, 'name_id'),
+                    'area': _extract_num_token(_get_text(lab, 'area_id')),
+                    'norm': _extract_num_token(_get_text(lab, 'heat_norm_id')),
+                    'equip': _extract_num_token(_get_text(lab, 'heat_equip_id')),
+                    'hvac_type': lab.get('hvac_type', ''),
+                    'detail': lab.get('hvac_detail_text', '') or lab.get('hvac_detail', '') or '',
+                    'qty': stored_qty,
+                })
+            except Exception:
+                # skip problematic label but continue
+                continue
+        return records
+
+    @staticmethod
+    def _select_equipment_column(catalog, rec):
+        """실 하나에 대한 CSV 열 선택 (팝업 선택 로직과 동일, EquipmentCatalog 사용)
+
+        반환: None 또는 {'col': ci 또는 None, 'qty': 대수 표시값 또는 None,
+        'matched_col': 머리글, 'matched_val': 값}. col 이 None 이면 첫 열 이름만 표로 낸다.
+        """
+        hvac_type = rec.get('hvac_type', '')
+        sel_detail = rec.get('detail', '')
+        if not (catalog and len(catalog.rows) >= 2 and str(hvac_type) == '2' and sel_detail):
+            return None
+
+        if not catalog.columns_for(sel_detail):
+            # detail가 머리글에 없으면 첫 열 이름만 표로 냄
+            return {'col': None, 'qty': None, 'matched_col': '', 'matched_val': ''}
+        if not catalog.has_capacity(sel_detail):
+            return None
+
+        # compute total_kw safely (팝업과 같이 일반 + 장비 발열)
+        try:
+            norm_v = float(rec.get('norm')) if rec.get('norm') else 0.0
+            equip_v = float(rec.get('equip')) if rec.get('equip') else 0.0
+            total_kw_local = float(rec.get('area')) * (norm_v + equip_v) / 1000.0
+        except Exception:
+            total_kw_local = 0.0
+
+        # If the user previously saved a quantity for this lab, prefer it
+        stored_qty = rec.get('qty')
+        if stored_qty is not None and stored_qty <= 0:
+            stored_qty = None
+        qty, target = catalog.plan_quantity(sel_detail, total_kw_local, stored_qty)
+        ci = catalog.select(sel_detail, target)
+        return {
+            'col': ci,
+            'qty': qty,
+            'matched_col': catalog.header_of(ci),
+            'matched_val': catalog.first_value(ci),
+        }
+
+    @staticmethod
+    def _equipment_table_pairs(rows, sel):
+        """선택 결과의 (제목, 값) 표 행을 필요할 때 하나씩 생성 (메모리에 모으지 않음)"""
+        if not sel:
+            return
+        ci = sel.get('col')
+        if ci is None:
+            for r in rows:
+                yield str(r[0] if len(r) > 0 else '').strip(), ''
+            return
+        if sel.get('qty') is not None:
+            yield "대수(Q'ty)", str(sel['qty']).strip()
+        for r in rows:
+            yield str(r[0] if len(r) > 0 else '').strip(), str(r[ci] if ci < len(r) else '').strip()
+
+    @PERF.timed(cat='io')
+    def _write_equipment_list(self, fp, catalog, records, results):
+        """백그라운드 스레드: 열 선택 후 행을 스트리밍으로 기록. 결과는 results 큐로 전달"""
         try:
+            rows = catalog.rows
+            selections = []
+            max_table_pairs = 0
+            for rec in records:
+                try:
+                    sel = self._select_equipment_column(catalog, rec)
+                except Exception:
+                    sel = None
+                selections.append(sel)
+                if sel:
+                    n = len(rows) + (1 if sel.get('col') is not None and sel.get('qty') is not None else 0)
+                    max_table_pairs = max(max_table_pairs, n)
+
+            final_header = self.EQUIPMENT_BASE_HEADER[:]
+            for i in range(1, max_table_pairs + 1):
+                final_header.append(f"Table_{i}_Title")
+                final_header.append(f"Table_{i}_Value")
+
+            def _rows_out():
+                for rec, sel in zip(records, selections):
+                    row_out = [
+                        rec['name'],
+                        str(rec['hvac_type']),
+                        rec['detail'],
+                        rec['area'],
+                        rec['norm'],
+                        rec['equip'],
+                        sel['matched_col'] if sel else '',
+                        sel['matched_val'] if sel else '',
+                    ]
+                    for t0, v0 in self._equipment_table_pairs(rows, sel):
+                        row_out.append(t0)
+                        row_out.append(v0)
+                    while len(row_out) < len(final_header):
+                        row_out.append("")
+                    yield row_out
+
+            # Try to save as .xlsx; fallback to CSV if openpyxl not available
             try:
                 import openpyxl
                 from openpyxl import Workbook
                 openpyxl_path = getattr(openpyxl, '__file__', None)
             except Exception:
-                # fallback to CSV
-                import csv, sys
+                import csv
                 csv_fp = fp
                 if csv_fp.lower().endswith('.xlsx'):
                     csv_fp = csv_fp[:-5] + '.csv'
@@ -7625,42 +8953,169 @@ class ResizableRectApp:
                 with open(csv_fp, 'w', newline='', encoding='utf-8-sig') as cf:
                     writer = csv.writer(cf)
                     writer.writerow(final_header)
-                    for r in export_rows[1:]:
-                        base = r[:8]
-                        tlist = r[8] if len(r) > 8 else []
-                        row_out = list(base)
-                        for (t0, v0) in tlist:
-                            row_out.append(t0)
-                            row_out.append(v0)
-                        while len(row_out) < len(final_header):
-                            row_out.append("")
+                    for row_out in _rows_out():
                         writer.writerow(row_out)
-                messagebox.showinfo('저장 완료 (CSV)', f"openpyxl이 없어 CSV로 저장했습니다: {csv_fp}\nPython: {sys.executable}")
+                results.put(('csv', csv_fp, None))
                 return
 
-            wb = Workbook()
-            ws = wb.active
-            ws.title = '장비일람표'
+            # write-only workbook streams rows to disk instead of keeping cells in memory
+            wb = Workbook(write_only=True)
+            ws = wb.create_sheet('장비일람표')
             ws.append(final_header)
-            for r in export_rows[1:]:
-                base = r[:8]
-                tlist = r[8] if len(r) > 8 else []
-                row_out = list(base)
-                for (t0, v0) in tlist:
-                    row_out.append(t0)
-                    row_out.append(v0)
-                while len(row_out) < len(final_header):
-                    row_out.append("")
+            for row_out in _rows_out():
                 ws.append(row_out)
             wb.save(fp)
+            results.put(('xlsx', fp, openpyxl_path))
+        except Exception as e:
+            results.put(('error', fp, e))
+
+    def _poll_equipment_export(self, results):
+        try:
+            kind, fp, info = results.get_nowait()
+        except queue.Empty:
+            self.root.after(100, lambda: self._poll_equipment_export(results))
+            return
+        if kind == 'csv':
+            messagebox.showinfo('저장 완료 (CSV)', f"openpyxl이 없어 CSV로 저장했습니다: {fp}\nPython: {sys.executable}")
+        elif kind == 'xlsx':
+            messagebox.showinfo('저장 완료', f'장비일람표를 저장했습니다: {fp}\nPython: {sys.executable}\nopenpyxl: {info}')
+        else:
+            messagebox.showerror('저장 오류', f'파일 저장 중 오류가 발생했습니다:\n{info}')
+
+    # -------- 성능 진단 창 --------
+
+    DIAG_COLUMNS = (
+        ("name", "이름", 220),
+        ("cat", "분류", 80),
+        ("count", "횟수", 60),
+        ("total", "합계(ms)", 90),
+        ("mean", "평균(ms)", 80),
+        ("max", "최대(ms)", 80),
+    )
+
+    def open_diagnostics(self):
+        """계측(PERF) 통계를 보여주는 진단 창. 켜고 끄기, 초기화, JSON / Chrome trace 내보내기"""
+        win = getattr(self, '_diag_win', None)
+        try:
+            if win is not None and win.winfo_exists():
+                win.lift()
+                return
+        except Exception:
+            pass
+
+        win = tk.Toplevel(self.root)
+        win.title("성능 진단")
+        win.geometry("680x420")
+        self._diag_win = win
+
+        top = tk.Frame(win)
+        top.pack(side=tk.TOP, fill=tk.X, padx=6, pady=(6, 2))
+        enabled_var = tk.IntVar(value=1 if PERF.enabled else 0)
+        tk.Checkbutton(top, text="계측 사용", variable=enabled_var,
+                       command=lambda: (PERF.enable(bool(enabled_var.get())), refresh())).pack(side=tk.LEFT)
+        status_var = tk.StringVar()
+        tk.Label(top, textvariable=status_var, fg="gray").pack(side=tk.LEFT, padx=8)
+
+        frame = tk.Frame(win)
+        frame.pack(fill=tk.BOTH, expand=True, padx=6, pady=2)
+        tree = ttk.Treeview(frame, columns=[c[0] for c in self.DIAG_COLUMNS], show='headings')
+        for key, title, width in self.DIAG_COLUMNS:
+            tree.heading(key, text=title)
+            tree.column(key, width=width, anchor='w' if key in ('name', 'cat') else 'e')
+        vsb = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview)
+        tree.configure(yscrollcommand=vsb.set)
+        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        vsb.pack(side=tk.RIGHT, fill=tk.Y)
+
+        def refresh():
             try:
-                openpyxl_info = openpyxl_path
+                if not win.winfo_exists():
+                    return
             except Exception:
-                openpyxl_info = None
-            messagebox.showinfo('저장 완료', f'장비일람표를 저장했습니다: {fp}\nPython: {sys.executable}\nopenpyxl: {openpyxl_info}')
-        except Exception as e:
-            messagebox.showerror('저장 오류', f'파일 저장 중 오류가 발생했습니다:\n{e}')
- 
+                return
+            try:
+                tree.delete(*tree.get_children())
+                for st in PERF.stats():
+                    tree.insert('', tk.END, values=(st['name'], st['cat'], st['count'],
+                                                    f"{st['total_ms']:.2f}", f"{st['mean_ms']:.3f}",
+                                                    f"{st['max_ms']:.2f}"))
+                for name, value in sorted(PERF.counters().items()):
+                    tree.insert('', tk.END, values=(name, 'counter', value, '', '', ''))
+                state = "켜짐" if PERF.enabled else "꺼짐 (DRAWER_PERF=1 로 시작 시 켜짐)"
+                status_var.set(f"{state} · 이벤트 {PERF.event_count()}/{PERF.capacity}")
+            except Exception:
+                pass
+
+        def auto_refresh():
+            try:
+                if not win.winfo_exists():
+                    return
+            except Exception:
+                return
+            if PERF.enabled:
+                refresh()
+            win.after(1000, auto_refresh)
+
+        def export(kind):
+            from tkinter import filedialog
+            if kind == 'chrome':
+                fp = filedialog.asksaveasfilename(parent=win, defaultextension='.json',
+                                                  initialfile='drawer_trace.json',
+                                                  filetypes=[('Chrome trace (JSON)', '*.json'), ('All files', '*.*')],
+                                                  title='Chrome trace 내보내기')
+            else:
+                fp = filedialog.asksaveasfilename(parent=win, defaultextension='.json',
+                                                  initialfile='drawer_perf.json',
+                                                  filetypes=[('JSON files', '*.json'), ('All files', '*.*')],
+                                                  title='계측 결과 내보내기 (JSON)')
+            if not fp:
+                return
+            try:
+                if kind == 'chrome':
+                    PERF.export_chrome_trace(fp)
+                else:
+                    PERF.export_json(fp)
+                messagebox.showinfo('저장 완료', f'계측 결과를 저장했습니다: {fp}', parent=win)
+            except Exception as e:
+                messagebox.showerror('저장 오류', f'파일 저장 중 오류가 발생했습니다:\n{e}', parent=win)
+
+        btns = tk.Frame(win)
+        btns.pack(side=tk.BOTTOM, fill=tk.X, padx=6, pady=6)
+        tk.Button(btns, text="새로고침", command=refresh).pack(side=tk.LEFT, padx=2)
+        tk.Button(btns, text="초기화", command=lambda: (PERF.clear(), refresh())).pack(side=tk.LEFT, padx=2)
+        tk.Button(btns, text="JSON 내보내기", command=lambda: export('json')).pack(side=tk.LEFT, padx=2)
+        tk.Button(btns, text="Chrome trace 내보내기", command=lambda: export('chrome')).pack(side=tk.LEFT, padx=2)
+        tk.Button(btns, text="닫기", command=win.destroy).pack(side=tk.RIGHT, padx=2)
+
+        refresh()
+        win.after(1000, auto_refresh)
+
+    def _restore_from_journal(self, states: dict):
+        """저널에서 복구한 팔레트 상태들을 탭에 다시 불러오기"""
+        for index in sorted(states.keys()):
+            data = states.get(index) or {}
+            if not data:
+                continue
+            while len(self.palettes) <= index:
+                self.add_new_tab()
+            try:
+                self.palettes[index].load_from_dict(data)
+            except Exception:
+                continue
+        try:
+            self.notebook.select(0)
+        except Exception:
+            pass
+
+    def _on_close(self):
+        """정상 종료: 저널 스레드를 정리하고 이 실행의 자동 저장 파일만 삭제"""
+        try:
+            if self.journal is not None:
+                self.journal.close(discard=True)
+        except Exception:
+            pass
+        self.root.destroy()
+
     def get_current_palette(self) -> Palette | None:
         if not self.notebook.tabs():
             return None
@@ -7669,6 +9124,58 @@ class ResizableRectApp:
             return self.palettes[idx]
         return None
 
+    def _on_palette_tab_changed(self, event=None):
+        rc = self.get_current_palette()
+        if rc is not None:
+            rc.rehydrate()
+        self._schedule_dehydrate_hidden()
+
+    def _schedule_dehydrate_hidden(self):
+        if getattr(self, '_dehydrate_after_id', None):
+            return
+        try:
+            self._dehydrate_after_id = self.root.after_idle(self._dehydrate_hidden_palettes)
+        except Exception:
+            self._dehydrate_after_id = None
+
+    def _realize_palette(self, pal):
+        """숨겨진 탭의 아이템을 읽거나 바꾸기 전에 다시 실현 (idle 시점에 다시 해제). 성공하면 True"""
+        if pal is None:
+            return False
+        if not pal.is_dormant():
+            return True
+        if not pal.rehydrate():
+            return False
+        self._schedule_dehydrate_hidden()
+        return True
+
+    def _palette_with_item(self, iid, prefer=None):
+        """아이템 iid 가 있는 팔레트 (prefer 먼저 확인). 없으면 None
+
+        숨겨진 탭은 캔버스 아이템이 없으므로 _realize_palette 로 다시 실현한 뒤 확인한다.
+        """
+        order = [prefer] if prefer is not None else []
+        order.extend(p for p in getattr(self, 'palettes', []) if p is not prefer)
+        for p in order:
+            try:
+                if self._realize_palette(p) and p.canvas.type(iid):
+                    return p
+            except Exception:
+                continue
+        return None
+
+    def _dehydrate_hidden_palettes(self):
+        """선택되지 않은 탭의 캔버스 아이템 해제 (모델만 남김)"""
+        self._dehydrate_after_id = None
+        current = self.get_current_palette()
+        for p in self.palettes:
+            if p is current:
+                continue
+            try:
+                p.dehydrate()
+            except Exception:
+                pass
+
     def add_new_tab(self):
         tab = tk.Frame(self.notebook)
         self.notebook.add(tab, text=f"팔레트 {len(self.palettes)+1}")
@@ -7697,7 +9204,10 @@ class ResizableRectApp:
             return
 
         rc_to_delete = self.palettes[current_index]
+        rc_to_delete._cancel_pending_realize()
+        rc_to_delete._dormant = None
         rc_to_delete.shapes.clear()
+        rc_to_delete._shape_index.clear()
         rc_to_delete.generated_space_labels.clear()
         rc_to_delete.canvas.delete("all")
         rc_to_delete.highlight_line_id = None
@@ -7712,6 +9222,11 @@ class ResizableRectApp:
             self.notebook.forget(tab_id)
         if 0 <= current_index < len(self.palettes):
             del self.palettes[current_index]
+            try:
+                if self.journal is not None:
+                    self.journal.drop(current_index)
+            except Exception:
+                pass
 
     def clear_current_palette(self):
         rc = self.get_current_palette()
@@ -7722,7 +9237,10 @@ class ResizableRectApp:
         if not answer:
             return
 
+        rc._cancel_pending_realize()
         rc.shapes.clear()
+        rc._shape_index.clear()
+        rc._mark_visibility_dirty()
         # delete all items except those tagged as 'grid' so the grid remains visible
         try:
             all_items = list(rc.canvas.find_all())
@@ -7753,6 +9271,7 @@ class ResizableRectApp:
         rc.canvas.tag_bind("space_heat_equip", "<Button-1>", rc.on_space_heat_equip_click)
 
         self.update_selected_area_label(rc)
+        rc._journal_reset()
 
     def draw_square_from_area_current(self):
         rc = self.get_current_palette()
@@ -7775,6 +9294,7 @@ class ResizableRectApp:
         if rc:
             rc.auto_generate_space_labels()
 
+    @PERF.timed(cat='io')
     def save_current(self):
         rc = self.get_current_palette()
         if not rc:
@@ -7793,6 +9313,7 @@ class ResizableRectApp:
         except Exception as e:
             messagebox.showerror("저장 오류", f"파일 저장 중 오류가 발생했습니다.\n{e}")
 
+    @PERF.timed(cat='io')
     def load_current(self):
         rc = self.get_current_palette()
         if not rc:
@@ -0,0 +1,453 @@
+"""drawer.py 설계 파이프라인 일괄 실행 (명령줄)
+
+'저장하기'로 만든 팔레트 JSON을 창을 띄우지 않고 불러와
+실 인식 -> 급기 풍량 -> 디퓨저 배치 -> 덕트 경로/사이징 을 화면에서와 같은 코드로 차례로 수행하고
+프로젝트별 결과 JSON과 단계별 시간(metrics.json)을 기록한다. 여러 프로젝트는 프로세스 풀로 병렬 처리.
+
+Tk 루트는 만들지만 화면에 표시하지 않는다(withdraw). 그래도 디스플레이는 필요하므로
+디스플레이가 없는 Linux 서버에서는 xvfb-run 으로 실행한다. 메시지 상자는 띄우지 않고 결과의
+messages 항목에 기록한다. 확인 질문(ask*)은 --answer 로 답을 준 것만 그 답으로 처리하고,
+답이 없는 질문은 '아니오/취소'로 처리한 뒤 그 프로젝트를 실패로 기록한다.
+
+사용 예:
+    python drawer_batch.py plans/*.json --out results -j 4
+    python drawer_batch.py plans --norm 40 --equip 20 --inlet 0,0
+    python drawer_batch.py plans --baseline results/metrics.json --tolerance 0.25   (성능 회귀 검사)
+    python drawer_batch.py plans --answer "충돌 감지 - 재할당 확인=yes"
+    xvfb-run -a python drawer_batch.py plans                                       (디스플레이 없는 서버)
+
+종료 코드: 0 정상, 1 기준 대비 느려짐(--baseline), 2 실패한 프로젝트 있음.
+"""
+
+import argparse
+import glob
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+BATCH_HVAC_NAME = "BATCH"
+METRICS_FILE = "metrics.json"
+
+
+def _collect_inputs(paths):
+    """파일/디렉터리/글롭 패턴 -> 정렬된 .json 파일 목록 (중복 제거)"""
+    out = []
+    for p in paths:
+        if os.path.isdir(p):
+            out.extend(glob.glob(os.path.join(p, "*.json")))
+        elif any(ch in p for ch in "*?["):
+            out.extend(glob.glob(p))
+        else:
+            out.append(p)
+    seen = set()
+    files = []
+    for f in sorted(out):
+        key = os.path.abspath(f)
+        if key in seen or os.path.basename(f) == METRICS_FILE or f.endswith(".result.json") or f.endswith(".trace.json"):
+            continue
+        seen.add(key)
+        files.append(f)
+    return files
+
+
+def _input_root(files):
+    """입력 파일들의 공통 상위 디렉터리 (결과/metrics 키의 기준)"""
+    try:
+        return os.path.commonpath([os.path.dirname(os.path.abspath(f)) for f in files])
+    except ValueError:
+        # 서로 다른 드라이브(Windows)면 공통 경로가 없음: 절대 경로를 그대로 키로 씀
+        return None
+
+
+def _project_key(path, input_root):
+    """프로젝트 키: 공통 입력 디렉터리 기준 상대 경로 ('/' 구분, 다른 디렉터리의 같은 파일명 구분)"""
+    path = os.path.abspath(path)
+    if input_root:
+        path = os.path.relpath(path, input_root)
+    return path.replace(os.sep, "/")
+
+
+ANSWER_VALUES = {"yes": True, "no": False, "cancel": None}
+
+
+def _parse_answers(specs):
+    """--answer '제목=yes|no|cancel' 목록 -> {제목: 답}. 형식이 틀리면 ValueError"""
+    answers = {}
+    for spec in specs or []:
+        title, sep, value = spec.rpartition("=")
+        value = value.strip().lower()
+        if not sep or not title.strip() or value not in ANSWER_VALUES:
+            raise ValueError(spec)
+        answers[title.strip()] = value
+    return answers
+
+
+def _silence_dialogs(messagebox, simpledialog, messages, answers):
+    """작업 프로세스 안에서 대화 상자 대신 messages 에 기록
+
+    알림(show*)은 기록만 한다. 확인/입력 질문(ask*)은 answers 에 제목이 있으면 그 답을 쓰고,
+    없으면 '아니오/취소'로 답한 뒤 unanswered=True 로 기록한다 (run_project 가 실패로 처리).
+    """
+    def notify(kind):
+        def _f(title=None, message=None, **kw):
+            messages.append({"kind": kind, "title": title, "message": message})
+            return "ok"
+        return _f
+
+    def ask(kind, convert):
+        def _f(title=None, prompt=None, **kw):
+            entry = {"kind": kind, "title": title, "message": prompt}
+            messages.append(entry)
+            answer = answers.get(title)
+            if answer is None:
+                entry["unanswered"] = True
+                return None if kind == "askyesnocancel" or convert is not None else False
+            entry["answer"] = answer
+            if convert is None:
+                return ANSWER_VALUES[answer]
+            initial = kw.get("initialvalue")
+            return None if answer in ("no", "cancel") or initial is None else convert(initial)
+        return _f
+
+    for kind in ("showinfo", "showwarning", "showerror"):
+        setattr(messagebox, kind, notify(kind))
+    for kind in ("askyesno", "askokcancel", "askyesnocancel", "askretrycancel"):
+        setattr(messagebox, kind, ask(kind, None))
+    # 입력 질문은 'yes'면 초기값을 그대로 받아들인 것으로 본다
+    for kind, convert in (("askfloat", float), ("askinteger", int), ("askstring", str)):
+        setattr(simpledialog, kind, ask(kind, convert))
+
+
+def _set_entry(entry, value):
+    if value is None:
+        return
+    try:
+        entry.delete(0, "end")
+        entry.insert(0, str(value))
+    except Exception:
+        pass
+
+
+def _first_number(text):
+    for tok in str(text or "").replace(",", " ").split():
+        try:
+            return float(tok)
+        except Exception:
+            continue
+    return 0.0
+
+
+def _place_inlet(app, rc, inlet_m):
+    """급기 메인 포인트(inlet)를 격자에 맞춰 만들고 중앙공조 디퓨저 전체와 함께 hvac 매핑 등록.
+
+    화면의 메인 포인트 지정(_start_main_point_assignment)과 같은 태그/매핑 구조를 쓴다.
+    inlet_m 이 없으면 첫 도형의 왼쪽 위 꼭짓점(격자 기준점)에 둔다.
+    """
+    spacing = max(1.0, rc.meter_to_pixel(0.5))
+    anchor_x, anchor_y = (float(rc.shapes[0].coords[0]), float(rc.shapes[0].coords[1])) if rc.shapes else (0.0, 0.0)
+    if inlet_m is None:
+        wx, wy = anchor_x, anchor_y
+    else:
+        wx, wy = rc.meter_to_pixel(inlet_m[0]), rc.meter_to_pixel(inlet_m[1])
+    rem_x = anchor_x - math.floor(anchor_x / spacing) * spacing
+    rem_y = anchor_y - math.floor(anchor_y / spacing) * spacing
+    cx = round((wx - rem_x) / spacing) * spacing + rem_x
+    cy = round((wy - rem_y) / spacing) * spacing + rem_y
+    radius = 3
+    iid = rc.canvas.create_oval(cx - radius, cy - radius, cx + radius, cy + radius, fill="red", outline="",
+                                tags=("diffuser", "main_point", "diffuser_type:supply", f"hvac:{BATCH_HVAC_NAME}"))
+
+    ids = {int(iid)}
+    total = 0.0
+    for lab in rc.generated_space_labels:
+        flows = lab.get("diffuser_flows", {}) or {}
+        for did in lab.get("diffuser_ids", []) or []:
+            ids.add(int(did))
+            if "supply" in rc.canvas.gettags(did):
+                total += float(flows.get(did, 0.0) or 0.0)
+    app.hvac_map[BATCH_HVAC_NAME] = {"palette": rc, "ids": ids, "main_point_flows": {iid: round(total, 2)}}
+    return iid, (rc.pixel_to_meter(cx), rc.pixel_to_meter(cy))
+
+
+def _room_rows(rc):
+    rows = []
+    for lab in rc.generated_space_labels:
+        def text(key):
+            try:
+                return rc.canvas.itemcget(lab[key], "text")
+            except Exception:
+                return ""
+        tags = [rc.canvas.gettags(did) for did in lab.get("diffuser_ids", []) or []]
+        rows.append({
+            "name": text("name_id"),
+            "area_m2": _first_number(text("area_id")),
+            "norm_w_m2": _first_number(text("heat_norm_id")),
+            "equip_w_m2": _first_number(text("heat_equip_id")),
+            "hvac_type": lab.get("hvac_type", 1),
+            "supply_flow_m3h": float(lab.get("supply_flow_value", 0.0) or 0.0),
+            "supply_diffusers": sum(1 for t in tags if "supply" in t),
+            "return_diffusers": sum(1 for t in tags if "return" in t),
+        })
+    return rows
+
+
+def run_project(path, opts):
+    """프로젝트 하나를 처리하고 결과 dict 반환 (작업 프로세스에서 실행)"""
+    import tkinter as tk
+    from tkinter import messagebox, simpledialog
+    import drawer
+    from instrumentation import PERF
+
+    PERF.enable()
+    PERF.clear()
+    messages = []
+    _silence_dialogs(messagebox, simpledialog, messages, opts.get("answers") or {})
+    key = _project_key(path, opts.get("input_root"))
+    result = {"project": path, "key": key, "ok": False, "messages": messages}
+    t0 = time.perf_counter()
+    root = None
+    try:
+        root = tk.Tk()
+        root.withdraw()
+        app = drawer.ResizableRectApp(root, journal=False)
+        _set_entry(app.indoor_temp_entry, opts.get("indoor"))
+        _set_entry(app.supply_temp_entry, opts.get("supply"))
+        _set_entry(app.sizing_pressure_entry, opts.get("dp"))
+        if opts.get("aspect") is not None:
+            app.sizing_ratio_cb.set(str(opts["aspect"]))
+        area_per = opts.get("area_per_diffuser")
+        if area_per is None:
+            area_per = float(app.diffuser_area_entry.get())
+        rc = app.get_current_palette()
+
+        stage = PERF.stages("batch", "batch")
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        rc.load_from_dict(data)
+        rc._flush_pending_realize()
+        stage.lap("load", shapes=len(rc.shapes))
+
+        rc.auto_generate_space_labels()
+        if opts.get("norm") is not None:
+            rc.apply_norm_to_all(float(opts["norm"]))
+        if opts.get("equip") is not None:
+            rc.apply_equip_to_all(float(opts["equip"]))
+        stage.lap("rooms", rooms=len(rc.generated_space_labels))
+
+        total_flow = rc.compute_and_apply_supply_flow()
+        stage.lap("supply_flow")
+
+        app._clear_duct_state()
+        rc.auto_place_diffusers(float(area_per))
+        stage.lap("diffusers")
+
+        route = None
+        if not opts.get("no_route"):
+            _, inlet_pos = _place_inlet(app, rc, opts.get("inlet"))
+            app.last_route_result = None
+            app.auto_route_ducts(BATCH_HVAC_NAME)
+            route = dict(getattr(app, "last_route_result", None) or {})
+            route["inlet_m"] = list(inlet_pos)
+            stage.lap("route")
+
+        unanswered = [m["title"] for m in messages if m.get("unanswered")]
+        result.update({
+            "ok": not unanswered,
+            "total_supply_flow_m3h": total_flow,
+            "rooms": _room_rows(rc),
+            "route": route,
+        })
+        if unanswered:
+            result["error"] = ("답이 지정되지 않은 확인 질문: " + ", ".join(map(repr, unanswered))
+                               + " (--answer '제목=yes|no|cancel' 로 지정)")
+    except tk.TclError as e:
+        result["error"] = f"TclError: {e}"
+        if root is None:
+            result["error"] += " (Tk 디스플레이가 필요합니다: 서버에서는 xvfb-run 으로 실행)"
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        result["wall_s"] = time.perf_counter() - t0
+        result["stats"] = PERF.stats()
+        result["counters"] = PERF.counters()
+        if opts.get("trace_dir"):
+            try:
+                PERF.export_chrome_trace(_output_path(opts["trace_dir"], key, ".trace.json"))
+            except Exception:
+                pass
+        if root is not None:
+            try:
+                root.destroy()
+            except Exception:
+                pass
+    return result
+
+
+def _stage_times(result):
+    """결과의 batch.* 구간 시간(ms)"""
+    return {st["name"].split(".", 1)[1]: st["total_ms"]
+            for st in result.get("stats", []) if st.get("cat") == "batch"}
+
+
+def _output_path(out_dir, key, suffix):
+    """프로젝트 키 -> 출력 파일 경로 (입력의 하위 디렉터리 구조를 그대로 만듦)"""
+    stem = os.path.splitext(key)[0].lstrip("/").replace(":", "")
+    fp = os.path.join(out_dir, *stem.split("/")) + suffix
+    os.makedirs(os.path.dirname(fp), exist_ok=True)
+    return fp
+
+
+def _write_result(out_dir, result):
+    fp = _output_path(out_dir, result["key"], ".result.json")
+    with open(fp, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2, default=str)
+    return fp
+
+
+def compare_baseline(metrics, baseline, tolerance):
+    """기준(metrics.json) 대비 tolerance 비율 이상 느려진 (프로젝트, 항목, 기준 ms, 현재 ms) 목록"""
+    slower = []
+    base_projects = baseline.get("projects", {})
+    for name, cur in metrics.get("projects", {}).items():
+        base = base_projects.get(name)
+        if not base or not cur.get("ok") or not base.get("ok"):
+            continue
+        pairs = [("wall", base.get("wall_s", 0.0) * 1000.0, cur.get("wall_s", 0.0) * 1000.0)]
+        for stage, ms in cur.get("stages_ms", {}).items():
+            pairs.append((stage, base.get("stages_ms", {}).get(stage), ms))
+        for item, b_ms, c_ms in pairs:
+            # 아주 짧은 구간은 잡음이 커서 비교하지 않음
+            if b_ms is None or b_ms < 5.0:
+                continue
+            if c_ms > b_ms * (1.0 + tolerance):
+                slower.append((name, item, b_ms, c_ms))
+    return slower
+
+
+def build_parser():
+    ap = argparse.ArgumentParser(
+        description="저장된 팔레트 JSON에 대해 실 인식/급기 풍량/디퓨저 배치/덕트 라우팅을 일괄 실행",
+        epilog="화면의 코드를 그대로 쓰므로 숨긴 Tk 창을 만든다: 디스플레이가 필요하며, "
+               "디스플레이가 없는 서버에서는 'xvfb-run -a python drawer_batch.py ...' 로 실행한다. "
+               "확인 질문은 --answer 로 답을 준 것만 처리하고, 답이 없는 질문이 나오면 그 프로젝트는 실패로 기록된다.")
+    ap.add_argument("inputs", nargs="+", help="팔레트 JSON 파일, 디렉터리 또는 글롭 패턴")
+    ap.add_argument("--out", default="batch_results", help="결과 디렉터리 (기본: batch_results)")
+    ap.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="동시 작업 프로세스 수 (1이면 현재 프로세스에서 실행)")
+    ap.add_argument("--indoor", type=float, help="실내 온도(°C), 기본은 화면 기본값")
+    ap.add_argument("--supply", type=float, help="급기 온도(°C)")
+    ap.add_argument("--norm", type=float, help="모든 실에 적용할 일반 발열량(W/m²)")
+    ap.add_argument("--equip", type=float, help="모든 실에 적용할 장비 발열량(W/m²)")
+    ap.add_argument("--area-per-diffuser", type=float, help="디퓨저 담당면적(m²)")
+    ap.add_argument("--dp", type=float, help="사이징 정압값(mmAq/m)")
+    ap.add_argument("--aspect", help="사이징 종횡비(b/a)")
+    ap.add_argument("--inlet", help="급기 메인 포인트 위치 'x,y' (m). 기본: 첫 도형 왼쪽 위 꼭짓점")
+    ap.add_argument("--no-route", action="store_true", help="덕트 라우팅/사이징 생략")
+    ap.add_argument("--trace", action="store_true", help="프로젝트별 Chrome trace(.trace.json)도 저장")
+    ap.add_argument("--baseline", help="비교할 이전 metrics.json (느려지면 종료 코드 1)")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="허용 지연 비율 (기본 0.2 = 20%%)")
+    ap.add_argument("--answer", action="append", default=[], metavar="TITLE=yes|no|cancel",
+                    help="제목이 TITLE 인 확인 질문의 답 (여러 번 지정 가능). 입력 질문은 yes 면 초기값을 받아들임")
+    return ap
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    files = _collect_inputs(args.inputs)
+    if not files:
+        print("처리할 JSON 파일이 없습니다.", file=sys.stderr)
+        return 2
+    os.makedirs(args.out, exist_ok=True)
+
+    # 기준 metrics 는 같은 디렉터리에 새 결과를 쓰기 전에 읽어 둠
+    baseline = None
+    if args.baseline:
+        try:
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+        except Exception as e:
+            print(f"기준 metrics 를 읽을 수 없습니다: {e}", file=sys.stderr)
+            return 2
+
+    try:
+        answers = _parse_answers(args.answer)
+    except ValueError as e:
+        print(f"--answer 형식 오류: {e.args[0]!r} (예: '삭제 확인=no')", file=sys.stderr)
+        return 2
+
+    inlet = None
+    if args.inlet:
+        try:
+            x, y = (float(v) for v in args.inlet.split(","))
+            inlet = (x, y)
+        except Exception:
+            print(f"--inlet 형식 오류: {args.inlet!r} (예: 0,0)", file=sys.stderr)
+            return 2
+    opts = {
+        "indoor": args.indoor,
+        "supply": args.supply,
+        "norm": args.norm,
+        "equip": args.equip,
+        "area_per_diffuser": args.area_per_diffuser,
+        "dp": args.dp,
+        "aspect": args.aspect,
+        "inlet": inlet,
+        "no_route": args.no_route,
+        "trace_dir": args.out if args.trace else None,
+        "input_root": _input_root(files),
+        "answers": answers,
+    }
+
+    t0 = time.perf_counter()
+    results = []
+    jobs = max(1, min(args.jobs, len(files)))
+    if jobs == 1:
+        for fp in files:
+            results.append(run_project(fp, opts))
+            print(f"[{len(results)}/{len(files)}] {fp}: {'ok' if results[-1]['ok'] else results[-1].get('error')}")
+    else:
+        import multiprocessing
+        # Tk는 fork된 프로세스에서 안전하지 않으므로 spawn
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {pool.submit(run_project, fp, opts): fp for fp in files}
+            for fut in as_completed(futures):
+                fp = futures[fut]
+                try:
+                    res = fut.result()
+                except Exception as e:
+                    res = {"project": fp, "key": _project_key(fp, opts["input_root"]), "ok": False,
+                           "error": f"{type(e).__name__}: {e}", "wall_s": 0.0}
+                results.append(res)
+                print(f"[{len(results)}/{len(files)}] {fp}: {'ok' if res['ok'] else res.get('error')}")
+
+    metrics = {"jobs": jobs, "elapsed_s": time.perf_counter() - t0, "projects": {}}
+    for res in sorted(results, key=lambda r: r["key"]):
+        _write_result(args.out, res)
+        metrics["projects"][res["key"]] = {
+            "ok": res.get("ok", False),
+            "error": res.get("error"),
+            "wall_s": res.get("wall_s", 0.0),
+            "stages_ms": _stage_times(res),
+            "rooms": len(res.get("rooms", []) or []),
+            "segments": len(((res.get("route") or {}).get("supply_segments")) or []),
+        }
+    with open(os.path.join(args.out, METRICS_FILE), "w", encoding="utf-8") as f:
+        json.dump(metrics, f, ensure_ascii=False, indent=2)
+
+    failed = [r for r in results if not r.get("ok")]
+    print(f"완료: {len(results) - len(failed)}/{len(results)} 성공, {metrics['elapsed_s']:.2f}s (jobs={jobs})")
+
+    code = 2 if failed else 0
+    if baseline is not None:
+        slower = compare_baseline(metrics, baseline, args.tolerance)
+        for name, item, b_ms, c_ms in slower:
+            print(f"  느려짐: {name} {item}: {b_ms:.1f} ms -> {c_ms:.1f} ms")
+        if slower and code == 0:
+            code = 1
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,115 +1,159 @@
 import tkinter as tk
 from tkinter import messagebox, ttk, simpledialog
 import copy
-from collections import deque, defaultdict
+import bisect
+from collections import deque, defaultdict, OrderedDict
 import math
 
 # =========================
 # 1. 계산 함수들 (Engineering Logic)
 # =========================
 
-def calc_circular_diameter(q_m3h: float, dp_mmAq_per_m: float) -> float:
-    if q_m3h <= 0:
-        return 0.0
-    if dp_mmAq_per_m <= 0:
-        raise ValueError("정압값(mmAq/m)은 0보다 커야 합니다.")
-    C = 3.295e-10
-    D = ((C * q_m3h**1.9 / dp_mmAq_per_m)**0.199) * 1000
-    return round(D, 0)
-
-
-def round_step_up(x: float, step: float = 50) -> float:
-    return math.ceil(x / step) * step
-
-
-def round_step_down(x: float, step: float = 50) -> float:
-    return math.floor(x / step) * step
-
-
-def rect_equiv_diameter(a_mm: float, b_mm: float) -> float:
-    if a_mm <= 0 or b_mm <= 0:
-        return 0.0
-    a, b = float(a_mm), float(b_mm)
-    return 1.30 * (a*b)**0.625 / (a + b)**0.25
+# 원형 직경 / 50mm 각형 환산 식은 drawer.py 와 공유 (duct_sizing.py)
+from duct_sizing import (
+    calc_circular_diameter,
+    round_step_up,
+    round_step_down,
+    rect_equiv_diameter,
+    size_rect_from_D1,
+    calc_rect_other_side,
+    select_rect,
+    size_ducts_batch,
+    MIN_PERIMETER,
+)
+
+# 종횡비 콤보에서 '최소둘레' 선택 시 aspect_r 로 MIN_PERIMETER 를 넘김 (표준 치수 중 판재량 최소)
+ASPECT_MIN_PERIMETER_LABEL = "최소둘레"
+
+
+class SizingCache:
+    """perform_sizing 의 덕트 크기 (w, h) 크기 제한 LRU 캐시
+
+    키: (풍량, dp, 고정 모드, 고정값, 종횡비). 고정 모드에서는 종횡비를,
+    비고정 모드에서는 고정값을 키에서 빼서 같은 결과가 한 항목을 공유한다.
+    풍량은 그대로 키에 넣고 라벨은 캐시하지 않으므로 캐시 유무로 결과가 바뀌지 않는다.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, q: float, dp: float, use_fixed: bool, fixed_val: float, aspect_r):
+        if use_fixed:
+            return (float(q), dp, True, fixed_val, None)
+        return (float(q), dp, False, None, aspect_r)
 
+    def get(self, key):
+        value = self._data.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
 
-def size_rect_from_D1(D1: float, aspect_ratio: float, step: float = 50):
-    if D1 <= 0:
-        return 0, 0, 0.0, 0.0, 0.0
-    if aspect_ratio <= 0:
-        raise ValueError("종횡비(b/a)는 0보다 커야 합니다.")
 
-    De_target = float(D1)
-    r = float(aspect_ratio)
+SIZING_CACHE = SizingCache()
 
-    a_theo = De_target * (1 + r)**0.25 / (1.30 * r**0.625)
-    b_theo = r * a_theo
-    theo_big, theo_small = max(a_theo, b_theo), min(a_theo, b_theo)
 
-    small_up = round_step_up(theo_small, step)
-    big_down = max(round_step_down(theo_big, step), step)
-    De1 = rect_equiv_diameter(small_up, big_down)
+def sizing_cache_stats() -> dict:
+    """사이징 캐시 적중/실패 카운터"""
+    return SIZING_CACHE.stats()
 
-    a_up = round_step_up(a_theo, step)
-    b_up = round_step_up(b_theo, step)
-    De2 = rect_equiv_diameter(a_up, b_up)
 
-    if De1 >= De_target:
-        sel_big, sel_small = max(small_up, big_down), min(small_up, big_down)
-        De_sel = De1
-    else:
-        sel_big, sel_small = max(a_up, b_up), min(a_up, b_up)
-        De_sel = De2
-
-    return (
-        int(round(sel_big)),
-        int(round(sel_small)),
-        round(De_sel, 1),
-        round(theo_big, 1),
-        round(theo_small, 1),
-    )
-
-
-def calc_rect_other_side(D1: float, fixed_side_mm: float, step: float = 50):
-    if D1 <= 0:
-        return 0, 0, 0.0
-    if fixed_side_mm <= 0:
-        raise ValueError("고정 변의 길이는 0보다 커야 합니다.")
-    
-    fixed = round_step_up(fixed_side_mm, step)
-    other = 50.0
-    while True:
-        de = rect_equiv_diameter(fixed, other)
-        if de >= D1 - 0.1:
-            break
-        other += step
-        if other > 10000:
-            break
-            
-    sel_big = max(fixed, other)
-    sel_small = min(fixed, other)
-    return int(sel_big), int(sel_small), round(de, 1)
+def _sizing_label(q: float, w, h) -> str:
+    """덕트 라벨 '폭x높이\n(풍량 m³/h)' (풍량은 호출자가 넘긴 값 그대로)"""
+    if q <= 0:
+        return f"0x0\n(0 m³/h)"
+    try:
+        flow_fmt = f"({int(round(q)):,} m³/h)"
+    except Exception:
+        flow_fmt = "(0 m³/h)"
+    return f"{w}x{h}\n{flow_fmt}"
 
 
 def perform_sizing(q: float, dp: float, use_fixed: bool, fixed_val: float, aspect_r: float):
+    try:
+        key = SIZING_CACHE.key(q, dp, use_fixed, fixed_val, aspect_r)
+    except Exception:
+        w, h = _size_duct(q, dp, use_fixed, fixed_val, aspect_r)
+        return w, h, _sizing_label(q, w, h)
+    wh = SIZING_CACHE.get(key)
+    if wh is None:
+        wh = _size_duct(q, dp, use_fixed, fixed_val, aspect_r)
+        SIZING_CACHE.put(key, wh)
+    w, h = wh
+    return w, h, _sizing_label(q, w, h)
+
+
+def _size_duct(q: float, dp: float, use_fixed: bool, fixed_val: float, aspect_r: float):
+    """풍량 q 의 덕트 크기 (w, h). 계산할 수 없으면 (0, 0)"""
     if q <= 0:
-        return 0, 0, f"0x0\n(0 m³/h)"
+        return 0, 0
     try:
         D1 = calc_circular_diameter(q, dp)
         if use_fixed:
             w, h, de = calc_rect_other_side(D1, fixed_val, 50)
+        elif aspect_r == MIN_PERIMETER:
+            w, h, de = select_rect(D1, MIN_PERIMETER, 50)
         else:
             w, h, de, theo_big, theo_small = size_rect_from_D1(D1, aspect_r, 50)
-        size_line = f"{w}x{h}"
-        flow_fmt = f"({int(round(q)):,} m³/h)"
-        label = f"{size_line}\n{flow_fmt}"
-        return w, h, label
+        return w, h
     except Exception:
-        try:
-            flow_fmt = f"({int(round(q)):,} m³/h)"
-        except Exception:
-            flow_fmt = "(0 m³/h)"
-        return 0, 0, f"0x0\n{flow_fmt}"
+        return 0, 0
+
+
+def perform_sizing_batch(flows, dp: float, use_fixed: bool, fixed_val: float, aspect_r: float):
+    """perform_sizing 의 배치 버전: 캐시에 없는 풍량만 한 번에 사이징 -> [(w, h, label), ...]"""
+    flows = [float(q) for q in flows]
+    keys = [SIZING_CACHE.key(q, dp, use_fixed, fixed_val, aspect_r) for q in flows]
+    sizes = [SIZING_CACHE.get(k) for k in keys]
+    missing = list(dict.fromkeys(k for k, wh in zip(keys, sizes) if wh is None))
+    if missing:
+        sized = dict(zip(missing, _size_duct_batch(
+            [k[0] for k in missing], dp, use_fixed, fixed_val, aspect_r)))
+        for k, wh in sized.items():
+            SIZING_CACHE.put(k, wh)
+        sizes = [wh if wh is not None else sized[k] for k, wh in zip(keys, sizes)]
+    return [(w, h, _sizing_label(q, w, h)) for q, (w, h) in zip(flows, sizes)]
+
+
+def _size_duct_batch(flows, dp: float, use_fixed: bool, fixed_val: float, aspect_r: float):
+    flows = [float(q) for q in flows]
+    if not flows:
+        return []
+    try:
+        if aspect_r == MIN_PERIMETER:
+            _, ws, hs = size_ducts_batch(flows, dp, fixed_side=fixed_val if use_fixed else None,
+                                         rule=MIN_PERIMETER)
+        else:
+            _, ws, hs = size_ducts_batch(flows, dp, aspect_r, fixed_val if use_fixed else None)
+    except Exception:
+        return [_size_duct(q, dp, use_fixed, fixed_val, aspect_r) for q in flows]
+    return [(0, 0) if q <= 0 else (int(w), int(h)) for q, w, h in zip(flows, ws, hs)]
 
 
 # =========================
@@ -144,6 +188,7 @@ class DuctSegment:
         self.duct_h_mm = duct_h_mm
         self.flow = flow_m3h
         self.vertical_only = vertical_only
+        self.sizing_key = None   # 마지막 자동 사이징 조건 (풍량, 정압, 고정변 여부, 고정값, 종횡비)
         self.line_ids = []
         self.text_id = None
         self.leader_id = None
@@ -157,6 +202,496 @@ class DuctSegment:
         return math.sqrt(dx*dx + dy*dy)
 
 
+class EndpointHash:
+    """끝점 좌표 -> 객체(DuctSegment 끝점 2개 / AirPoint 1개) 해시
+
+    키는 모델 격자(GRID_STEP_MODEL)로 양자화한 칸이고, 같은 칸 안에서는 실제 좌표를 tol로 비교한다.
+    tol이 칸 경계에 걸치는 경우에만 이웃 칸까지 본다. 객체를 추가/제거/이동할 때
+    add / discard / update 로 갱신하며, 조회는 그 점에 붙은 객체 수에만 비례한다.
+    """
+
+    def __init__(self, step=GRID_STEP_MODEL, tol=1e-9):
+        self.step = step
+        self.tol = tol
+        self._cells = defaultdict(dict)  # (ix, iy) -> {id(obj): obj}
+        self._keys = {}                  # id(obj) -> 등록한 칸 키들
+
+    @staticmethod
+    def _ends(obj):
+        if hasattr(obj, 'mx1'):
+            return ((obj.mx1, obj.my1), (obj.mx2, obj.my2))
+        return ((obj.mx, obj.my),)
+
+    def _cell(self, x, y):
+        return (round(x / self.step), round(y / self.step))
+
+    def _cells_near(self, x, y, t):
+        return {self._cell(x - t, y - t), self._cell(x + t, y - t),
+                self._cell(x - t, y + t), self._cell(x + t, y + t)}
+
+    def add(self, obj):
+        keys = {self._cell(x, y) for (x, y) in self._ends(obj)}
+        for k in keys:
+            self._cells[k][id(obj)] = obj
+        self._keys[id(obj)] = keys
+
+    def discard(self, obj):
+        for k in self._keys.pop(id(obj), ()):
+            cell = self._cells.get(k)
+            if cell is not None:
+                cell.pop(id(obj), None)
+                if not cell:
+                    del self._cells[k]
+
+    def update(self, obj):
+        """좌표가 바뀐 객체를 다시 등록"""
+        self.discard(obj)
+        self.add(obj)
+
+    def rebuild(self, objs):
+        self.clear()
+        for obj in objs:
+            self.add(obj)
+
+    def clear(self):
+        self._cells.clear()
+        self._keys.clear()
+
+    def at(self, x, y, tol=None):
+        """(x, y)에서 tol(기본 self.tol) 이내에 끝점이 있는 객체 목록"""
+        t = self.tol if tol is None else tol
+        out = []
+        seen = set()
+        for k in self._cells_near(x, y, t):
+            for oid, obj in self._cells.get(k, {}).items():
+                if oid in seen:
+                    continue
+                for (ex, ey) in self._ends(obj):
+                    if abs(ex - x) < t and abs(ey - y) < t:
+                        seen.add(oid)
+                        out.append(obj)
+                        break
+        return out
+
+    def has(self, x, y, tol=None):
+        return bool(self.at(x, y, tol))
+
+    def __contains__(self, obj):
+        return id(obj) in self._keys
+
+
+class InletConnectivity:
+    """입구(inlet) 기준 연결성: 노드 그래프 + BFS 신장 트리 (최적화 1회분)
+
+    노드는 node_key로 양자화한 끝점이고 간선은 선분이다. 편집 중의 간선 추가/제거는
+    로그에 남겨 rollback 할 수 있고, commit 하면 끊어진 부분 트리만 다시 붙인다.
+    연결 검사는 바뀐 간선의 끝점에서 부모 사슬이 살아 있는지 보고, 끊긴 경우에만
+    살아 있는 노드를 만날 때까지 국소 BFS를 한다.
+    """
+
+    def __init__(self, node_key):
+        self.node_key = node_key
+        self.adj = defaultdict(dict)       # node -> {이웃 node: 간선 수}
+        self.segs_at = defaultdict(list)   # node -> [DuctSegment]
+        self.parent = {}                   # 입구에서 도달 가능한 node -> 부모 (입구는 None)
+        self.children = defaultdict(set)
+        self.root = None
+        self._log = []                     # [(op, seg, a, b)] op: 'add' | 'remove'
+
+    def _ends(self, seg):
+        return self.node_key(seg.mx1, seg.my1), self.node_key(seg.mx2, seg.my2)
+
+    def _link(self, seg, a, b, d):
+        if d > 0:
+            self.segs_at[a].append(seg)
+            if b != a:
+                self.segs_at[b].append(seg)
+        else:
+            self.segs_at[a].remove(seg)
+            if b != a:
+                self.segs_at[b].remove(seg)
+        if a == b:
+            return
+        for u, v in ((a, b), (b, a)):
+            n = self.adj[u].get(v, 0) + d
+            if n > 0:
+                self.adj[u][v] = n
+            else:
+                self.adj[u].pop(v, None)
+
+    def build(self, segments, root):
+        for seg in segments:
+            a, b = self._ends(seg)
+            self._link(seg, a, b, 1)
+        self.root = root
+        self.parent = {root: None}
+        self.children = defaultdict(set)
+        queue = deque([root])
+        while queue:
+            cur = queue.popleft()
+            for nbr in self.adj.get(cur, ()):
+                if nbr not in self.parent:
+                    self.parent[nbr] = cur
+                    self.children[cur].add(nbr)
+                    queue.append(nbr)
+
+    def segments_at(self, node):
+        return list(self.segs_at.get(node, ()))
+
+    def add_segment(self, seg):
+        a, b = self._ends(seg)
+        self._link(seg, a, b, 1)
+        self._log.append(('add', seg, a, b))
+
+    def remove_segment(self, seg):
+        a, b = self._ends(seg)
+        self._link(seg, a, b, -1)
+        self._log.append(('remove', seg, a, b))
+
+    def rollback(self):
+        for op, seg, a, b in reversed(self._log):
+            self._link(seg, a, b, -1 if op == 'add' else 1)
+        self._log = []
+
+    def _chain_ok(self, node, memo):
+        """트리 부모 사슬이 현재 그래프에서도 입구까지 이어지는지"""
+        path = []
+        cur = node
+        while True:
+            if cur in memo:
+                ok = memo[cur]
+                break
+            if cur == self.root:
+                ok = True
+                break
+            par = self.parent.get(cur)
+            if par is None or self.adj.get(cur, {}).get(par, 0) <= 0:
+                ok = False
+                break
+            path.append(cur)
+            cur = par
+        for n in path:
+            memo[n] = ok
+        memo[node] = ok
+        return ok
+
+    def _cut_component(self, node, memo):
+        """node가 입구에 닿으면 None, 아니면 node가 속한 (떨어져 나간) 조각의 노드 집합"""
+        if self._chain_ok(node, memo):
+            return None
+        seen = {node}
+        queue = deque([node])
+        while queue:
+            cur = queue.popleft()
+            for nbr in self.adj.get(cur, ()):
+                if nbr in seen:
+                    continue
+                if self._chain_ok(nbr, memo):
+                    return None
+                seen.add(nbr)
+                queue.append(nbr)
+        return seen
+
+    def all_reach(self, nodes):
+        """편집 전 트리 기준: nodes가 모두 입구와 연결되어 있는지"""
+        return all(n in self.parent for n in nodes)
+
+    def edit_keeps_connected(self, outlet_nodes):
+        """진행 중인 편집 후에도 출구 노드가 모두 입구와 연결되어 있는지 (편집 전에는 모두 연결)
+
+        제거된 간선의 끝점 중 편집 전에 연결돼 있던 것만 본다. 입구에 닿지 않는 끝점이 있으면
+        그 끝점이 속한 떨어져 나간 조각에 출구가 있는지 확인한다. 끊긴 출구는 반드시 이런
+        조각 중 하나에 들어 있으므로 전체 BFS 검사와 결과가 같다.
+        """
+        memo = {}
+        cut = set()
+        for op, seg, a, b in self._log:
+            if op != 'remove':
+                continue
+            for n in (a, b):
+                if n not in self.parent or n in cut:
+                    continue
+                comp = self._cut_component(n, memo)
+                if comp is None:
+                    continue
+                if any(m in outlet_nodes for m in comp):
+                    return False
+                cut |= comp
+        return True
+
+    def commit(self):
+        """편집 확정: 끊어진 트리 간선 아래 부분 트리를 떼어 내고 인접한 연결 노드에서 다시 붙인다"""
+        detached = set()
+        seeds = set()
+        for op, seg, a, b in self._log:
+            if op == 'add':
+                seeds.update((a, b))
+                continue
+            if self.adj.get(a, {}).get(b, 0) > 0:
+                continue
+            if self.parent.get(b) == a:
+                child = b
+            elif self.parent.get(a) == b:
+                child = a
+            else:
+                continue
+            stack = [child]
+            while stack:
+                n = stack.pop()
+                if n in detached:
+                    continue
+                detached.add(n)
+                stack.extend(self.children.get(n, ()))
+        for n in detached:
+            par = self.parent.pop(n, None)
+            if par is not None:
+                self.children[par].discard(n)
+            self.children.pop(n, None)
+        self._log = []
+
+        queue = deque()
+        for n in detached | seeds:
+            if n in self.parent:
+                continue
+            for nbr in self.adj.get(n, ()):
+                if nbr in self.parent:
+                    self.parent[n] = nbr
+                    self.children[nbr].add(n)
+                    queue.append(n)
+                    break
+        while queue:
+            cur = queue.popleft()
+            for nbr in self.adj.get(cur, ()):
+                if nbr not in self.parent:
+                    self.parent[nbr] = cur
+                    self.children[cur].add(nbr)
+                    queue.append(nbr)
+
+
+class SegmentLineIndex:
+    """선분의 축 정렬 색인: x/y 선마다 끝점과 구간을 정렬해 둔다 (자동완성/최적화/입구 연결 공용)
+
+    - 끝점: x선 -> [(y, seq, sub, seg)], y선 -> [(x, seq, sub, seg)]  (sub: 0 = 시작점, 1 = 끝점)
+    - 구간: 수직 선분은 x선 -> [(y0, y1, seq, seg)], 수평 선분은 y선 -> [(x0, x1, seq, seg)]
+    선 좌표는 정렬 리스트로 따로 두어 bisect로 가까운 선부터 바깥쪽으로 훑는다.
+    seq는 self.segments 안의 순서이고, 거리가 같으면 목록 앞쪽 선분을 골라 기존 선형 탐색과 결과가 같다.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._ep_x, self._ep_xs = {}, []
+        self._ep_y, self._ep_ys = {}, []
+        self._vert, self._vert_xs = {}, []
+        self._horz, self._horz_ys = {}, []
+        self._entries = {}   # id(seg) -> (seq, 등록 항목들)
+        self._next_seq = 0
+
+    @staticmethod
+    def _put(lines, keys, key, item):
+        lst = lines.get(key)
+        if lst is None:
+            lines[key] = [item]
+            bisect.insort(keys, key)
+        else:
+            bisect.insort(lst, item)
+
+    @staticmethod
+    def _drop(lines, keys, key, item):
+        lst = lines.get(key)
+        if not lst:
+            return
+        i = bisect.bisect_left(lst, item)
+        if i < len(lst) and lst[i] == item:
+            del lst[i]
+        if not lst:
+            del lines[key]
+            k = bisect.bisect_left(keys, key)
+            if k < len(keys) and keys[k] == key:
+                del keys[k]
+
+    def add(self, seg, seq=None):
+        if seq is None:
+            seq = self._next_seq
+        self._next_seq = max(self._next_seq, seq + 1)
+        items = []
+        for sub, (x, y) in enumerate(((seg.mx1, seg.my1), (seg.mx2, seg.my2))):
+            items.append((self._ep_x, self._ep_xs, x, (y, seq, sub, seg)))
+            items.append((self._ep_y, self._ep_ys, y, (x, seq, sub, seg)))
+        if seg.vertical_only:
+            items.append((self._vert, self._vert_xs, seg.mx1,
+                          (min(seg.my1, seg.my2), max(seg.my1, seg.my2), seq, seg)))
+        else:
+            items.append((self._horz, self._horz_ys, seg.my1,
+                          (min(seg.mx1, seg.mx2), max(seg.mx1, seg.mx2), seq, seg)))
+        for it in items:
+            self._put(*it)
+        self._entries[id(seg)] = (seq, items)
+        return seq
+
+    def discard(self, seg):
+        """색인에서 제거하고 seq 반환 (되돌릴 때 같은 순서로 다시 넣기 위해)"""
+        entry = self._entries.pop(id(seg), None)
+        if entry is None:
+            return None
+        seq, items = entry
+        for it in items:
+            self._drop(*it)
+        return seq
+
+    def update(self, seg):
+        seq = self.discard(seg)
+        self.add(seg, seq)
+
+    def rebuild(self, segments):
+        self.clear()
+        for seg in segments:
+            self.add(seg)
+
+    @staticmethod
+    def _outward(keys, c):
+        """정렬된 keys를 c에서 가까운 쪽부터: (왼쪽 index 감소 순, 오른쪽 index 증가 순)"""
+        i = bisect.bisect_left(keys, c)
+        return range(i - 1, -1, -1), range(i, len(keys))
+
+    def best_axis_connection(self, ox, oy, exclude=(), eps=1e-6):
+        """(ox, oy)에서 축 방향으로 가장 가까운 연결점: (거리, 점, 분할할 선분 또는 None) / 없으면 None
+
+        후보는 같은 x선·y선 위의 끝점과, (ox, oy)를 지나는 수평/수직선이 가로지르는 선분 위의 투영점이며
+        거리는 eps보다 커야 한다. exclude는 제외할 선분의 id 집합.
+        """
+        best = [math.inf, 0, 0, None, None]   # d, seq, sub, point, split
+
+        def offer(d, seq, sub, point, split):
+            if (d, seq, sub) < (best[0], best[1], best[2]):
+                best[:] = [d, seq, sub, point, split]
+
+        def walk_points(lst, c, to_point):
+            # lst: 한 선 위 끝점 [(좌표, seq, sub, seg)] 정렬; c에서 바깥쪽으로, 거리가 best를 넘으면 중단
+            i = bisect.bisect_left(lst, (c,))
+            for rng in (range(i - 1, -1, -1), range(i, len(lst))):
+                for k in rng:
+                    v, seq, sub, seg = lst[k]
+                    d = abs(v - c)
+                    if d > best[0]:
+                        break
+                    if d <= eps or id(seg) in exclude:
+                        continue
+                    offer(d, seq, sub, to_point(v), None)
+
+        # 1) 같은 x선(|px - ox| < eps) 위의 끝점: 거리 |py - oy|
+        lo = bisect.bisect_left(self._ep_xs, ox - 2 * eps)
+        hi = bisect.bisect_right(self._ep_xs, ox + 2 * eps)
+        for px in self._ep_xs[lo:hi]:
+            if abs(px - ox) < eps:
+                walk_points(self._ep_x[px], oy, lambda v, px=px: (px, v))
+        # 2) 같은 y선(|py - oy| < eps) 위의 끝점: 거리 |px - ox| (x선 쪽 끝점은 거리 <= eps라 제외됨)
+        lo = bisect.bisect_left(self._ep_ys, oy - 2 * eps)
+        hi = bisect.bisect_right(self._ep_ys, oy + 2 * eps)
+        for py in self._ep_ys[lo:hi]:
+            if abs(py - oy) < eps:
+                walk_points(self._ep_y[py], ox, lambda v, py=py: (v, py))
+
+        # 3) 수직 선분 중 oy 높이를 지나는 것: 가까운 x선부터
+        for rng in self._outward(self._vert_xs, ox):
+            for k in rng:
+                x = self._vert_xs[k]
+                d = abs(ox - x)
+                if d > best[0]:
+                    break
+                if d <= eps:
+                    continue
+                for y0, y1, seq, seg in self._vert[x]:
+                    if y0 - eps > oy:
+                        break
+                    if oy <= y1 + eps and id(seg) not in exclude:
+                        is_mid = abs(oy - seg.my1) > eps and abs(oy - seg.my2) > eps
+                        offer(d, seq, 2, (x, oy), seg if is_mid else None)
+        # 4) 수평 선분 중 ox 위치를 지나는 것: 가까운 y선부터
+        for rng in self._outward(self._horz_ys, oy):
+            for k in rng:
+                y = self._horz_ys[k]
+                d = abs(oy - y)
+                if d > best[0]:
+                    break
+                if d <= eps:
+                    continue
+                for x0, x1, seq, seg in self._horz[y]:
+                    if x0 - eps > ox:
+                        break
+                    if ox <= x1 + eps and id(seg) not in exclude:
+                        is_mid = abs(ox - seg.mx1) > eps and abs(ox - seg.mx2) > eps
+                        offer(d, seq, 2, (ox, y), seg if is_mid else None)
+
+        if best[3] is None:
+            return None
+        return best[0], best[3], best[4]
+
+    def nearest_projection(self, ix, iy):
+        """(ix, iy)에서 가장 가까운 선분 위의 점: (거리, 점) / 선분이 없으면 None"""
+        best = [math.inf, 0, None]   # dist, seq, point
+        for lines, keys, c, vertical in ((self._vert, self._vert_xs, ix, True),
+                                         (self._horz, self._horz_ys, iy, False)):
+            for rng in self._outward(keys, c):
+                for k in rng:
+                    line = keys[k]
+                    if abs(line - c) > best[0]:
+                        break
+                    for a0, a1, seq, seg in lines[line]:
+                        if vertical:
+                            px, py = line, min(max(iy, a0), a1)
+                        else:
+                            px, py = min(max(ix, a0), a1), line
+                        dist = math.hypot(px - ix, py - iy)
+                        if (dist, seq) < (best[0], best[1]):
+                            best[:] = [dist, seq, (px, py)]
+        if best[2] is None:
+            return None
+        return best[0], best[2]
+
+
+class EndpointKDTree:
+    """끝점 2차원 KD-tree (정적). nearest()는 선형 탐색과 같이 거리가 같으면 앞선 index를 고른다."""
+
+    def __init__(self, points):
+        self.points = list(points)
+        self._nodes = []   # (point index, axis, left, right)
+        self.root = self._build(list(range(len(self.points))), 0)
+
+    def _build(self, idx, depth):
+        if not idx:
+            return -1
+        axis = depth % 2
+        idx.sort(key=lambda i: self.points[i][axis])
+        m = len(idx) // 2
+        node = len(self._nodes)
+        self._nodes.append(None)
+        left = self._build(idx[:m], depth + 1)
+        right = self._build(idx[m + 1:], depth + 1)
+        self._nodes[node] = (idx[m], axis, left, right)
+        return node
+
+    def nearest(self, x, y):
+        """가장 가까운 점의 index (점이 없으면 None)"""
+        best_d, best_i = math.inf, None
+        stack = [(self.root, 0.0)]
+        while stack:
+            node, bound = stack.pop()
+            if node < 0 or bound > best_d:
+                continue
+            i, axis, left, right = self._nodes[node]
+            px, py = self.points[i]
+            d = (px - x)**2 + (py - y)**2
+            if d < best_d or (d == best_d and i < best_i):
+                best_d, best_i = d, i
+            diff = (x - px) if axis == 0 else (y - py)
+            near, far = (left, right) if diff < 0 else (right, left)
+            stack.append((far, diff * diff))
+            stack.append((near, 0.0))
+        return best_i
+
+
 class Palette:
     def __init__(self, parent):
         self.container = tk.Frame(parent)
@@ -183,6 +718,13 @@ class Palette:
         self.grid_tag = "grid"
         self.pan_start_screen = None
         self.segments = []
+        # 끝점 해시: 선분/점을 추가·제거·분할·이동할 때 함께 갱신 (_add_segment, _set_segments 등)
+        self._seg_ends = EndpointHash()
+        self._point_ends = EndpointHash()
+        self._seg_lines = SegmentLineIndex()
+        # 되돌릴 수 있는 편집 묶음 (_begin_edit ~ _commit_edit / _rollback_edit)
+        self._edit_log = None
+        self._edit_conn = None
 
         self.mode = "pan"
         self._drawing = False
@@ -289,7 +831,8 @@ class Palette:
     def _restore_snapshot(self, snap):
         if not snap: return
         self.points = copy.deepcopy(snap.get('points', []))
-        self.segments = copy.deepcopy(snap.get('segments', []))
+        self._set_segments(copy.deepcopy(snap.get('segments', [])))
+        self._point_ends.rebuild(self.points)
         self.inlet_flow = snap.get('inlet_flow', 0.0)
         for p in self.points:
             try:
@@ -314,6 +857,75 @@ class Palette:
         snap = self._undo_stack.pop()
         self._restore_snapshot(snap)
 
+    # ---- 선분/점 목록 변경 (끝점 해시 동기화) ----
+    def _add_segment(self, seg):
+        self.segments.append(seg)
+        self._seg_ends.add(seg)
+        self._seg_lines.add(seg)
+        if self._edit_log is not None:
+            self._edit_log.append(('add', -1, seg, None))
+            if self._edit_conn is not None:
+                self._edit_conn.add_segment(seg)
+
+    def _remove_segment(self, seg):
+        i = self.segments.index(seg)
+        del self.segments[i]
+        self._seg_ends.discard(seg)
+        seq = self._seg_lines.discard(seg)
+        if self._edit_log is not None:
+            self._edit_log.append(('remove', i, seg, seq))
+            if self._edit_conn is not None:
+                self._edit_conn.remove_segment(seg)
+
+    def _begin_edit(self, conn=None):
+        """선분 추가/제거를 기록해 통째로 되돌릴 수 있는 편집 묶음 시작 (deepcopy 대신)"""
+        self._edit_log = []
+        self._edit_conn = conn
+
+    def _commit_edit(self):
+        if self._edit_conn is not None:
+            self._edit_conn.commit()
+        self._edit_log = None
+        self._edit_conn = None
+
+    def _rollback_edit(self):
+        log = self._edit_log or []
+        self._edit_log = None
+        for op, i, seg, seq in reversed(log):
+            if op == 'add':
+                self.segments.pop()
+                self._seg_ends.discard(seg)
+                self._seg_lines.discard(seg)
+            else:
+                self.segments.insert(i, seg)
+                self._seg_ends.add(seg)
+                self._seg_lines.add(seg, seq)
+        if self._edit_conn is not None:
+            self._edit_conn.rollback()
+        self._edit_conn = None
+
+    def _set_segments(self, segments):
+        self.segments = segments
+        self._reindex_segments()
+
+    def _reindex_segments(self):
+        """선분 좌표를 일괄 수정한 뒤 색인 전체 재구성"""
+        self._seg_ends.rebuild(self.segments)
+        self._seg_lines.rebuild(self.segments)
+
+    def _reindex_segment(self, seg):
+        """좌표가 바뀐 선분 하나만 색인 갱신"""
+        self._seg_ends.update(seg)
+        self._seg_lines.update(seg)
+
+    def _add_point(self, p):
+        self.points.append(p)
+        self._point_ends.add(p)
+
+    def _remove_point(self, p):
+        self.points.remove(p)
+        self._point_ends.discard(p)
+
     def set_mode_pencil(self):
         if self.mode == "pencil":
             self.set_mode_pan()
@@ -617,12 +1229,12 @@ class Palette:
         if not self.points:
             flow = self.inlet_flow if self.inlet_flow > 0 else 0.0
             p = AirPoint(mx, my, "inlet", flow)
-            self.points.append(p)
+            self._add_point(p)
         else:
             p = AirPoint(mx, my, "outlet", 0.0)
-            self.points.append(p)
+            self._add_point(p)
 
-        self.segments.clear()
+        self._set_segments([])
         self.redraw_all()
         self._notify_points_changed()
 
@@ -647,6 +1259,7 @@ class Palette:
             seg.duct_w_mm = w
             seg.duct_h_mm = h
             seg.label_text = label
+            seg.sizing_key = None
             self.redraw_all()
             try:
                 compute_and_display_thickness_breakdown()
@@ -662,7 +1275,7 @@ class Palette:
             if seg_hit is not None:
                 self.push_undo()
                 try:
-                    self.segments.remove(seg_hit)
+                    self._remove_segment(seg_hit)
                 except ValueError:
                     pass
                 self.redraw_all()
@@ -730,12 +1343,12 @@ class Palette:
             try:
                 # remove the target point
                 if target in self.points:
-                    self.points.remove(target)
+                    self._remove_point(target)
             except Exception:
                 pass
             # clear segments and refresh
             try:
-                self.segments.clear()
+                self._set_segments([])
             except Exception:
                 pass
             try: self.redraw_all()
@@ -864,7 +1477,7 @@ class Palette:
                 vertical = True
             seg = DuctSegment(x1, y1, x2, y2, "", 0, 0, 0.0, vertical)
             self.push_undo()
-            self.segments.append(seg)
+            self._add_segment(seg)
             if self._preview_line_id is not None:
                 self.canvas.delete(self._preview_line_id)
                 self._preview_line_id = None
@@ -901,6 +1514,7 @@ class Palette:
             k2 = key_of(seg.mx2, seg.my2)
             seg.mx1, seg.my1 = reps.get(k1, (seg.mx1, seg.my1))
             seg.mx2, seg.my2 = reps.get(k2, (seg.mx2, seg.my2))
+        self._reindex_segments()
 
         self._orthogonalize_segments()
         self._split_intersections()
@@ -910,25 +1524,16 @@ class Palette:
         for seg in self.segments:
             duct_endpoints.append((seg.mx1, seg.my1))
             duct_endpoints.append((seg.mx2, seg.my2))
+        # 연결 후보는 루프 시작 시점의 끝점들 (KD-tree), 연결 여부는 끝점 해시로 확인
+        endpoint_tree = EndpointKDTree(duct_endpoints)
 
         for outlet in outlet_points:
             ox, oy = outlet.mx, outlet.my
-            already_connected = False
-            for seg in self.segments:
-                if (abs(seg.mx1 - ox) < eps and abs(seg.my1 - oy) < eps) or \
-                   (abs(seg.mx2 - ox) < eps and abs(seg.my2 - oy) < eps):
-                    already_connected = True
-                    break
-            if already_connected: continue
+            if self._seg_ends.has(ox, oy, tol=eps): continue
             
-            min_dist = float('inf')
-            nearest = None
-            for dx, dy in duct_endpoints:
-                dist = (dx - ox)**2 + (dy - oy)**2
-                if dist < min_dist:
-                    min_dist = dist
-                    nearest = (dx, dy)
-            if nearest is None: continue
+            k = endpoint_tree.nearest(ox, oy)
+            if k is None: continue
+            nearest = duct_endpoints[k]
             
             if abs(nearest[0] - ox) >= abs(nearest[1] - oy):
                 mid_x, mid_y = ox, nearest[1]
@@ -937,8 +1542,8 @@ class Palette:
             
             q = getattr(outlet, 'flow', 0.0)
             w, h, label = perform_sizing(q, dp, use_fixed, fixed_val, aspect_r)
-            self.segments.append(DuctSegment(nearest[0], nearest[1], mid_x, mid_y, label, w, h, q, vertical_only=(nearest[0]==mid_x)))
-            self.segments.append(DuctSegment(mid_x, mid_y, ox, oy, label, w, h, q, vertical_only=(mid_x==ox)))
+            self._add_segment(DuctSegment(nearest[0], nearest[1], mid_x, mid_y, label, w, h, q, vertical_only=(nearest[0]==mid_x)))
+            self._add_segment(DuctSegment(mid_x, mid_y, ox, oy, label, w, h, q, vertical_only=(mid_x==ox)))
 
         self._ensure_inlet_connected()
         self._recalculate_segment_flows(dp, use_fixed, fixed_val, aspect_r)
@@ -957,33 +1562,51 @@ class Palette:
         self._notify_points_changed()
 
     def _split_intersections(self):
+        """수평/수직 선분의 교차점에서 선분을 분할 (x 방향 스윕라인, O((n + k) log n))
+
+        수평 선분은 [x0 - eps, x1 + eps] 구간 동안 y 기준 정렬 목록(active)에 머물고,
+        수직 선분은 자기 x에서 active 중 y가 [y0 - eps, y1 + eps] 인 것만 bisect로 찾는다.
+        교차점은 양쪽 선분 모두의 분할점이 된다 (T자 접합 포함).
+        """
         if not self.segments: return
         eps = 1e-9
         segs = list(self.segments)
+        split_points = [[(a.mx1, a.my1), (a.mx2, a.my2)] for a in segs]
+
+        # 이벤트: (x, 순서, 선분 index) - 같은 x에서는 삽입 -> 질의 -> 제거 순 (경계 포함)
+        events = []
+        for i, a in enumerate(segs):
+            if a.vertical_only:
+                events.append((a.mx1, 1, i))
+            else:
+                events.append((min(a.mx1, a.mx2) - eps, 0, i))
+                events.append((max(a.mx1, a.mx2) + eps, 2, i))
+        events.sort()
+
+        n = len(segs)
+        active = []  # [(y, 수평 선분 index)] 정렬 유지
+        for x, kind, i in events:
+            a = segs[i]
+            if kind == 0:
+                bisect.insort(active, (a.my1, i))
+            elif kind == 2:
+                k = bisect.bisect_left(active, (a.my1, i))
+                if k < len(active) and active[k][1] == i:
+                    del active[k]
+            else:
+                vx = a.mx1
+                lo = bisect.bisect_left(active, (min(a.my1, a.my2) - eps, -1))
+                hi = bisect.bisect_right(active, (max(a.my1, a.my2) + eps, n))
+                for hy, j in active[lo:hi]:
+                    split_points[i].append((vx, hy))
+                    split_points[j].append((vx, hy))
+
         result = []
-        for a in segs:
-            split_points = [(a.mx1, a.my1), (a.mx2, a.my2)]
-            for b in segs:
-                if a is b: continue
-                if a.vertical_only == b.vertical_only: continue
-                if a.vertical_only:
-                    vx = a.mx1
-                    vy0, vy1 = min(a.my1, a.my2), max(a.my1, a.my2)
-                    hy = b.my1
-                    hx0, hx1 = min(b.mx1, b.mx2), max(b.mx1, b.mx2)
-                    if (hx0 - eps) <= vx <= (hx1 + eps) and (vy0 - eps) <= hy <= (vy1 + eps):
-                        split_points.append((vx, hy))
-                else:
-                    vx = b.mx1
-                    vy0, vy1 = min(b.my1, b.my2), max(b.my1, b.my2)
-                    hy = a.my1
-                    hx0, hx1 = min(a.mx1, a.mx2), max(a.mx1, a.mx2)
-                    if (hx0 - eps) <= vx <= (hx1 + eps) and (vy0 - eps) <= hy <= (vy1 + eps):
-                        split_points.append((vx, hy))
+        for a, pts in zip(segs, split_points):
             if a.vertical_only:
-                pts = sorted(set(split_points), key=lambda p: p[1])
+                pts = sorted(set(pts), key=lambda p: p[1])
             else:
-                pts = sorted(set(split_points), key=lambda p: p[0])
+                pts = sorted(set(pts), key=lambda p: p[0])
             if len(pts) <= 1:
                 continue
             x1, y1 = pts[0]
@@ -997,28 +1620,23 @@ class Palette:
                 new_seg = DuctSegment(xx1, yy1, xx2, yy2, a.label_text, a.duct_w_mm, a.duct_h_mm, a.flow, a.vertical_only)
                 result.append(new_seg)
         if result:
-            self.segments = result
+            self._set_segments(result)
 
     def _move_connected_segments(self, base_seg, dx, dy):
-        def seg_endpoints(seg):
-            return [(seg.mx1, seg.my1), (seg.mx2, seg.my2)]
-        connected = set([base_seg])
-        queue = [base_seg]
+        """base_seg와 끝점으로 이어진 선분 전체(가지)를 이동. 입출구 점에 붙은 끝점은 고정
+
+        이웃 선분은 끝점 해시로 찾으므로 비용은 가지 크기에 비례한다.
+        """
+        connected = {base_seg}
+        queue = deque([base_seg])
         while queue:
-            cur = queue.pop(0)
-            cur_ends = seg_endpoints(cur)
-            for other in self.segments:
-                if other in connected: continue
-                other_ends = seg_endpoints(other)
-                if any((abs(ex1 - ex2) < 1e-9 and abs(ey1 - ey2) < 1e-9) for (ex1, ey1) in cur_ends for (ex2, ey2) in other_ends):
+            cur = queue.popleft()
+            for (ex, ey) in ((cur.mx1, cur.my1), (cur.mx2, cur.my2)):
+                for other in self._seg_ends.at(ex, ey):
+                    if other in connected: continue
                     connected.add(other)
                     queue.append(other)
-        point_positions = [(p.mx, p.my) for p in self.points]
-        def is_attached_to_point(x, y):
-            for px, py in point_positions:
-                if abs(px - x) < 1e-9 and abs(py - y) < 1e-9:
-                    return True
-            return False
+        is_attached_to_point = self._point_ends.has
         for seg in connected:
             if not is_attached_to_point(seg.mx1, seg.my1):
                 seg.mx1 += dx
@@ -1026,9 +1644,11 @@ class Palette:
             if not is_attached_to_point(seg.mx2, seg.my2):
                 seg.mx2 += dx
                 seg.my2 += dy
+            self._reindex_segment(seg)
 
     def _orthogonalize_segments(self):
         if not self.segments: return
+        before = [(seg.mx1, seg.my1, seg.mx2, seg.my2) for seg in self.segments]
         for seg in self.segments:
             if seg.vertical_only:
                 x_avg = (seg.mx1 + seg.mx2) / 2.0
@@ -1053,46 +1673,26 @@ class Palette:
                 seg.mx1, seg.my1 = rep[k1]
             if k2 in rep:
                 seg.mx2, seg.my2 = rep[k2]
+        for seg, old in zip(self.segments, before):
+            if (seg.mx1, seg.my1, seg.mx2, seg.my2) != old:
+                self._reindex_segment(seg)
 
     def _ensure_inlet_connected(self):
         if not self.points: return
         inlet = self.points[0]
         if inlet.kind != "inlet": return
         ix, iy = inlet.mx, inlet.my
-        for seg in self.segments:
-            if (abs(seg.mx1 - ix) < 1e-9 and abs(seg.my1 - iy) < 1e-9) or \
-               (abs(seg.mx2 - ix) < 1e-9 and abs(seg.my2 - iy) < 1e-9):
-                return
-        nearest_seg = None
-        nearest_dist = float("inf")
-        proj_point = None
-        for seg in self.segments:
-            if seg.vertical_only:
-                x0 = seg.mx1
-                y0 = min(seg.my1, seg.my2)
-                y1 = max(seg.my1, seg.my2)
-                py = min(max(iy, y0), y1)
-                px = x0
-            else:
-                y0 = seg.my1
-                x0 = min(seg.mx1, seg.mx2)
-                x1 = max(seg.mx1, seg.mx2)
-                px = min(max(ix, x0), x1)
-                py = y0
-            dist = math.hypot(px - ix, py - iy)
-            if dist < nearest_dist:
-                nearest_dist = dist
-                nearest_seg = seg
-                proj_point = (px, py)
-        if nearest_seg is None or proj_point is None: return
-        px, py = proj_point
+        if self._seg_ends.has(ix, iy): return
+        found = self._seg_lines.nearest_projection(ix, iy)
+        if found is None: return
+        nearest_dist, (px, py) = found
         if nearest_dist < 1e-9: return
         cur_x, cur_y = ix, iy
         if abs(px - cur_x) > 1e-9:
-            self.segments.append(DuctSegment(cur_x, cur_y, px, cur_y, "", 0, 0, 0.0, False))
+            self._add_segment(DuctSegment(cur_x, cur_y, px, cur_y, "", 0, 0, 0.0, False))
             cur_x = px
         if abs(py - cur_y) > 1e-9:
-            self.segments.append(DuctSegment(cur_x, cur_y, cur_x, py, "", 0, 0, 0.0, True))
+            self._add_segment(DuctSegment(cur_x, cur_y, cur_x, py, "", 0, 0, 0.0, True))
 
     def _verify_all_outlets_connected(self):
         if not self.segments or not self.points:
@@ -1134,9 +1734,16 @@ class Palette:
         return True
 
     def _optimize_outlet_connections_safe(self, dp: float, use_fixed: bool, fixed_val: float, aspect_r: float):
-        """안전한 최적화: 조건 완화 (0.1m 이상 단축 시 적용) 및 좌표 스냅 강화"""
+        """안전한 최적화: 조건 완화 (0.1m 이상 단축 시 적용) 및 좌표 스냅 강화
+
+        출구마다의 시도는 되돌릴 수 있는 편집 묶음으로 적용하고(목록 deepcopy 없음),
+        연결 검사는 InletConnectivity로 바뀐 간선 주변만 확인한다.
+        """
         if not self.segments or not self.points:
             return 0
+        inlet = self.points[0]
+        if inlet.kind != "inlet":
+            return 0
         
         eps = 1e-6
         
@@ -1147,8 +1754,12 @@ class Palette:
         def node_key(x, y):
             return (round(x / eps) * eps, round(y / eps) * eps)
         
-        backup_segments = copy.deepcopy(self.segments)
+        conn = InletConnectivity(node_key)
+        conn.build(self.segments, node_key(inlet.mx, inlet.my))
         outlets = [p for p in self.points if getattr(p, 'kind', None) == 'outlet' and p.flow > 0]
+        # 처음부터 끊긴 출구가 있으면 국소 검사로는 판단할 수 없으므로 전체 검사를 쓴다
+        outlet_nodes = {node_key(p.mx, p.my) for p in outlets}
+        all_connected = conn.all_reach(outlet_nodes)
         optimization_count = 0
         
         for outlet in outlets:
@@ -1156,12 +1767,7 @@ class Palette:
             outlet_node = node_key(ox, oy)
             outlet_flow = outlet.flow
             
-            connected_segs = []
-            for seg in self.segments:
-                seg_n1 = node_key(seg.mx1, seg.my1)
-                seg_n2 = node_key(seg.mx2, seg.my2)
-                if seg_n1 == outlet_node or seg_n2 == outlet_node:
-                    connected_segs.append(seg)
+            connected_segs = conn.segments_at(outlet_node)
             
             if not connected_segs:
                 continue
@@ -1172,80 +1778,37 @@ class Palette:
             if current_length < 1.5:
                 continue
             
-            best_point = None
-            best_distance = float('inf')
-            best_seg_to_split = None
-            
-            for seg in self.segments:
-                if seg in connected_segs:
-                    continue
-                
-                # 끝점 확인
-                for px, py in [(seg.mx1, seg.my1), (seg.mx2, seg.my2)]:
-                    if abs(px - ox) < eps:
-                        d = abs(py - oy)
-                        if d < best_distance and d > eps:
-                            best_distance = d
-                            best_point = (px, py)
-                            best_seg_to_split = None
-                    elif abs(py - oy) < eps:
-                        d = abs(px - ox)
-                        if d < best_distance and d > eps:
-                            best_distance = d
-                            best_point = (px, py)
-                            best_seg_to_split = None
-                
-                # 세그먼트 중간 확인
-                if seg.vertical_only:
-                    seg_x = seg.mx1
-                    seg_y_min = min(seg.my1, seg.my2)
-                    seg_y_max = max(seg.my1, seg.my2)
-                    if seg_y_min - eps <= oy <= seg_y_max + eps:
-                        proj_x, proj_y = seg_x, oy
-                        d = abs(ox - proj_x)
-                        is_mid = abs(proj_y - seg.my1) > eps and abs(proj_y - seg.my2) > eps
-                        if d < best_distance and d > eps:
-                            best_distance = d
-                            best_point = (proj_x, proj_y)
-                            best_seg_to_split = seg if is_mid else None
-                else:
-                    seg_y = seg.my1
-                    seg_x_min = min(seg.mx1, seg.mx2)
-                    seg_x_max = max(seg.mx1, seg.mx2)
-                    if seg_x_min - eps <= ox <= seg_x_max + eps:
-                        proj_x, proj_y = ox, seg_y
-                        d = abs(oy - proj_y)
-                        is_mid = abs(proj_x - seg.mx1) > eps and abs(proj_x - seg.mx2) > eps
-                        if d < best_distance and d > eps:
-                            best_distance = d
-                            best_point = (proj_x, proj_y)
-                            best_seg_to_split = seg if is_mid else None
+            # 축 방향 최단 연결점 (끝점 / 선분 위 투영점): x/y 선 색인으로 가까운 선부터 탐색
+            found = self._seg_lines.best_axis_connection(
+                ox, oy, exclude={id(seg) for seg in connected_segs}, eps=eps)
+            if found is None:
+                continue
+            best_distance, best_point, best_seg_to_split = found
             
             # ★★★ 조건 완화: 1.0m만 절약되어도 적용 ★★★
             savings = current_length - best_distance
             if best_point is None or savings < 1.0:
                 continue
             
-            pre_opt_segments = copy.deepcopy(self.segments)
-            
+            self._begin_edit(conn)
             try:
                 # 좌표 스냅 적용 (중요: 부동소수점 오차 방지)
                 bx = snap(best_point[0])
                 by = snap(best_point[1])
                 
                 # 분할
-                if best_seg_to_split is not None and best_seg_to_split in self.segments:
-                    self.segments.remove(best_seg_to_split)
+                if best_seg_to_split is not None and best_seg_to_split in self._seg_ends:
+                    self._remove_segment(best_seg_to_split)
                     if best_seg_to_split.vertical_only:
                         y_min = min(best_seg_to_split.my1, best_seg_to_split.my2)
                         y_max = max(best_seg_to_split.my1, best_seg_to_split.my2)
                         # 스냅된 좌표 사용
-                        self.segments.append(DuctSegment(
+                        self._add_segment(DuctSegment(
                             bx, y_min, bx, by,
                             best_seg_to_split.label_text, best_seg_to_split.duct_w_mm,
                             best_seg_to_split.duct_h_mm, best_seg_to_split.flow, True
                         ))
-                        self.segments.append(DuctSegment(
+                        self._add_segment(DuctSegment(
                             bx, by, bx, y_max,
                             best_seg_to_split.label_text, best_seg_to_split.duct_w_mm,
                             best_seg_to_split.duct_h_mm, best_seg_to_split.flow, True
@@ -1253,12 +1816,12 @@ class Palette:
                     else:
                         x_min = min(best_seg_to_split.mx1, best_seg_to_split.mx2)
                         x_max = max(best_seg_to_split.mx1, best_seg_to_split.mx2)
-                        self.segments.append(DuctSegment(
+                        self._add_segment(DuctSegment(
                             x_min, by, bx, by,
                             best_seg_to_split.label_text, best_seg_to_split.duct_w_mm,
                             best_seg_to_split.duct_h_mm, best_seg_to_split.flow, False
                         ))
-                        self.segments.append(DuctSegment(
+                        self._add_segment(DuctSegment(
                             bx, by, x_max, by,
                             best_seg_to_split.label_text, best_seg_to_split.duct_w_mm,
                             best_seg_to_split.duct_h_mm, best_seg_to_split.flow, False
@@ -1267,29 +1830,34 @@ class Palette:
                 # 새 연결
                 w, h, label = perform_sizing(outlet_flow, dp, use_fixed, fixed_val, aspect_r)
                 if abs(bx - ox) > eps and abs(by - oy) < eps:
-                    self.segments.append(DuctSegment(bx, by, ox, oy, label, w, h, outlet_flow, False))
+                    self._add_segment(DuctSegment(bx, by, ox, oy, label, w, h, outlet_flow, False))
                 elif abs(by - oy) > eps and abs(bx - ox) < eps:
-                    self.segments.append(DuctSegment(bx, by, ox, oy, label, w, h, outlet_flow, True))
+                    self._add_segment(DuctSegment(bx, by, ox, oy, label, w, h, outlet_flow, True))
                 
                 # 기존 제거
                 for seg in connected_segs:
-                    if seg in self.segments:
-                        self.segments.remove(seg)
+                    if seg in self._seg_ends:
+                        self._remove_segment(seg)
                 
                 # 검증
-                if self._verify_all_outlets_connected():
-                    optimization_count += 1
+                if all_connected:
+                    ok = conn.edit_keeps_connected(outlet_nodes)
                 else:
-                    self.segments = pre_opt_segments
-                    
+                    ok = self._verify_all_outlets_connected()
             except Exception:
-                self.segments = pre_opt_segments
+                ok = False
+            if ok:
+                self._commit_edit()
+                all_connected = True
+                optimization_count += 1
+            else:
+                self._rollback_edit()
         
         if optimization_count > 0:
             self._recalculate_segment_flows(dp, use_fixed, fixed_val, aspect_r)
         
-        if not self._verify_all_outlets_connected():
-            self.segments = backup_segments
+        # 반영된 시도는 모두 전체 연결을 유지하므로, 끝까지 끊긴 상태면 아무것도 바뀌지 않았다
+        if not all_connected:
             return 0
         
         return optimization_count
@@ -1314,51 +1882,54 @@ class Palette:
             return
         inlet_node = node_key(inlet.mx, inlet.my)
         
-        seg_flow_acc = defaultdict(float)
-        outlets = [p for p in self.points if p.kind == 'outlet' and p.flow > 0]
+        # 입구에서 한 번만 BFS 하여 트리를 만들고, 역순으로 하위 트리 풍량을 합산 (O(E))
+        outlet_flow = defaultdict(float)
+        for p in self.points:
+            if p.kind == 'outlet' and p.flow > 0:
+                outlet_flow[node_key(p.mx, p.my)] += p.flow
         
-        for out in outlets:
-            start = node_key(out.mx, out.my)
-            if start not in adj:
-                continue
-            
-            queue = deque([start])
-            parent = {start: None}
+        seg_flow_acc = {}
+        if inlet_node in adj:
+            parent = {inlet_node: None}
             parent_seg = {}
-            found = False
-            
+            order = [inlet_node]
+            queue = deque([inlet_node])
             while queue:
                 cur = queue.popleft()
-                if cur == inlet_node:
-                    found = True
-                    break
-                for (nbr, seg) in adj.get(cur, []):
+                for (nbr, seg) in adj[cur]:
                     if nbr in parent:
                         continue
                     parent[nbr] = cur
                     parent_seg[nbr] = seg
+                    order.append(nbr)
                     queue.append(nbr)
             
-            if not found:
-                continue
-            
-            node = inlet_node
-            while True:
-                prev = parent.get(node)
+            subtree = {}
+            for node in reversed(order):
+                q = subtree.get(node, 0.0) + outlet_flow.get(node, 0.0)
+                prev = parent[node]
                 if prev is None:
-                    break
-                seg = parent_seg.get(node)
-                if seg is not None:
-                    seg_flow_acc[seg] += out.flow
-                node = prev
+                    continue
+                if q:
+                    seg_flow_acc[parent_seg[node]] = q
+                    subtree[prev] = subtree.get(prev, 0.0) + q
         
+        # 풍량·사이징 조건이 그대로인 구간은 다시 사이징하지 않음
+        changed = []
         for seg in self.segments:
             f = seg_flow_acc.get(seg, 0.0)
             seg.flow = f
-            w, h, label = perform_sizing(f, dp, use_fixed, fixed_val, aspect_r)
+            key = (f, dp, use_fixed, fixed_val, aspect_r)
+            if seg.sizing_key != key:
+                changed.append((seg, key))
+        if not changed:
+            return
+        sized = perform_sizing_batch([key[0] for _, key in changed], dp, use_fixed, fixed_val, aspect_r)
+        for (seg, key), (w, h, label) in zip(changed, sized):
             seg.duct_w_mm = w
             seg.duct_h_mm = h
             seg.label_text = label
+            seg.sizing_key = key
 
     def draw_duct_network(self, dp_mmAq_per_m: float, use_fixed: bool, fixed_val: float, aspect_ratio: float):
         """종합 사이징 + 안전한 최적화 (여러 회 반복)"""
@@ -1368,7 +1939,7 @@ class Palette:
             messagebox.showwarning("경고", "점이 2개 이상 있어야 종합 사이징을 할 수 있습니다.")
             return
         
-        self.segments.clear()
+        self._set_segments([])
         
         inlet = self.points[0]
         if inlet.kind != "inlet":
@@ -1386,7 +1957,7 @@ class Palette:
             if abs(x1 - x2) < 1e-6 and abs(y1 - y2) < 1e-6:
                 return 
             w, h, label = perform_sizing(flow, dp_mmAq_per_m, use_fixed, fixed_val, aspect_ratio)
-            self.segments.append(DuctSegment(x1, y1, x2, y2, label, w, h, flow, is_vert))
+            self._add_segment(DuctSegment(x1, y1, x2, y2, label, w, h, flow, is_vert))
 
         sum_dx = sum(abs(p.mx - inlet.mx) for p in outlets)
         sum_dy = sum(abs(p.my - inlet.my) for p in outlets)
@@ -1588,7 +2159,8 @@ class Palette:
     def clear_all(self):
         self.push_undo()
         self.points.clear()
-        self.segments.clear()
+        self._point_ends.clear()
+        self._set_segments([])
         self.redraw_all()
         self._notify_points_changed()
 
@@ -1605,7 +2177,7 @@ class Palette:
                 p.flow = Q_in
             else:
                 p.flow = Q_each
-        self.segments.clear()
+        self._set_segments([])
         self.redraw_all()
         self._notify_points_changed()
 
@@ -1716,6 +2288,8 @@ def get_sizing_params():
             fixed_val = float(fixed_side_entry.get())
         except:
             fixed_val = 0.0
+    if aspect_ratio_combo.get() == ASPECT_MIN_PERIMETER_LABEL:
+        return dp, use_fixed, fixed_val, MIN_PERIMETER
     try:
         r = float(aspect_ratio_combo.get())
     except:
@@ -1958,7 +2532,7 @@ def create_app():
     row += 1
 
     tk.Label(ctrl, text="종횡비 (b/a):").grid(row=row, column=0, padx=5, pady=5, sticky="w")
-    aspect_ratio_combo = ttk.Combobox(ctrl, values=["1", "2", "3", "4"], state="readonly", width=5)
+    aspect_ratio_combo = ttk.Combobox(ctrl, values=["1", "2", "3", "4", ASPECT_MIN_PERIMETER_LABEL], state="readonly", width=8)
     aspect_ratio_combo.current(1)
     aspect_ratio_combo.grid(row=row, column=1, padx=5, pady=5, sticky="w")
     row += 1
@@ -0,0 +1,440 @@
+"""덕트 사이징 공통 계산 (등마찰법 원형 직경 + 50mm 단위 각형 환산)
+
+drawer.py 와 duct calc.py 가 같은 식을 쓰도록 한 곳에 모은 모듈.
+단일 값 함수와 풍량 배열을 한 번에 계산하는 NumPy 배치 함수(*_batch)를 함께 제공한다.
+NumPy가 없으면 배치 함수는 단일 값 함수를 반복 호출한 리스트를 돌려준다.
+"""
+
+import bisect
+import math
+
+try:
+    import numpy as np
+except ImportError:  # 배치 함수는 순수 파이썬으로 동작
+    np = None
+
+# ROUND(((3.295*10^-10*풍량^1.9/저항)^0.199*1000),0)
+FRICTION_C = 3.295e-10
+RECT_STEP_MM = 50
+MAX_SIDE_MM = 10000
+# 표준 치수 표에서 허용하는 최대 종횡비 (긴 변 / 짧은 변)
+TABLE_MAX_ASPECT = 4.0
+# 목적 함수: 상당직경을 만족하는 조합 중 둘레(판재량) 최소 / 상당직경 최소
+MIN_PERIMETER = "min_perimeter"
+MIN_EQUIV = "min_equiv"
+
+
+# =========================
+# 단일 값 함수
+# =========================
+
+def calc_circular_diameter(q_m3h: float, dp_mmAq_per_m: float, round_mm: bool = True) -> float:
+    """풍량(m³/h), 정압(mmAq/m) -> 원형 덕트 직경(mm)"""
+    if q_m3h <= 0:
+        return 0.0
+    if dp_mmAq_per_m <= 0:
+        raise ValueError("정압값(mmAq/m)은 0보다 커야 합니다.")
+    D = ((FRICTION_C * q_m3h**1.9 / dp_mmAq_per_m)**0.199) * 1000
+    return round(D, 0) if round_mm else float(D)
+
+
+def round_step_up(x: float, step: float = RECT_STEP_MM) -> float:
+    return math.ceil(x / step) * step
+
+
+def round_step_down(x: float, step: float = RECT_STEP_MM) -> float:
+    return math.floor(x / step) * step
+
+
+def rect_equiv_diameter(a_mm: float, b_mm: float) -> float:
+    """각형 a x b 의 상당 원형 직경: 1.30 (ab)^0.625 / (a+b)^0.25"""
+    if a_mm <= 0 or b_mm <= 0:
+        return 0.0
+    a, b = float(a_mm), float(b_mm)
+    return 1.30 * (a*b)**0.625 / (a + b)**0.25
+
+
+def rect_theoretical(D: float, aspect_ratio: float):
+    """상당 직경 D, 종횡비 r(b/a) 를 만족하는 연속 치수 (a, b)"""
+    r = float(aspect_ratio)
+    a = D * (1 + r)**0.25 / (1.30 * r**0.625)
+    return a, r * a
+
+
+def size_rect_from_D1(D1: float, aspect_ratio: float, step: float = RECT_STEP_MM):
+    """짧은 변 올림/긴 변 내림을 먼저 시도하고, 모자라면 두 변 모두 올림
+
+    반환: (큰 변, 작은 변, 선택 상당직경, 이론 큰 변, 이론 작은 변)
+    """
+    if D1 <= 0:
+        return 0, 0, 0.0, 0.0, 0.0
+    if aspect_ratio <= 0:
+        raise ValueError("종횡비(b/a)는 0보다 커야 합니다.")
+
+    De_target = float(D1)
+    a_theo, b_theo = rect_theoretical(De_target, aspect_ratio)
+    theo_big, theo_small = max(a_theo, b_theo), min(a_theo, b_theo)
+
+    small_up = round_step_up(theo_small, step)
+    big_down = max(round_step_down(theo_big, step), step)
+    De1 = rect_equiv_diameter(small_up, big_down)
+
+    a_up = round_step_up(a_theo, step)
+    b_up = round_step_up(b_theo, step)
+    De2 = rect_equiv_diameter(a_up, b_up)
+
+    if De1 >= De_target:
+        sel_big, sel_small = max(small_up, big_down), min(small_up, big_down)
+        De_sel = De1
+    else:
+        sel_big, sel_small = max(a_up, b_up), min(a_up, b_up)
+        De_sel = De2
+
+    return (
+        int(round(sel_big)),
+        int(round(sel_small)),
+        round(De_sel, 1),
+        round(theo_big, 1),
+        round(theo_small, 1),
+    )
+
+
+def size_rect_stepped(D: float, aspect_ratio: float, step: float = RECT_STEP_MM):
+    """두 변 내림 -> 큰 변 올림 -> 두 변 올림 순서로 D 이상이 되는 첫 후보 (drawer 방식)
+
+    반환: (W, H, 상당직경, 단계) - W >= H, 단계 1/2/3 은 채택된 후보 번호
+    (단계 3은 상당직경을 확인하지 않고 채택).
+    """
+    if D <= 0:
+        return 0, 0, 0.0, 0
+    a_cont, b_cont = rect_theoretical(D, aspect_ratio)
+    w_cont, h_cont = max(a_cont, b_cont), min(a_cont, b_cont)
+
+    w1 = int(max(step, round_step_down(w_cont, step)))
+    h1 = int(max(step, round_step_down(h_cont, step)))
+    D1 = rect_equiv_diameter(w1, h1)
+    if D1 >= D:
+        return w1, h1, D1, 1
+    w2 = int(max(step, round_step_up(w_cont, step)))
+    D2 = rect_equiv_diameter(w2, h1)
+    if D2 >= D:
+        return w2, h1, D2, 2
+    h3 = int(max(step, round_step_up(h_cont, step)))
+    return w2, h3, rect_equiv_diameter(w2, h3), 3
+
+
+def calc_rect_other_side(D1: float, fixed_side_mm: float, step: float = RECT_STEP_MM):
+    """한 변을 고정하고 상당직경이 D1 이상이 되는 다른 변을 찾음 -> (큰 변, 작은 변, 상당직경)"""
+    if D1 <= 0:
+        return 0, 0, 0.0
+    if fixed_side_mm <= 0:
+        raise ValueError("고정 변의 길이는 0보다 커야 합니다.")
+
+    fixed = round_step_up(fixed_side_mm, step)
+    if step == RECT_STEP_MM:
+        found = get_rect_table().other_side(D1, fixed)
+        if found is not None:
+            return found
+    other = 50.0
+    while True:
+        de = rect_equiv_diameter(fixed, other)
+        if de >= D1 - 0.1:
+            break
+        other += step
+        if other > MAX_SIDE_MM:
+            break
+
+    sel_big = max(fixed, other)
+    sel_small = min(fixed, other)
+    return int(sel_big), int(sel_small), round(de, 1)
+
+
+# =========================
+# 표준 치수 표 (50mm 단위 W x H 전체, 상당직경 순)
+# =========================
+
+class RectSizeTable:
+    """표준 치수 (W >= H) 조합을 상당직경 순으로 정렬한 표 + 고정 변별 색인
+
+    - pairs: 상당직경 오름차순 (de, W, H). 종횡비가 max_aspect 를 넘는 조합은 제외
+    - best_perimeter[i]: pairs[i:] (상당직경 >= de[i]) 중 둘레가 가장 작은 조합의 위치
+    - by_side[s]: 한 변이 s 일 때 다른 변 50, 100, ... 의 상당직경 (다른 변 증가 -> 증가)
+    목표 상당직경 D 를 만족하는 최소 치수는 이분 탐색 한 번으로 찾는다.
+    """
+
+    def __init__(self, step: float = RECT_STEP_MM, max_side: float = MAX_SIDE_MM,
+                 max_aspect: float = TABLE_MAX_ASPECT):
+        self.step = step
+        self.sides = [step * k for k in range(1, int(max_side // step) + 1)]
+        self.by_side = {s: [rect_equiv_diameter(s, o) for o in self.sides] for s in self.sides}
+
+        pairs = []
+        for i, w in enumerate(self.sides):
+            row = self.by_side[w]
+            for j in range(i + 1):
+                h = self.sides[j]
+                if max_aspect and w > max_aspect * h:
+                    continue
+                pairs.append((row[j], w, h))
+        pairs.sort()
+        self.de = [p[0] for p in pairs]
+        self.w = [p[1] for p in pairs]
+        self.h = [p[2] for p in pairs]
+
+        n = len(pairs)
+        self.best_perimeter = [0] * n
+        best = None
+        for i in range(n - 1, -1, -1):
+            # 둘레가 같으면 상당직경이 작은(앞쪽) 조합
+            if best is None or self.w[i] + self.h[i] <= self.w[best] + self.h[best]:
+                best = i
+            self.best_perimeter[i] = best
+
+        if np is not None:
+            self._de = np.asarray(self.de)
+            self._w = np.asarray(self.w, dtype=int)
+            self._h = np.asarray(self.h, dtype=int)
+            self._best_perimeter = np.asarray(self.best_perimeter, dtype=int)
+            self._sides = np.asarray(self.sides, dtype=float)
+            self._side_de = np.asarray([self.by_side[s] for s in self.sides])
+
+    def select(self, D: float, objective: str = MIN_PERIMETER):
+        """상당직경 >= D 인 조합 중 목적 함수 최소 -> (W, H, 상당직경), 표 범위를 넘으면 None"""
+        i = bisect.bisect_left(self.de, D)
+        if i >= len(self.de):
+            return None
+        if objective == MIN_PERIMETER:
+            i = self.best_perimeter[i]
+        return self.w[i], self.h[i], self.de[i]
+
+    def other_side(self, D: float, fixed: float, tol: float = 0.1):
+        """한 변 fixed 고정 시 상당직경 >= D - tol 인 최소 다른 변 -> (큰 변, 작은 변, 상당직경)
+
+        calc_rect_other_side 와 같은 결과. fixed 가 표에 없으면 None.
+        """
+        row = self.by_side.get(fixed)
+        if row is None:
+            return None
+        j = bisect.bisect_left(row, D - tol)
+        if j < len(row):
+            other, de = self.sides[j], row[j]
+        else:
+            # 최대 치수로도 부족: 기존 단계 탐색과 같이 한 단계 넘긴 값을 돌려줌
+            other, de = self.sides[-1] + self.step, row[-1]
+        return int(max(fixed, other)), int(min(fixed, other)), round(de, 1)
+
+
+_RECT_TABLES = {}
+
+
+def get_rect_table(step: float = RECT_STEP_MM, max_aspect: float = TABLE_MAX_ASPECT) -> RectSizeTable:
+    """(step, max_aspect) 별로 한 번만 만드는 표준 치수 표"""
+    key = (step, max_aspect)
+    table = _RECT_TABLES.get(key)
+    if table is None:
+        table = _RECT_TABLES[key] = RectSizeTable(step, MAX_SIDE_MM, max_aspect)
+    return table
+
+
+def select_rect(D: float, objective: str = MIN_PERIMETER, step: float = RECT_STEP_MM):
+    """상당직경 D 이상인 표준 치수 중 목적 함수(둘레 최소 / 상당직경 최소) 최소 -> (W, H, 상당직경)"""
+    if D <= 0:
+        return 0, 0, 0.0
+    found = get_rect_table(step).select(D, objective)
+    if found is None:
+        raise ValueError(f"상당직경 {D:.0f}mm 를 만족하는 표준 치수가 없습니다.")
+    w, h, de = found
+    return int(w), int(h), round(de, 1)
+
+
+def size_duct(q: float, dp: float, aspect_ratio: float = 2.0, fixed_side=None,
+              rule: str = "equiv", step: float = RECT_STEP_MM):
+    """풍량 하나 사이징 -> (D, W, H)  (W >= H, mm)
+
+    rule='equiv'         : size_rect_from_D1 (duct calc 방식, D는 mm 반올림)
+    rule='stepped'       : size_rect_stepped (drawer 방식, D는 반올림하지 않음)
+    rule=MIN_PERIMETER   : 표준 치수 표에서 둘레 최소 (aspect_ratio 무시)
+    rule=MIN_EQUIV       : 표준 치수 표에서 상당직경 최소 (aspect_ratio 무시)
+    fixed_side 가 주어지면 한 변 고정 (calc_rect_other_side)
+    """
+    D = calc_circular_diameter(q, dp, round_mm=(rule != "stepped"))
+    if D <= 0:
+        return 0.0, 0, 0
+    if fixed_side is not None:
+        w, h, _ = calc_rect_other_side(D, fixed_side, step)
+    elif rule in (MIN_PERIMETER, MIN_EQUIV):
+        w, h, _ = select_rect(D, rule, step)
+    elif rule == "stepped":
+        w, h, _, _ = size_rect_stepped(D, aspect_ratio, step)
+    else:
+        w, h = size_rect_from_D1(D, aspect_ratio, step)[:2]
+    return D, w, h
+
+
+# =========================
+# 배치 함수 (NumPy)
+# =========================
+# 입력은 스칼라 또는 배열(브로드캐스트). 계산할 수 없는 값(q <= 0, dp <= 0 등)은
+# 예외 대신 0으로 채운다.
+
+def _arrays(*values):
+    return np.broadcast_arrays(*[np.asarray(v, dtype=float) for v in values])
+
+
+def calc_circular_diameter_batch(q, dp, round_mm: bool = True):
+    if np is None:
+        return [_safe(calc_circular_diameter, 0.0, qi, di, round_mm) for qi, di in _pairs(q, dp)]
+    q, dp = _arrays(q, dp)
+    out = np.zeros(q.shape)
+    ok = (q > 0) & (dp > 0)
+    out[ok] = ((FRICTION_C * q[ok]**1.9 / dp[ok])**0.199) * 1000
+    return np.round(out) if round_mm else out
+
+
+def rect_equiv_diameter_batch(a, b):
+    if np is None:
+        return [rect_equiv_diameter(ai, bi) for ai, bi in _pairs(a, b)]
+    a, b = _arrays(a, b)
+    out = np.zeros(a.shape)
+    ok = (a > 0) & (b > 0)
+    out[ok] = 1.30 * (a[ok] * b[ok])**0.625 / (a[ok] + b[ok])**0.25
+    return out
+
+
+def size_rect_from_D1_batch(D, aspect_ratio, step: float = RECT_STEP_MM):
+    """size_rect_from_D1 의 배열 버전 -> (큰 변, 작은 변, 상당직경)"""
+    if np is None:
+        res = [_safe(size_rect_from_D1, (0, 0, 0.0), d, r, step)[:3] for d, r in _pairs(D, aspect_ratio)]
+        return tuple(list(col) for col in zip(*res)) if res else ([], [], [])
+    D, r = _arrays(D, aspect_ratio)
+    ok = (D > 0) & (r > 0)
+    r_safe = np.where(ok, r, 1.0)
+    a_theo = D * (1 + r_safe)**0.25 / (1.30 * r_safe**0.625)
+    b_theo = r_safe * a_theo
+    theo_big, theo_small = np.maximum(a_theo, b_theo), np.minimum(a_theo, b_theo)
+
+    small_up = np.ceil(theo_small / step) * step
+    big_down = np.maximum(np.floor(theo_big / step) * step, step)
+    De1 = rect_equiv_diameter_batch(small_up, big_down)
+    a_up = np.ceil(a_theo / step) * step
+    b_up = np.ceil(b_theo / step) * step
+    De2 = rect_equiv_diameter_batch(a_up, b_up)
+
+    first = De1 >= D
+    big = np.where(first, np.maximum(small_up, big_down), np.maximum(a_up, b_up))
+    small = np.where(first, np.minimum(small_up, big_down), np.minimum(a_up, b_up))
+    de = np.where(first, De1, De2)
+    return (np.where(ok, np.round(big), 0).astype(int),
+            np.where(ok, np.round(small), 0).astype(int),
+            np.where(ok, np.round(de, 1), 0.0))
+
+
+def size_rect_stepped_batch(D, aspect_ratio, step: float = RECT_STEP_MM):
+    """size_rect_stepped 의 배열 버전 -> (W, H, 상당직경)"""
+    if np is None:
+        res = [_safe(size_rect_stepped, (0, 0, 0.0), d, r, step)[:3] for d, r in _pairs(D, aspect_ratio)]
+        return tuple(list(col) for col in zip(*res)) if res else ([], [], [])
+    D, r = _arrays(D, aspect_ratio)
+    ok = (D > 0) & (r > 0)
+    r_safe = np.where(ok, r, 1.0)
+    a_cont = D * (1 + r_safe)**0.25 / (1.30 * r_safe**0.625)
+    b_cont = r_safe * a_cont
+    w_cont, h_cont = np.maximum(a_cont, b_cont), np.minimum(a_cont, b_cont)
+
+    w1 = np.maximum(step, np.floor(w_cont / step) * step)
+    h1 = np.maximum(step, np.floor(h_cont / step) * step)
+    w2 = np.maximum(step, np.ceil(w_cont / step) * step)
+    h3 = np.maximum(step, np.ceil(h_cont / step) * step)
+    D1 = rect_equiv_diameter_batch(w1, h1)
+    D2 = rect_equiv_diameter_batch(w2, h1)
+
+    stage1 = D1 >= D
+    stage2 = ~stage1 & (D2 >= D)
+    w = np.where(stage1, w1, w2)
+    h = np.where(stage1 | stage2, h1, h3)
+    de = rect_equiv_diameter_batch(w, h)
+    return (np.where(ok, w, 0).astype(int),
+            np.where(ok, h, 0).astype(int),
+            np.where(ok, de, 0.0))
+
+
+def calc_rect_other_side_batch(D, fixed_side, step: float = RECT_STEP_MM):
+    """calc_rect_other_side 의 배열 버전 -> (큰 변, 작은 변, 상당직경)"""
+    if np is None:
+        res = [_safe(calc_rect_other_side, (0, 0, 0.0), d, f, step) for d, f in _pairs(D, fixed_side)]
+        return tuple(list(col) for col in zip(*res)) if res else ([], [], [])
+    D, fixed_side = _arrays(D, fixed_side)
+    ok = (D > 0) & (fixed_side > 0)
+    fixed = np.ceil(np.where(ok, fixed_side, step) / step) * step
+    table = get_rect_table(step)
+    if step != RECT_STEP_MM or fixed.max(initial=0) > table.sides[-1]:
+        res = [_safe(calc_rect_other_side, (0, 0, 0.0), d, f, step)
+               for d, f in zip(D.ravel(), fixed_side.ravel())]
+        return tuple(np.asarray([r[k] for r in res]).reshape(D.shape) for k in range(3))
+    # 고정 변별 상당직경 행(다른 변 증가 -> 증가)에서 벡터화 이분 탐색
+    rows = table._side_de[(fixed / step).astype(int) - 1]
+    target = D - 0.1
+    lo = np.zeros(D.shape, dtype=int)
+    hi = np.full(D.shape, len(table.sides), dtype=int)
+    while (lo < hi).any():
+        mid = (lo + hi) // 2
+        below = np.take_along_axis(rows, np.minimum(mid, len(table.sides) - 1)[..., None], axis=-1)[..., 0] < target
+        active = lo < hi
+        lo = np.where(active & below, mid + 1, lo)
+        hi = np.where(active & ~below, mid, hi)
+    found = lo < len(table.sides)
+    idx = np.minimum(lo, len(table.sides) - 1)
+    other = np.where(found, table._sides[idx], table.sides[-1] + step)
+    de = np.take_along_axis(rows, idx[..., None], axis=-1)[..., 0]
+    return (np.where(ok, np.maximum(fixed, other), 0).astype(int),
+            np.where(ok, np.minimum(fixed, other), 0).astype(int),
+            np.where(ok, np.round(de, 1), 0.0))
+
+
+def select_rect_batch(D, objective: str = MIN_PERIMETER, step: float = RECT_STEP_MM):
+    """select_rect 의 배열 버전 -> (W, H, 상당직경), 표 범위를 넘는 값은 0"""
+    if np is None:
+        res = [_safe(select_rect, (0, 0, 0.0), d, objective, step) for d, _ in _pairs(D, 0)]
+        return tuple(list(col) for col in zip(*res)) if res else ([], [], [])
+    D = np.asarray(D, dtype=float)
+    table = get_rect_table(step)
+    i = np.searchsorted(table._de, D, side="left")
+    ok = (D > 0) & (i < len(table.de))
+    i = np.minimum(i, len(table.de) - 1)
+    if objective == MIN_PERIMETER:
+        i = table._best_perimeter[i]
+    return (np.where(ok, table._w[i], 0),
+            np.where(ok, table._h[i], 0),
+            np.where(ok, np.round(table._de[i], 1), 0.0))
+
+
+def size_ducts_batch(q, dp, aspect_ratio=2.0, fixed_side=None,
+                     rule: str = "equiv", step: float = RECT_STEP_MM):
+    """풍량 배열을 한 번에 사이징 -> (D, W, H) 배열 (규칙은 size_duct 와 같음)"""
+    D = calc_circular_diameter_batch(q, dp, round_mm=(rule != "stepped"))
+    if fixed_side is not None:
+        w, h, _ = calc_rect_other_side_batch(D, fixed_side, step)
+    elif rule in (MIN_PERIMETER, MIN_EQUIV):
+        w, h, _ = select_rect_batch(D, rule, step)
+    elif rule == "stepped":
+        w, h, _ = size_rect_stepped_batch(D, aspect_ratio, step)
+    else:
+        w, h, _ = size_rect_from_D1_batch(D, aspect_ratio, step)
+    return D, w, h
+
+
+def _pairs(x, y):
+    """NumPy 없이 스칼라/시퀀스 두 개를 같은 길이로 맞춤"""
+    xs = list(x) if isinstance(x, (list, tuple)) else None
+    ys = list(y) if isinstance(y, (list, tuple)) else None
+    if xs is None and ys is None:
+        return [(x, y)]
+    n = len(xs) if xs is not None else len(ys)
+    return zip(xs if xs is not None else [x] * n, ys if ys is not None else [y] * n)
+
+
+def _safe(func, default, *args):
+    try:
+        return func(*args)
+    except Exception:
+        return default
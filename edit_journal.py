@@ -0,0 +1,427 @@
+"""편집 저널 (자동 저장 / 크래시 복구)
+
+drawer.py 의 팔레트 편집을 작업 단위(도형 추가/이동/크기/삭제, 라벨 텍스트/hvac, 디퓨저 목록,
+일괄 작업 뒤 전체 교체)로 받아 append-only JSON lines 파일에 백그라운드 스레드로 기록하고,
+비정상 종료 뒤 다음 실행에서 팔레트별 상태(Palette.to_dict 형식)로 되살린다.
+
+- 실행 중인 앱마다 JOURNAL_DIR 아래 자기 디렉터리를 쓰고, 주인 프로세스가 끝난 것만 복구 대상이다.
+- 좌표는 팔레트 기준 좌표계(줌/팬 이전)로 바꿔 저장하므로 기록 사이의 줌/팬과 무관하게 재생된다.
+- Tk 에 의존하지 않으므로 따로 테스트할 수 있다 (tests/test_edit_journal.py).
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+
+from instrumentation import PERF
+
+
+JOURNAL_DIR = os.path.join(os.path.expanduser("~"), ".drawer_journal")
+
+
+def _pid_alive(pid):
+    """pid 프로세스가 실행 중인지 (저널 디렉터리 주인 확인용)"""
+    if pid <= 0:
+        return False
+    if pid == os.getpid():
+        return True
+    if os.name == "nt":
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)   # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        try:
+            code = ctypes.c_ulong()
+            ok = kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+            return bool(ok) and code.value == 259            # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+class EditJournal:
+    """팔레트 편집 내역을 append-only 저널(JSON lines)에 백그라운드로 기록하는 클래스.
+
+    - 실행 중인 앱마다 JOURNAL_DIR 아래 자기 디렉터리를 쓴다 (owner.json 에 pid).
+      주인 프로세스가 끝난 디렉터리만 복구 대상(orphans)이다.
+    - record(): UI 스레드에서 작업 단위 변경(도형 추가/이동/크기/삭제, 라벨 텍스트/hvac,
+      라벨 디퓨저 목록, 일괄 작업 뒤 전체 교체)을 원시 값 그대로 큐에 넣기만 함
+    - 작업 스레드가 좌표를 팔레트 기준 좌표계(줌/팬 이전)로 옮기고, 직전 상태와 비교해
+      바뀐 필드만 작업 단위 줄로 JSON 직렬화해 추가 기록
+    - compact_every 건마다 전체 상태를 snapshot.json 으로 압축하고 저널을 비움
+    - recover(): snapshot + 저널을 순서대로 재생해 팔레트별 상태 dict(to_dict 형식) 반환
+    """
+
+    def __init__(self, directory=None, compact_every=200, root=JOURNAL_DIR):
+        if directory is None:
+            directory = os.path.join(root, f"{os.getpid()}-{int(time.time() * 1000)}")
+        self.directory = directory
+        self.journal_path = os.path.join(directory, "journal.jsonl")
+        self.snapshot_path = os.path.join(directory, "snapshot.json")
+        self.owner_path = os.path.join(directory, "owner.json")
+        self.compact_every = max(1, int(compact_every))
+        self._states = {}         # palette index -> {"meta", "shapes": {shape_id: ...}, "labels"}
+        self._pending = 0         # 마지막 압축 이후 기록된 줄 수
+        self._seq = 0
+        self._queue = queue.Queue()
+        self._fh = None
+        self._thread = None
+
+    @staticmethod
+    def orphans(root=JOURNAL_DIR):
+        """주인 프로세스가 없는(비정상 종료된) 저널 디렉터리 목록, 최근 것부터"""
+        found = []
+        try:
+            names = os.listdir(root)
+        except Exception:
+            return found
+        for name in names:
+            path = os.path.join(root, name)
+            if not os.path.isdir(path):
+                continue
+            journal = EditJournal(path)
+            if not journal.has_data() or journal.owner_alive():
+                continue
+            try:
+                mtime = max(os.path.getmtime(p) for p in (journal.journal_path, journal.snapshot_path)
+                            if os.path.exists(p))
+            except Exception:
+                mtime = 0.0
+            found.append((mtime, path))
+        found.sort(reverse=True)
+        return [path for _mtime, path in found]
+
+    def owner_alive(self):
+        try:
+            with open(self.owner_path, "r", encoding="utf-8") as f:
+                pid = int(json.load(f).get("pid", 0))
+        except Exception:
+            return False
+        return _pid_alive(pid)
+
+    def start(self):
+        """디렉터리를 이 프로세스 것으로 표시하고, 기존 snapshot/저널을 기준 상태로 작업 스레드 시작"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.owner_path, "w", encoding="utf-8") as f:
+                json.dump({"pid": os.getpid(), "started": time.time()}, f)
+        except Exception:
+            pass
+        self._states = self._replay()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="EditJournal", daemon=True)
+            self._thread.start()
+
+    def has_data(self):
+        try:
+            if os.path.exists(self.snapshot_path):
+                return True
+            return os.path.exists(self.journal_path) and os.path.getsize(self.journal_path) > 0
+        except Exception:
+            return False
+
+    def record(self, index, affine, ops):
+        """팔레트 index의 편집 작업 목록을 기록 요청 (non-blocking)
+
+        affine: 좌표가 속한 보기 변환 (s, tx, ty). ops 항목:
+          ("meta", {"scale", "show_grid"})
+          ("shape", shape_id, coords, editable, color)   추가/이동/크기 변경
+          ("shape_del", shape_id)
+          ("label", 라벨 번호, to_dict 형식 라벨 dict 일부)
+          ("reset", meta, [(shape_id, coords, editable, color), ...], [라벨 dict, ...])
+        """
+        self._queue.put(("ops", int(index), tuple(affine), ops))
+
+    def drop(self, index):
+        """팔레트(탭) 삭제를 기록 요청"""
+        self._queue.put(("drop", int(index), None, None))
+
+    def close(self, discard=False):
+        """작업 스레드를 종료. discard=True면 정상 종료로 보고 이 저널 디렉터리만 삭제"""
+        if self._thread is not None:
+            self._queue.put(None)
+            try:
+                self._thread.join(timeout=5.0)
+            except Exception:
+                pass
+            self._thread = None
+        if discard:
+            self._close_file()
+            for path in (self.journal_path, self.snapshot_path, self.snapshot_path + ".tmp",
+                         self.owner_path):
+                try:
+                    if os.path.exists(path):
+                        os.remove(path)
+                except Exception:
+                    pass
+            try:
+                os.rmdir(self.directory)
+            except Exception:
+                pass
+
+    # --- 작업 스레드 ---
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            try:
+                self._write_item(item)
+                # 큐에 쌓인 항목을 한 번에 처리하고 flush는 한 번만
+                while True:
+                    try:
+                        nxt = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if nxt is None:
+                        self._flush()
+                        self._close_file()
+                        return
+                    self._write_item(nxt)
+                self._flush()
+            except Exception:
+                pass
+        self._flush()
+        self._close_file()
+
+    def _write_item(self, item):
+        self._write(item)
+        # 기록이 몰려도 압축 주기를 지키도록 항목마다 확인 (snapshot은 fsync 후 저널을 비움)
+        if self._pending >= self.compact_every:
+            self._compact()
+
+    def _open_file(self):
+        if self._fh is None:
+            self._fh = open(self.journal_path, "a", encoding="utf-8")
+        return self._fh
+
+    def _flush(self):
+        try:
+            if self._fh is not None:
+                self._fh.flush()
+                os.fsync(self._fh.fileno())
+        except Exception:
+            pass
+
+    def _close_file(self):
+        try:
+            if self._fh is not None:
+                self._fh.close()
+        except Exception:
+            pass
+        self._fh = None
+
+    @PERF.timed(cat='journal')
+    def _write(self, item):
+        kind, index, affine, ops = item
+        if kind == "drop":
+            self._append({"op": "drop", "palette": index})
+            return
+        state = self._states.setdefault(index, self._new_state())
+        for op in ops:
+            for entry in self._diff(state, affine, op):
+                entry["palette"] = index
+                self._append(entry)
+
+    def _append(self, entry):
+        self._seq += 1
+        entry["seq"] = self._seq
+        entry["t"] = time.time()
+        self._states = self._apply(self._states, entry)
+        self._open_file().write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._pending += 1
+
+    # --- 작업 -> 저널 항목 (작업 스레드) ---
+
+    @staticmethod
+    def _new_state():
+        return {"meta": {}, "shapes": {}, "labels": []}
+
+    @staticmethod
+    def _base_xy(affine, coords):
+        """보기 변환 affine 의 화면 좌표 (x, y, x, y, ...) -> 팔레트 기준 좌표 리스트"""
+        s, tx, ty = affine
+        return [round(((v - tx) if i % 2 == 0 else (v - ty)) / s, 6) for i, v in enumerate(coords)]
+
+    LABEL_POINT_KEYS = ("name_pos", "heat_norm_pos", "heat_equip_pos", "area_pos")
+
+    @classmethod
+    def _base_label(cls, affine, rec):
+        """라벨 dict의 텍스트/디퓨저 위치를 기준 좌표로 (다각형은 줌/팬을 따라가지 않으므로 그대로)"""
+        out = dict(rec)
+        for key in cls.LABEL_POINT_KEYS:
+            if out.get(key) is not None:
+                out[key] = cls._base_xy(affine, out[key])
+        if out.get("diffuser_coords") is not None:
+            out["diffuser_coords"] = [cls._base_xy(affine, p) for p in out["diffuser_coords"]]
+        if out.get("polygon_coords") is not None:
+            out["polygon_coords"] = [list(p) for p in out["polygon_coords"]]
+        return out
+
+    @staticmethod
+    def _changes(prev, rec):
+        return {k: v for k, v in rec.items() if k not in prev or prev[k] != v}
+
+    def _diff(self, state, affine, op):
+        """작업 하나를 현재 상태와 비교해 저널 항목 목록으로 (바뀐 필드만)"""
+        kind = op[0]
+        if kind == "meta":
+            meta = dict(op[1])
+            if meta.get("scale") is not None:
+                meta["scale"] = meta["scale"] / affine[0]
+            changes = self._changes(state["meta"], meta)
+            return [{"op": "meta", "changes": changes}] if changes else []
+        if kind == "shape":
+            _kind, sid, coords, editable, color = op
+            rec = {"coords": self._base_xy(affine, coords), "editable": editable, "color": color}
+            changes = self._changes(state["shapes"].get(sid, {}), rec)
+            return [{"op": "shape", "id": sid, "changes": changes}] if changes else []
+        if kind == "shape_del":
+            return [{"op": "shape_del", "id": op[1]}] if op[1] in state["shapes"] else []
+        if kind == "label":
+            _kind, no, rec = op
+            return self._label_entries(state, no, self._base_label(affine, rec), replace=False)
+        if kind == "reset":
+            _kind, meta, shapes, labels = op
+            out = self._diff(state, affine, ("meta", meta))
+            ids = [shape[0] for shape in shapes]
+            keep = set(ids)
+            out.extend({"op": "shape_del", "id": sid} for sid in state["shapes"] if sid not in keep)
+            for shape in shapes:
+                out.extend(self._diff(state, affine, ("shape",) + tuple(shape)))
+            order = [sid for sid in state["shapes"] if sid in keep]
+            order.extend(sid for sid in ids if sid not in state["shapes"])
+            if order != ids:
+                out.append({"op": "order", "ids": ids})
+            if len(labels) != len(state["labels"]):
+                out.append({"op": "labels", "count": len(labels)})
+            for no, rec in enumerate(labels):
+                out.extend(self._label_entries(state, no, self._base_label(affine, rec), replace=True))
+            return out
+        return []
+
+    @staticmethod
+    def _label_entries(state, no, rec, replace):
+        labels = state["labels"]
+        prev = labels[no] if no < len(labels) else {}
+        out = []
+        if not replace and no >= len(labels):
+            out.append({"op": "labels", "count": no + 1})
+        if replace and set(prev) - set(rec):
+            return out + [{"op": "label", "no": no, "value": rec}]
+        changes = EditJournal._changes(prev, rec)
+        if changes:
+            out.append({"op": "label", "no": no, "changes": changes})
+        return out
+
+    @staticmethod
+    def _apply(states, entry):
+        """저널 항목 하나를 상태에 반영 (기록과 복구가 같은 함수를 씀). 새 states 반환"""
+        op = entry.get("op")
+        index = int(entry.get("palette", 0))
+        if op == "drop":
+            return {(i if i < index else i - 1): s for i, s in states.items() if i != index}
+        state = states.setdefault(index, EditJournal._new_state())
+        if op == "meta":
+            state["meta"].update(entry.get("changes", {}))
+        elif op == "shape":
+            state["shapes"].setdefault(int(entry["id"]), {}).update(entry.get("changes", {}))
+        elif op == "shape_del":
+            state["shapes"].pop(int(entry["id"]), None)
+        elif op == "order":
+            shapes = state["shapes"]
+            ordered = {sid: shapes[sid] for sid in map(int, entry.get("ids", [])) if sid in shapes}
+            ordered.update((sid, rec) for sid, rec in shapes.items() if sid not in ordered)
+            state["shapes"] = ordered
+        elif op == "labels":
+            count = int(entry.get("count", 0))
+            labels = state["labels"]
+            del labels[count:]
+            labels.extend({} for _ in range(count - len(labels)))
+        elif op == "label":
+            no = int(entry["no"])
+            labels = state["labels"]
+            labels.extend({} for _ in range(no + 1 - len(labels)))
+            if "value" in entry:
+                labels[no] = dict(entry["value"])
+            else:
+                labels[no].update(entry.get("changes", {}))
+        return states
+
+    @PERF.timed(cat='journal')
+    def _compact(self):
+        """현재 상태 전체를 snapshot으로 원자적으로 저장하고 저널을 비움"""
+        tmp = self.snapshot_path + ".tmp"
+        palettes = {str(i): {"meta": s["meta"], "shapes": [[sid, rec] for sid, rec in s["shapes"].items()],
+                             "labels": s["labels"]}
+                    for i, s in self._states.items()}
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"seq": self._seq, "palettes": palettes}, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.snapshot_path)
+        self._close_file()
+        open(self.journal_path, "w", encoding="utf-8").close()
+        self._pending = 0
+
+    # --- 복구 ---
+
+    def _replay(self):
+        """snapshot을 읽고 저널을 순서대로 재생한 내부 상태 {palette index: state}"""
+        states = {}
+        snap_seq = 0
+        try:
+            if os.path.exists(self.snapshot_path):
+                with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                    snap = json.load(f)
+                snap_seq = int(snap.get("seq", 0))
+                self._seq = snap_seq
+                for k, s in snap.get("palettes", {}).items():
+                    states[int(k)] = {"meta": dict(s.get("meta", {})),
+                                      "shapes": {int(sid): rec for sid, rec in s.get("shapes", [])},
+                                      "labels": list(s.get("labels", []))}
+        except Exception:
+            states = {}
+        try:
+            if os.path.exists(self.journal_path):
+                with open(self.journal_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            entry = json.loads(line)
+                        except Exception:
+                            # 크래시로 잘린 마지막 줄은 무시
+                            break
+                        # 압축 직후 저널을 비우기 전에 종료된 경우: 이미 snapshot에 포함된 항목
+                        if int(entry.get("seq", 0)) <= snap_seq:
+                            continue
+                        states = self._apply(states, entry)
+                        self._seq = max(self._seq, int(entry.get("seq", 0)))
+        except Exception:
+            pass
+        return states
+
+    def recover(self):
+        """snapshot + 저널을 재생해 {palette index: to_dict 형식 상태 dict} 반환"""
+        out = {}
+        for index, state in self._replay().items():
+            data = {"scale": 20.0}
+            data.update(state["meta"])
+            data["shapes"] = list(state["shapes"].values())
+            data["labels"] = [lab for lab in state["labels"] if lab]
+            out[index] = data
+        return out
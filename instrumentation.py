@@ -0,0 +1,259 @@
+"""성능 계측 (구간 타이머 / 카운터 / 링 버퍼 / JSON·Chrome trace 내보내기)
+
+drawer.py 의 경로 탐색·배치·풍량 계산·히스토리·다시 그리기·저장/불러오기 같은
+주요 작업에 구간 타이머와 카운터를 붙이기 위한 가벼운 모듈.
+
+- 기본은 꺼져 있음. 환경변수 DRAWER_PERF=1 또는 PERF.enable() 로 켠다.
+- 꺼져 있으면 span()은 공유 no-op 객체를, timed()는 원래 함수를 바로 호출하므로 비용이 거의 없다.
+- 최근 capacity 개의 이벤트만 링 버퍼(deque)에 남고, 이름별 누적 통계는 따로 유지한다.
+- export_chrome_trace() 결과는 chrome://tracing 또는 Perfetto 에서 열 수 있다.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from functools import wraps
+
+DEFAULT_CAPACITY = 20000
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("_inst", "name", "cat", "args", "_t0")
+
+    def __init__(self, inst, name, cat, args):
+        self._inst = inst
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self._t0 = 0.0
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        t1 = time.perf_counter()
+        if exc_type is not None:
+            self.args = dict(self.args or {}, error=exc_type.__name__)
+        self._inst._complete(self.name, self.cat, self._t0, t1 - self._t0, self.args)
+        return False
+
+
+class _NullStages:
+    __slots__ = ()
+
+    def lap(self, stage, **args):
+        pass
+
+
+_NULL_STAGES = _NullStages()
+
+
+class _Stages:
+    __slots__ = ("_inst", "prefix", "cat", "_t")
+
+    def __init__(self, inst, prefix, cat):
+        self._inst = inst
+        self.prefix = prefix
+        self.cat = cat
+        self._t = time.perf_counter()
+
+    def lap(self, stage, **args):
+        """직전 lap(또는 생성) 시점부터 지금까지를 prefix.stage 구간으로 기록"""
+        t = time.perf_counter()
+        self._inst._complete(f"{self.prefix}.{stage}", self.cat, self._t, t - self._t, args or None)
+        self._t = t
+
+
+class Instrumentation:
+    """구간 시간과 카운터를 모으는 계측기 (스레드 안전)"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, enabled=False):
+        self.enabled = bool(enabled)
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._events = deque(maxlen=max(1, int(capacity)))
+        self._stats = {}      # (cat, name) -> [count, total_s, max_s]
+        self._counters = {}   # name -> value
+
+    def enable(self, on=True):
+        self.enabled = bool(on)
+
+    @property
+    def capacity(self):
+        return self._events.maxlen
+
+    # --- 기록 ---
+
+    def span(self, name, cat="app", **args):
+        """with PERF.span('route.mst'): ... 형태의 구간 타이머"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, cat, args or None)
+
+    def stages(self, prefix, cat="app"):
+        """긴 함수의 단계를 들여쓰기 없이 재는 랩 타이머: st = PERF.stages('route'); ...; st.lap('mst')"""
+        if not self.enabled:
+            return _NULL_STAGES
+        return _Stages(self, prefix, cat)
+
+    def timed(self, name=None, cat="app"):
+        """함수 전체를 구간으로 재는 데코레이터 (꺼져 있으면 원래 함수만 호출)"""
+        def deco(fn):
+            label = name or fn.__qualname__
+
+            @wraps(fn)
+            def wrapper(*a, **kw):
+                if not self.enabled:
+                    return fn(*a, **kw)
+                t0 = time.perf_counter()
+                try:
+                    return fn(*a, **kw)
+                finally:
+                    t1 = time.perf_counter()
+                    self._complete(label, cat, t0, t1 - t0, None)
+            return wrapper
+        return deco
+
+    def count(self, name, n=1):
+        """누적 카운터 증가"""
+        if not self.enabled:
+            return
+        with self._lock:
+            value = self._counters.get(name, 0) + n
+            self._counters[name] = value
+            self._events.append(("C", name, "counter", time.perf_counter(), 0.0,
+                                 threading.get_ident(), {"value": value}))
+
+    def mark(self, name, cat="app", **args):
+        """순간 이벤트 (디버그 로그 대용)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._events.append(("i", name, cat, time.perf_counter(), 0.0,
+                                 threading.get_ident(), args or None))
+
+    def _complete(self, name, cat, t0, dur, args):
+        with self._lock:
+            self._events.append(("X", name, cat, t0, dur, threading.get_ident(), args))
+            st = self._stats.get((cat, name))
+            if st is None:
+                self._stats[(cat, name)] = [1, dur, dur]
+            else:
+                st[0] += 1
+                st[1] += dur
+                if dur > st[2]:
+                    st[2] = dur
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+            self._stats.clear()
+            self._counters.clear()
+            self._origin = time.perf_counter()
+
+    # --- 조회 ---
+
+    def stats(self):
+        """이름별 누적 통계 (총 시간 내림차순): [{'name','cat','count','total_ms','mean_ms','max_ms'}]"""
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._stats.items()]
+        out = []
+        for (cat, name), (cnt, total, mx) in items:
+            out.append({
+                "name": name,
+                "cat": cat,
+                "count": cnt,
+                "total_ms": total * 1000.0,
+                "mean_ms": (total / cnt) * 1000.0 if cnt else 0.0,
+                "max_ms": mx * 1000.0,
+            })
+        out.sort(key=lambda r: r["total_ms"], reverse=True)
+        return out
+
+    def event_count(self):
+        return len(self._events)
+
+    def counters(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def events(self):
+        """링 버퍼에 남은 이벤트 (오래된 것부터): [{'ph','name','cat','ts_ms','dur_ms','tid','args'}]"""
+        with self._lock:
+            raw = list(self._events)
+            origin = self._origin
+        return [{
+            "ph": ph,
+            "name": name,
+            "cat": cat,
+            "ts_ms": (t - origin) * 1000.0,
+            "dur_ms": dur * 1000.0,
+            "tid": tid,
+            "args": args or {},
+        } for ph, name, cat, t, dur, tid, args in raw]
+
+    # --- 내보내기 ---
+
+    def to_dict(self):
+        return {
+            "enabled": self.enabled,
+            "capacity": self.capacity,
+            "stats": self.stats(),
+            "counters": self.counters(),
+            "events": self.events(),
+        }
+
+    def export_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    def chrome_trace(self):
+        """Chrome trace event format (traceEvents, 마이크로초 단위)"""
+        pid = os.getpid()
+        trace = []
+        for ev in self.events():
+            item = {
+                "name": ev["name"],
+                "cat": ev["cat"],
+                "ph": ev["ph"],
+                "ts": ev["ts_ms"] * 1000.0,
+                "pid": pid,
+                "tid": ev["tid"],
+            }
+            if ev["ph"] == "X":
+                item["dur"] = ev["dur_ms"] * 1000.0
+            elif ev["ph"] == "i":
+                item["s"] = "t"
+            if ev["args"]:
+                item["args"] = {k: (v if isinstance(v, (int, float, str, bool)) or v is None else repr(v))
+                                for k, v in ev["args"].items()}
+            trace.append(item)
+        return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f, ensure_ascii=False)
+
+
+def _env_enabled():
+    return os.environ.get("DRAWER_PERF", "").strip().lower() in ("1", "true", "yes", "on")
+
+
+# 앱 전체에서 공유하는 계측기
+PERF = Instrumentation(enabled=_env_enabled())
@@ -0,0 +1,175 @@
+"""edit_journal.EditJournal: 기록 -> 압축 -> 재생 왕복 테스트 (Tk 없이 실행)"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from edit_journal import EditJournal  # noqa: E402
+
+
+def to_view(affine, *coords):
+    """기준 좌표 -> 보기 변환 affine (s, tx, ty) 의 화면 좌표"""
+    s, tx, ty = affine
+    return [v * s + (tx if i % 2 == 0 else ty) for i, v in enumerate(coords)]
+
+
+def label(no, affine, text="Norm: 1.00 W/m²", diffusers=((10.0, 10.0),)):
+    x = 100.0 * no
+    return {
+        "polygon_coords": [(x, 0.0), (x + 90.0, 0.0), (x + 90.0, 90.0), (x, 90.0), (x, 0.0)],
+        "name_text": f"Room {no}",
+        "heat_norm_text": text,
+        "heat_equip_text": "Equip: 2.00 W/m²",
+        "area_text": "10.00 m²",
+        "name_pos": to_view(affine, x + 45.0, 30.0),
+        "heat_norm_pos": to_view(affine, x + 45.0, 40.0),
+        "heat_equip_pos": to_view(affine, x + 45.0, 50.0),
+        "area_pos": to_view(affine, x + 45.0, 60.0),
+        "diffuser_coords": [to_view(affine, x + dx, dy) for dx, dy in diffusers],
+        "hvac_type": 1,
+        "hvac_detail": 0,
+        "hvac_text": None,
+        "hvac_qty": None,
+        "hvac_detail_text": None,
+    }
+
+
+def base_label(no, **kw):
+    rec = label(no, (1.0, 0.0, 0.0), **kw)
+    rec["polygon_coords"] = [list(p) for p in rec["polygon_coords"]]
+    return rec
+
+
+class EditJournalRoundTripTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.directory = os.path.join(self.root, "session")
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def reopen(self, journal):
+        """작업 스레드를 끝내고(파일은 남김) 새 인스턴스로 다시 읽기 (비정상 종료 뒤 복구와 같음)"""
+        journal.close(discard=False)
+        return EditJournal(self.directory).recover()
+
+    def test_record_compact_replay_with_zoom_and_pan_between_records(self):
+        journal = EditJournal(self.directory, compact_every=3)
+        journal.start()
+        identity = (1.0, 0.0, 0.0)
+        zoomed = (2.0, -100.0, -50.0)      # 줌
+        panned = (2.0, -70.0, -20.0)       # 줌 뒤 팬
+
+        meta = {"scale": 20.0, "show_grid": False}
+        journal.record(0, identity, [
+            ("reset", meta,
+             [(1, [0.0, 0.0, 100.0, 100.0], True, "black"), (2, [200.0, 0.0, 260.0, 40.0], True, "blue")],
+             [label(0, identity), label(1, identity)]),
+        ])
+        # 줌 뒤 도형 1 이동, 라벨 0 텍스트 수정 (좌표는 줌된 화면 좌표)
+        journal.record(0, zoomed, [
+            ("meta", {"scale": 40.0, "show_grid": True}),
+            ("shape", 1, to_view(zoomed, 10.0, 0.0, 110.0, 100.0), True, "black"),
+            ("label", 0, {"heat_norm_text": "Norm: 9.00 W/m²"}),
+        ])
+        # 팬 뒤 도형 2 삭제, 새 도형 3 추가, 라벨 1 디퓨저 다시 배치
+        journal.record(0, panned, [
+            ("shape_del", 2),
+            ("shape", 3, to_view(panned, 300.0, 300.0, 350.0, 320.0), True, "black"),
+            ("label", 1, {"diffuser_coords": [to_view(panned, 120.0, 20.0), to_view(panned, 160.0, 60.0)]}),
+        ])
+        # 두 번째 팔레트
+        journal.record(1, identity, [("shape", 1, [5.0, 5.0, 15.0, 15.0], False, "red")])
+
+        recovered = self.reopen(journal)
+        self.assertTrue(os.path.exists(journal.snapshot_path), "compact_every=3 이면 압축이 일어나야 함")
+        self.assertEqual(recovered[0], {
+            "scale": 20.0,
+            "show_grid": True,
+            "shapes": [
+                {"coords": [10.0, 0.0, 110.0, 100.0], "editable": True, "color": "black"},
+                {"coords": [300.0, 300.0, 350.0, 320.0], "editable": True, "color": "black"},
+            ],
+            "labels": [
+                base_label(0, text="Norm: 9.00 W/m²"),
+                base_label(1, diffusers=((20.0, 20.0), (60.0, 60.0))),
+            ],
+        })
+        self.assertEqual(recovered[1]["shapes"], [{"coords": [5.0, 5.0, 15.0, 15.0], "editable": False, "color": "red"}])
+
+    def test_replay_matches_without_compaction(self):
+        """압축 여부와 무관하게 같은 상태로 재생"""
+        results = []
+        for compact_every in (1, 1000):
+            directory = os.path.join(self.root, f"c{compact_every}")
+            journal = EditJournal(directory, compact_every=compact_every)
+            journal.start()
+            affine = (1.0, 0.0, 0.0)
+            for step in range(12):
+                affine = (affine[0] * (1.25 if step % 3 == 0 else 1.0), affine[1] + 7.0, affine[2] - 3.0)
+                journal.record(0, affine, [("shape", step % 4, to_view(affine, step, step, step + 10.0, step + 5.0),
+                                            True, "black")])
+                if step == 8:
+                    journal.record(0, affine, [("shape_del", 1)])
+            journal.close(discard=False)
+            results.append(EditJournal(directory).recover())
+        self.assertEqual(results[0], results[1])
+        self.assertEqual([s["coords"] for s in results[0][0]["shapes"]],
+                         [[8.0, 8.0, 18.0, 13.0], [10.0, 10.0, 20.0, 15.0], [11.0, 11.0, 21.0, 16.0],
+                          [9.0, 9.0, 19.0, 14.0]])
+
+    def test_restart_continues_from_recovered_state(self):
+        """복구한 저널을 이어서 쓰면 이전 상태 위에 기록됨"""
+        journal = EditJournal(self.directory, compact_every=2)
+        journal.start()
+        journal.record(0, (1.0, 0.0, 0.0), [("shape", 1, [0.0, 0.0, 10.0, 10.0], True, "black")])
+        journal.record(0, (1.0, 0.0, 0.0), [("shape", 2, [0.0, 0.0, 20.0, 20.0], True, "black")])
+        journal.close(discard=False)
+
+        again = EditJournal(self.directory, compact_every=2)
+        again.start()
+        again.record(0, (2.0, 0.0, 0.0), [("shape", 2, [0.0, 0.0, 40.0, 40.0], True, "black"),
+                                          ("shape", 1, [0.0, 0.0, 30.0, 30.0], True, "black")])
+        recovered = self.reopen(again)
+        self.assertEqual([s["coords"] for s in recovered[0]["shapes"]],
+                         [[0.0, 0.0, 15.0, 15.0], [0.0, 0.0, 20.0, 20.0]])
+
+    def test_truncated_last_line_and_drop(self):
+        journal = EditJournal(self.directory)
+        journal.start()
+        for index in range(3):
+            journal.record(index, (1.0, 0.0, 0.0), [("shape", 1, [index, 0.0, 10.0, 10.0], True, "black")])
+        journal.drop(1)
+        journal.close(discard=False)
+        with open(journal.journal_path, "a", encoding="utf-8") as f:
+            f.write('{"op": "shape", "palette": 0, "id": 1, "chan')   # 크래시로 잘린 줄
+        recovered = EditJournal(self.directory).recover()
+        self.assertEqual(sorted(recovered), [0, 1])
+        self.assertEqual(recovered[1]["shapes"][0]["coords"], [2.0, 0.0, 10.0, 10.0])
+
+    def test_orphans_only_lists_directories_of_ended_processes(self):
+        live = EditJournal(os.path.join(self.root, "live"))
+        live.start()
+        live.record(0, (1.0, 0.0, 0.0), [("shape", 1, [0.0, 0.0, 1.0, 1.0], True, "black")])
+        live.close(discard=False)
+        dead = EditJournal(os.path.join(self.root, "dead"))
+        dead.start()
+        dead.record(0, (1.0, 0.0, 0.0), [("shape", 1, [0.0, 0.0, 1.0, 1.0], True, "black")])
+        dead.close(discard=False)
+        with open(dead.owner_path, "w", encoding="utf-8") as f:
+            json.dump({"pid": 0}, f)
+        self.assertEqual(EditJournal.orphans(self.root), [dead.directory])
+
+        dead.close(discard=True)
+        self.assertFalse(os.path.exists(dead.directory))
+        self.assertEqual(EditJournal.orphans(self.root), [])
+
+
+if __name__ == "__main__":
+    unittest.main()